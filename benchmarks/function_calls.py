@@ -0,0 +1,64 @@
+"""
+Microbenchmark of calls to functions defined in agent code, depending on the size of the interpreter state.
+
+Each call to a function defined in agent code creates a local scope for its variables. This measures the cost of a
+call when the state holds more and more variables: it should stay flat as the state grows.
+
+Usage:
+    python benchmarks/function_calls.py --calls 2000 --state-sizes 10 1000 100000
+"""
+
+import argparse
+import time
+
+from smolagents.local_python_executor import LocalPythonExecutor
+
+
+CODE = """
+def add(a, b):
+    return a + b
+
+total = 0
+for i in range({calls}):
+    total = add(total, i)
+"""
+
+EMPTY_LOOP_CODE = """
+total = 0
+for i in range({calls}):
+    total = total + i
+"""
+
+
+def measure(engine: str, state_size: int, calls: int, repeats: int = 5) -> float:
+    """Return the per-call cost in microseconds, net of the cost of the loop around the calls."""
+    executor = LocalPythonExecutor([], engine=engine)
+    executor.send_tools({})
+    executor.send_variables({f"variable_{i}": i for i in range(state_size)})
+
+    def best_time(code: str) -> float:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            executor(code.format(calls=calls))
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    return (best_time(CODE) - best_time(EMPTY_LOOP_CODE)) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000, help="Number of function calls per measurement.")
+    parser.add_argument("--state-sizes", type=int, nargs="+", default=[10, 1_000, 100_000])
+    parser.add_argument("--engines", nargs="+", default=["ast", "compiled"], choices=["ast", "compiled", "native"])
+    args = parser.parse_args()
+
+    print(f"{'engine':<10}{'state size':>12}{'µs per call':>14}")
+    for engine in args.engines:
+        for state_size in args.state_sizes:
+            print(f"{engine:<10}{state_size:>12}{measure(engine, state_size, args.calls):>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
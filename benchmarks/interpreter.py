@@ -0,0 +1,247 @@
+"""
+Benchmark suite of representative agent code, comparing the interpreter engines against CPython.
+
+Each workload is run with `LocalPythonExecutor` for every engine, and with a plain `exec` of the same code as the CPython
+reference. For each engine, it reports:
+- the number of AST nodes evaluated per second, as counted by the interpreter,
+- the per-node overhead: the time spent on top of CPython, divided by the number of evaluated nodes,
+- the slowdown ratio versus CPython.
+
+Results can be saved as JSON with `--output`, and compared with a previous run, e.g. on another commit, with
+`--compare`. Everything runs offline: tool calls go to a local function.
+
+Usage:
+    python benchmarks/interpreter.py --output results.json
+    python benchmarks/interpreter.py --workloads loops recursion --compare results.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+
+from smolagents.local_python_executor import LocalPythonExecutor
+
+
+@dataclass
+class Workload:
+    code: str
+    authorized_imports: tuple[str, ...] = ()
+
+
+WORKLOADS = {
+    "loops": Workload(
+        """
+total = 0
+for i in range(20000):
+    if i % 3 == 0:
+        total += i
+    elif i % 5 == 0:
+        total -= 1
+count = 0
+while count < 5000:
+    count += 1
+"""
+    ),
+    "comprehensions": Workload(
+        """
+squares = [i * i for i in range(5000)]
+evens = {i: square for i, square in enumerate(squares) if square % 2 == 0}
+pairs = [(a, b) for a in range(60) for b in range(60) if a < b]
+total = sum(value for value in evens.values())
+"""
+    ),
+    "pandas": Workload(
+        """
+import pandas as pd
+
+df = pd.DataFrame({"city": ["Paris", "Lyon", "Nice", "Lille"] * 50, "sales": list(range(200))})
+for _ in range(20):
+    summary = df.groupby("city")["sales"].sum()
+    top = df[df["sales"] > 100].sort_values("sales", ascending=False).head(5)
+    df["double"] = df["sales"] * 2
+result = summary.to_dict()
+""",
+        ("pandas",),
+    ),
+    "strings": Workload(
+        """
+import re
+
+text = " ".join(f"word{i} Value-{i * 7}" for i in range(2000))
+words = text.split()
+counts = {}
+for word in words:
+    key = word.lower().strip("-")
+    counts[key[:4]] = counts.get(key[:4], 0) + 1
+numbers = [int(match) for match in re.findall(r"\\d+", text)]
+report = "\\n".join(f"{key}: {value}" for key, value in sorted(counts.items()))
+""",
+        ("re",),
+    ),
+    "classes": Workload(
+        """
+class Vector:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def add(self, other):
+        return Vector(self.x + other.x, self.y + other.y)
+
+    def norm(self):
+        return (self.x**2 + self.y**2) ** 0.5
+
+
+position = Vector(0, 0)
+for i in range(3000):
+    position = position.add(Vector(1, i % 3))
+distance = position.norm()
+"""
+    ),
+    "recursion": Workload(
+        """
+def fibonacci(n):
+    if n < 2:
+        return n
+    return fibonacci(n - 1) + fibonacci(n - 2)
+
+
+def flatten(items):
+    return [leaf for item in items for leaf in (flatten(item) if isinstance(item, list) else [item])]
+
+
+result = fibonacci(17)
+flat = flatten([[i, [i + 1, [i + 2]]] for i in range(300)])
+"""
+    ),
+    "tool_calls": Workload(
+        """
+results = []
+for i in range(2000):
+    page = search(f"query {i}")
+    if "3" in page:
+        results.append(page)
+summary = search(", ".join(results[:10]))
+"""
+    ),
+}
+
+
+def search(query: str) -> str:
+    """Offline stand-in for a search tool."""
+    return f"results for {query}"
+
+
+def best_time(run, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure_cpython(workload: Workload, repeats: int) -> float:
+    code = compile(workload.code, "<workload>", "exec")
+    exec(code, {"search": search})  # Warm up imports and caches, like for the engines
+    return best_time(lambda: exec(code, {"search": search}), repeats)
+
+
+def measure_engine(workload: Workload, engine: str, repeats: int) -> tuple[float, int]:
+    """Return the best time of an engine, and the number of nodes evaluated by one run of the workload."""
+    executor = LocalPythonExecutor(list(workload.authorized_imports), engine=engine)
+    executor.send_tools({"search": search})
+    executor(workload.code)  # Warm up the code cache and imports
+    return best_time(lambda: executor(workload.code), repeats), executor.state["_operations_count"]["counter"]
+
+
+def run_suite(workloads: list[str], engines: list[str], repeats: int) -> list[dict]:
+    results = []
+    for name in workloads:
+        workload = WORKLOADS[name]
+        try:
+            cpython_time = measure_cpython(workload, repeats)
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        # The native engine does not count operations: use the node count of the interpreter for all engines
+        nodes = measure_engine(workload, "ast", repeats=1)[1]
+        for engine in engines:
+            engine_time = measure_engine(workload, engine, repeats)[0]
+            results.append(
+                {
+                    "workload": name,
+                    "engine": engine,
+                    "seconds": engine_time,
+                    "cpython_seconds": cpython_time,
+                    "nodes": nodes,
+                    "nodes_per_second": nodes / engine_time,
+                    "overhead_us_per_node": (engine_time - cpython_time) / nodes * 1e6,
+                    "slowdown": engine_time / cpython_time,
+                }
+            )
+    return results
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: list[dict], baseline: dict | None = None):
+    baseline_slowdowns = {
+        (result["workload"], result["engine"]): result["slowdown"] for result in (baseline or {}).get("results", [])
+    }
+    header = f"{'workload':<16}{'engine':<10}{'ms':>10}{'nodes/s':>12}{'µs/node':>10}{'slowdown':>10}"
+    print(header + (f"{'vs baseline':>13}" if baseline else ""))
+    for result in results:
+        line = (
+            f"{result['workload']:<16}{result['engine']:<10}{result['seconds'] * 1e3:>10.2f}"
+            f"{result['nodes_per_second']:>12,.0f}{result['overhead_us_per_node']:>10.3f}{result['slowdown']:>9.1f}x"
+        )
+        previous = baseline_slowdowns.get((result["workload"], result["engine"]))
+        if previous is not None:
+            line += f"{(result['slowdown'] / previous - 1) * 100:>+12.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workloads", nargs="+", default=list(WORKLOADS), choices=list(WORKLOADS))
+    parser.add_argument(
+        "--engines", nargs="+", default=["ast", "compiled", "native"], choices=["ast", "compiled", "native"]
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="Number of runs per measurement, the best is kept.")
+    parser.add_argument("--output", help="Path of a JSON file to save the results to.")
+    parser.add_argument("--compare", help="Path of a JSON file of previous results to compare slowdowns with.")
+    args = parser.parse_args()
+
+    results = run_suite(args.workloads, args.engines, args.repeats)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            "commit": get_commit(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workloads": {name: asdict(WORKLOADS[name]) for name in args.workloads},
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -46,7 +46,14 @@ if TYPE_CHECKING:
 
 from .agent_types import AgentAudio, AgentImage, handle_agent_output_types
 from .default_tools import TOOL_MAPPING, FinalAnswerTool
-from .local_python_executor import BASE_BUILTIN_MODULES, LocalPythonExecutor, PythonExecutor, fix_final_answer_code
+from .local_python_executor import (
+    BASE_BUILTIN_MODULES,
+    LocalProcessPythonExecutor,
+    LocalPythonExecutor,
+    PythonExecutor,
+    fix_final_answer_code,
+    format_size,
+)
 from .memory import (
     ActionStep,
     AgentMemory,
@@ -76,7 +83,7 @@ from .monitoring import (
     LogLevel,
     Monitor,
 )
-from .remote_executors import DockerExecutor, E2BExecutor, ModalExecutor, WasmExecutor
+from .remote_executors import DockerExecutor, E2BExecutor, ExecutorPool, ModalExecutor, WasmExecutor
 from .tools import BaseTool, Tool, validate_tool_arguments
 from .utils import (
     AgentError,
@@ -86,12 +93,12 @@ from .utils import (
     AgentParsingError,
     AgentToolCallError,
     AgentToolExecutionError,
+    bounded_str,
     create_agent_gradio_app_template,
     extract_code_from_text,
     is_valid_name,
     make_init_file,
     parse_code_blobs,
-    truncate_content,
 )
 
 
@@ -126,6 +133,13 @@ class ToolOutput:
     tool_call: ToolCall
 
 
+@dataclass
+class ExecutionLogsDelta:
+    """Print outputs of a code action, streamed while it is executing."""
+
+    content: str
+
+
 class PlanningPromptTemplate(TypedDict):
     """
     Prompt templates for the planning step.
@@ -206,6 +220,9 @@ class RunResult:
         steps (list[dict]): The agent's memory, as a list of steps.
         token_usage (TokenUsage | None): Count of tokens used during the run.
         timing (Timing): Timing details of the agent run: start time, end time, duration.
+        tool_calls (list[dict]): Calls to tools made from the code actions of the run, with their timing, output
+            size and error, from the `code_tool_calls` of the steps. They are recorded if the executor was created
+            with `executor_kwargs={"record_tool_calls": True}`.
         messages (list[dict]): The agent's memory, as a list of messages.
             <Deprecated version="1.22.0">
             Parameter 'messages' is deprecated and will be removed in version 1.25. Please use 'steps' instead.
@@ -247,6 +264,10 @@ class RunResult:
         )
         return self.steps
 
+    @property
+    def tool_calls(self) -> list[dict]:
+        return [tool_call for step in self.steps or [] for tool_call in step.get("code_tool_calls") or []]
+
     def dict(self):
         return {
             "output": self.output,
@@ -261,6 +282,7 @@ StreamEvent: TypeAlias = Union[
     ChatMessageStreamDelta,
     ChatMessageToolCall,
     ActionOutput,
+    ExecutionLogsDelta,
     ToolCall,
     ToolOutput,
     PlanningStep,
@@ -493,6 +515,8 @@ You have been provided with these additional arguments, that you can access dire
         if getattr(self, "python_executor", None):
             self.python_executor.send_variables(variables=self.state)
             self.python_executor.send_tools({**self.tools, **self.managed_agents})
+            if cancellation_token := getattr(self.python_executor, "cancellation_token", None):
+                cancellation_token.reset()
 
         if stream:
             # The steps are returned as they are executed through a generator to iterate on.
@@ -752,8 +776,10 @@ You have been provided with these additional arguments, that you can access dire
         ...
 
     def interrupt(self):
-        """Interrupts the agent execution."""
+        """Interrupts the agent execution, including the code action being executed if its executor supports it."""
         self.interrupt_switch = True
+        if cancellation_token := getattr(getattr(self, "python_executor", None), "cancellation_token", None):
+            cancellation_token.cancel()
 
     def write_memory_to_messages(
         self,
@@ -860,7 +886,8 @@ You have been provided with these additional arguments, that you can access dire
         """Prints a pretty replay of the agent's steps.
 
         Args:
-            detailed (bool, optional): If True, also displays the memory at each step. Defaults to False.
+            detailed (bool, optional): If True, also displays the memory at each step, and the profile of code actions
+                if the executor recorded one, e.g. with `executor_kwargs={"profile": True}`. Defaults to False.
                 Careful: will increase log length exponentially. Use only for debugging.
         """
         self.memory.replay(self.logger, detailed=detailed)
@@ -885,7 +912,7 @@ You have been provided with these additional arguments, that you can access dire
             answer += "\n\nFor more detail, find below a summary of this agent's work:\n<summary_of_work>\n"
             for message in self.write_memory_to_messages(summary_mode=True):
                 content = message.content
-                answer += "\n" + truncate_content(str(content)) + "\n---"
+                answer += "\n" + bounded_str(content) + "\n---"
             answer += "\n</summary_of_work>"
         return answer
 
@@ -1496,10 +1523,11 @@ class CodeAgent(MultiStepAgent):
         prompt_templates ([`~agents.PromptTemplates`], *optional*): Prompt templates.
         additional_authorized_imports (`list[str]`, *optional*): Additional authorized imports for the agent.
         planning_interval (`int`, *optional*): Interval at which the agent will run a planning step.
-        executor_type (`Literal["local", "e2b", "modal", "docker", "wasm"]`, default `"local"`): Type of code executor.
+        executor_type (`Literal["local", "local-process", "e2b", "modal", "docker", "wasm"]`, default `"local"`): Type of code executor. `"local-process"` runs the local Python executor in a worker process, so that agents running in threads scale across cores.
         executor_kwargs (`dict`, *optional*): Additional arguments to pass to initialize the executor.
+        executor_pool ([`ExecutorPool`], *optional*): Pool of warmed remote executors to take the executor from, for the `"e2b"`, `"docker"` and `"modal"` executor types. The executor is given back to the pool on cleanup.
         max_print_outputs_length (`int`, *optional*): Maximum length of the print outputs.
-        stream_outputs (`bool`, *optional*, default `False`): Whether to stream outputs during execution.
+        stream_outputs (`bool`, *optional*, default `False`): Whether to stream outputs during execution: model outputs, and print outputs of code actions.
         use_structured_outputs_internally (`bool`, default `False`): Whether to use structured generation at each action step: improves performance for many models.
 
             <Added version="1.17.0"/>
@@ -1514,8 +1542,9 @@ class CodeAgent(MultiStepAgent):
         prompt_templates: PromptTemplates | None = None,
         additional_authorized_imports: list[str] | None = None,
         planning_interval: int | None = None,
-        executor_type: Literal["local", "e2b", "modal", "docker", "wasm"] = "local",
+        executor_type: Literal["local", "local-process", "e2b", "modal", "docker", "wasm"] = "local",
         executor_kwargs: dict[str, Any] | None = None,
+        executor_pool: ExecutorPool | None = None,
         max_print_outputs_length: int | None = None,
         stream_outputs: bool = False,
         use_structured_outputs_internally: bool = False,
@@ -1562,10 +1591,13 @@ class CodeAgent(MultiStepAgent):
                 "Caution: you set an authorization for all imports, meaning your agent can decide to import any package it deems necessary. This might raise issues if the package is not installed in your environment.",
                 level=LogLevel.INFO,
             )
-        if executor_type not in {"local", "e2b", "modal", "docker", "wasm"}:
+        if executor_type not in {"local", "local-process", "e2b", "modal", "docker", "wasm"}:
             raise ValueError(f"Unsupported executor type: {executor_type}")
         self.executor_type = executor_type
         self.executor_kwargs: dict[str, Any] = executor_kwargs or {}
+        if executor_pool is not None and executor_type not in ExecutorPool.executor_types:
+            raise ValueError(f"An executor pool cannot be used with the '{executor_type}' executor type.")
+        self.executor_pool = executor_pool
         self.python_executor = self.create_python_executor()
 
     def __enter__(self):
@@ -1576,7 +1608,11 @@ class CodeAgent(MultiStepAgent):
 
     def cleanup(self):
         """Clean up resources used by the agent, such as the remote Python executor."""
-        if hasattr(self.python_executor, "cleanup"):
+        if self.executor_pool is not None:
+            if self.python_executor is not None:
+                self.executor_pool.release(self.python_executor)
+                self.python_executor = None
+        elif hasattr(self.python_executor, "cleanup"):
             self.python_executor.cleanup()
 
     def create_python_executor(self) -> PythonExecutor:
@@ -1585,9 +1621,18 @@ class CodeAgent(MultiStepAgent):
                 self.additional_authorized_imports,
                 **{"max_print_outputs_length": self.max_print_outputs_length} | self.executor_kwargs,
             )
+        elif self.executor_type == "local-process":
+            return LocalProcessPythonExecutor(
+                self.additional_authorized_imports,
+                **{"max_print_outputs_length": self.max_print_outputs_length} | self.executor_kwargs,
+            )
         else:
             if self.managed_agents:
                 raise Exception("Managed agents are not yet supported with remote code execution.")
+            if self.executor_pool is not None:
+                return self.executor_pool.acquire(
+                    self.executor_type, self.additional_authorized_imports, self.logger, **self.executor_kwargs
+                )
             remote_executors = {
                 "e2b": E2BExecutor,
                 "docker": DockerExecutor,
@@ -1618,10 +1663,10 @@ class CodeAgent(MultiStepAgent):
 
     def _step_stream(
         self, memory_step: ActionStep
-    ) -> Generator[ChatMessageStreamDelta | ToolCall | ToolOutput | ActionOutput]:
+    ) -> Generator[ChatMessageStreamDelta | ToolCall | ExecutionLogsDelta | ToolOutput | ActionOutput]:
         """
         Perform one step in the ReAct framework: the agent thinks, acts, and observes the result.
-        Yields ChatMessageStreamDelta during the run if streaming is enabled.
+        Yields ChatMessageStreamDelta and ExecutionLogsDelta during the run if streaming is enabled.
         At the end, yields either None if the step is not final, or the final answer.
         """
         memory_messages = self.write_memory_to_messages()
@@ -1704,7 +1749,31 @@ class CodeAgent(MultiStepAgent):
         ### Execute action ###
         self.logger.log_code(title="Executing parsed code:", content=code_action, level=LogLevel.INFO)
         try:
-            code_output = self.python_executor(code_action)
+            if self.stream_outputs and hasattr(self.python_executor, "stream"):
+                for output in self.python_executor.stream(code_action):
+                    if isinstance(output, str):
+                        yield ExecutionLogsDelta(content=output)
+                    else:
+                        code_output = output
+            else:
+                code_output = self.python_executor(code_action)
+            memory_step.profile = code_output.profile
+            self._record_code_tool_calls(memory_step, code_output.tool_calls)
+            if code_output.concurrency_trace is not None and code_output.concurrency_trace.calls:
+                self.logger.log(
+                    Group(Text("Concurrent tool calls:", style="bold"), Text(code_output.concurrency_trace.render())),
+                    level=LogLevel.DEBUG,
+                )
+            if getattr(self.python_executor, "state_manager", None) is not None:
+                state_manager = self.python_executor.state_manager
+                self.logger.log(
+                    Text(
+                        f"Variables: {format_size(state_manager.memory_size)} in memory, "
+                        f"{format_size(state_manager.spilled_size)} spilled to disk",
+                        style="dim",
+                    ),
+                    level=LogLevel.DEBUG,
+                )
             execution_outputs_console = []
             if len(code_output.logs) > 0:
                 execution_outputs_console += [
@@ -1713,6 +1782,10 @@ class CodeAgent(MultiStepAgent):
                 ]
             observation = "Execution logs:\n" + code_output.logs
         except Exception as e:
+            if hasattr(self.python_executor, "state") and "_profiler" in self.python_executor.state:
+                memory_step.profile = self.python_executor.state["_profiler"].report()
+            if hasattr(self.python_executor, "state"):
+                self._record_code_tool_calls(memory_step, self.python_executor.state.get("_tool_calls"))
             if hasattr(self.python_executor, "state") and "_print_outputs" in self.python_executor.state:
                 execution_logs = str(self.python_executor.state["_print_outputs"])
                 if len(execution_logs) > 0:
@@ -1730,7 +1803,7 @@ class CodeAgent(MultiStepAgent):
                 )
             raise AgentExecutionError(error_msg, self.logger)
 
-        truncated_output = truncate_content(str(code_output.output))
+        truncated_output = bounded_str(code_output.output)
         observation += "Last output from code snippet:\n" + truncated_output
         memory_step.observations = observation
 
@@ -1744,6 +1817,21 @@ class CodeAgent(MultiStepAgent):
         memory_step.action_output = code_output.output
         yield ActionOutput(output=code_output.output, is_final_answer=code_output.is_final_answer)
 
+    def _record_code_tool_calls(self, memory_step: ActionStep, tool_calls: list | None):
+        """Store the calls to tools made by the code action in the memory step, as timed `ToolCall`s."""
+        if tool_calls:
+            memory_step.code_tool_calls = [
+                ToolCall(
+                    name=tool_call.name,
+                    arguments=tool_call.arguments,
+                    id=f"{memory_step.tool_calls[0].id}_{index}",
+                    timing=Timing(start_time=tool_call.start_time, end_time=tool_call.end_time),
+                    output_size=tool_call.output_size,
+                    error=tool_call.error,
+                )
+                for index, tool_call in enumerate(tool_calls)
+            ]
+
     def to_dict(self) -> dict[str, Any]:
         """Convert the agent to a dictionary representation.
 
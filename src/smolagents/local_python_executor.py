@@ -15,23 +15,45 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import ast
+import asyncio
 import builtins
+import concurrent.futures
+import copy
 import difflib
+import hashlib
 import inspect
+import itertools
 import logging
 import math
+import mmap
+import multiprocessing
+import operator
+import os
+import pickle
+import queue
 import re
+import reprlib
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
 from abc import ABC, abstractmethod
-from collections.abc import Callable, Generator, Mapping
-from dataclasses import dataclass
-from functools import wraps
+from collections import OrderedDict
+from collections.abc import Callable, Coroutine, Generator, Iterable, Mapping
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field, replace
+from functools import lru_cache, partial, wraps
 from importlib import import_module
+from importlib.machinery import all_suffixes
 from importlib.util import find_spec
 from types import BuiltinFunctionType, FunctionType, ModuleType
-from typing import Any
+from typing import Any, Literal
 
 from .tools import Tool
-from .utils import BASE_BUILTIN_MODULES, truncate_content
+from .utils import BASE_BUILTIN_MODULES, bounded_str
 
 
 logger = logging.getLogger(__name__)
@@ -55,6 +77,25 @@ ERRORS = {
 DEFAULT_MAX_LEN_OUTPUT = 50000
 MAX_OPERATIONS = 10000000
 MAX_WHILE_ITERATIONS = 1000000
+# Wall-clock time budget of code run with the native engine when no timeout is given, since it counts no operations
+DEFAULT_NATIVE_TIMEOUT = 60
+ENGINES = ("ast", "compiled", "native")
+BUDGET_CHECK_INTERVAL = 100
+DEFAULT_MAX_PARALLEL_WORKERS = 8
+# Size of the thread pool running the bodies of the coroutine functions defined in code actions
+DEFAULT_MAX_ASYNC_WORKERS = 32
+# Maximum number of tool calls recorded per code execution
+MAX_TOOL_CALL_RECORDS = 1000
+# State keys describing the last execution or its event loop, rather than variables of the code
+EXECUTION_STATE_KEYS = (
+    "_print_outputs",
+    "_operations_count",
+    "_execution_budget",
+    "_profiler",
+    "_event_loop",
+    "_concurrency_trace",
+    "_tool_calls",
+)
 ALLOWED_DUNDER_METHODS = ["__init__", "__str__", "__repr__"]
 
 
@@ -68,6 +109,85 @@ def nodunder_getattr(obj, name, default=None):
     return getattr(obj, name, default)
 
 
+class ParallelMap:
+    """
+    `parallel_map(func, iterable, max_workers=None)` function of code actions: applies a function to each item of an
+    iterable on a bounded thread pool, e.g. to run independent tool calls concurrently, and returns the results in the
+    order of the items.
+
+    The first exception raised by a call cancels the calls that did not start yet, and is raised again as an
+    `InterpreterError` telling which item caused it. Calls made by a mapped function run sequentially, so that nested
+    maps cannot exhaust the pool.
+
+    Args:
+        max_workers (`int`, defaults to `DEFAULT_MAX_PARALLEL_WORKERS`):
+            Size of the thread pool, which is started on first use.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_PARALLEL_WORKERS):
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __call__(self, func: Callable, iterable: Iterable, max_workers: int | None = None) -> list[Any]:
+        if not callable(func):
+            raise InterpreterError(f"parallel_map expects a callable, got {type(func).__name__}")
+        items = list(iterable)
+        workers = min(self.max_workers, max_workers or self.max_workers, len(items))
+        if workers <= 1 or getattr(self._local, "in_worker", False):
+            return [self._call(func, index, item) for index, item in enumerate(items)]
+
+        pool = self._start()
+        results = [None] * len(items)
+        remaining = enumerate(items)
+        pending = {
+            pool.submit(self._run, func, index, item): index for index, item in itertools.islice(remaining, workers)
+        }
+        try:
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+                    for index, item in itertools.islice(remaining, 1):
+                        pending[pool.submit(self._run, func, index, item)] = index
+        finally:
+            for future in pending:
+                future.cancel()
+        return results
+
+    def _start(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix="parallel_map")
+            return self._pool
+
+    def _run(self, func: Callable, index: int, item: Any) -> Any:
+        self._local.in_worker = True
+        try:
+            return self._call(func, index, item)
+        finally:
+            self._local.in_worker = False
+
+    @staticmethod
+    def _call(func: Callable, index: int, item: Any) -> Any:
+        try:
+            return func(item)
+        except FinalAnswerException:
+            raise
+        except Exception as e:
+            raise InterpreterError(
+                f"parallel_map failed on item {index} ({reprlib.repr(item)}): {type(e).__name__}: {e}"
+            ) from e
+
+    def shutdown(self):
+        """Stop the thread pool, after the running calls. It is started again by the next map."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
 BASE_PYTHON_TOOLS = {
     "print": custom_print,
     "isinstance": isinstance,
@@ -121,8 +241,37 @@ BASE_PYTHON_TOOLS = {
     "issubclass": issubclass,
     "type": type,
     "complex": complex,
+    "parallel_map": ParallelMap(),
 }
 
+# Exact result types that can never be a module or a dangerous function: their safety check can be skipped
+SAFE_RESULT_TYPES = frozenset({type(None), bool, int, float, complex, str, bytes, list, tuple, set, range, slice})
+
+# Static tools whose results are always numbers, strings or booleans: they are never wrapped to check their results
+SAFE_RESULT_FUNCTIONS = frozenset(
+    {
+        len,
+        ord,
+        chr,
+        callable,
+        hasattr,
+        isinstance,
+        issubclass,
+        math.log,
+        math.exp,
+        math.sin,
+        math.cos,
+        math.tan,
+        math.asin,
+        math.acos,
+        math.atan,
+        math.atan2,
+        math.degrees,
+        math.radians,
+        math.sqrt,
+    }
+)
+
 # Non-exhaustive list of dangerous modules that should not be imported
 DANGEROUS_MODULES = [
     "builtins",
@@ -228,24 +377,114 @@ def safer_func(
     @wraps(func)
     def _check_return(*args, **kwargs):
         result = func(*args, **kwargs)
-        check_safer_result(result, static_tools, authorized_imports)
+        if type(result) not in SAFE_RESULT_TYPES:
+            check_safer_result(result, static_tools, authorized_imports)
         return result
 
     return _check_return
 
 
+class StaticTools(dict):
+    """
+    Static tools of an executor, along with the safe wrappers returned when code uses them as values, e.g. in
+    `map(len, items)`.
+
+    Wrappers are built once per tool and set of authorized imports, instead of on each lookup. Copies share them, so
+    that the tools sent to an executor once are only wrapped once across its executions.
+    """
+
+    __slots__ = ("_wrappers",)
+
+    def __init__(self, tools: dict[str, Callable] | None = None):
+        super().__init__(tools or {})
+        self._wrappers = tools._wrappers if isinstance(tools, StaticTools) else {}
+
+    def copy(self) -> "StaticTools":
+        return StaticTools(self)
+
+    def get_safe(self, name: str, authorized_imports: "AuthorizedImports") -> Callable:
+        """Return the tool `name`, wrapped to check its results unless they are known to be safe."""
+        func = self[name]
+        try:
+            if func in SAFE_RESULT_FUNCTIONS:
+                return func
+        except TypeError:  # Unhashable tool, e.g. a dataclass instance
+            pass
+        # Keyed by identity, since tools may be unhashable: the entry keeps a reference to the tool, so its id is not
+        # reused while the entry exists
+        key = (id(func), authorized_imports)
+        entry = self._wrappers.get(key)
+        if entry is None:
+            entry = self._wrappers[key] = (
+                func,
+                safer_func(func, static_tools=self, authorized_imports=authorized_imports),
+            )
+        return entry[1]
+
+
 class PrintContainer:
-    def __init__(self):
-        self.value = ""
+    """
+    Buffer of the print outputs of executed code.
+
+    Printed texts are stored as a list of chunks, only joined when the value is read. If `max_length` is set, the
+    buffer never grows beyond it while printing: once outputs exceed `max_length` characters, only their head and
+    tail are kept, and the value reads like `truncate_content(outputs, max_length)`.
+
+    Args:
+        max_length (`int`, *optional*): Maximum number of characters of print outputs to keep.
+        callback (`Callable[[str], None]`, *optional*): Function called with each printed text as soon as it is
+            printed, to stream print outputs. Once outputs exceed `max_length`, it is called with a last notice of
+            the truncation instead.
+    """
+
+    def __init__(self, max_length: int | None = None, callback: Callable[[str], None] | None = None):
+        self.max_length = max_length
+        self.callback = callback
+        # Once outputs exceed max_length, the head is frozen and the chunks only hold the tail
+        self._head: str | None = None
+        self._chunks: list[str] = []
+        self._length = 0
+
+    @property
+    def value(self) -> str:
+        text = "".join(self._chunks)
+        if self._head is None:
+            return text
+        return (
+            self._head
+            + f"\n..._This content has been truncated to stay below {self.max_length} characters_...\n"
+            + text[-self.max_length // 2 :]
+        )
+
+    @value.setter
+    def value(self, text: str):
+        self._head = None
+        self._chunks = [text]
+        self._length = len(text)
 
     def append(self, text):
-        self.value += text
+        if self.callback is not None and self._head is None:
+            if self.max_length is None or self._length + len(text) <= self.max_length:
+                self.callback(text)
+            else:
+                self.callback(f"\n..._Print outputs exceed {self.max_length} characters: truncating them_...\n")
+        self._chunks.append(text)
+        self._length += len(text)
+        if self.max_length is not None:
+            if self._head is None and self._length > self.max_length:
+                text = "".join(self._chunks)
+                self._head = text[: self.max_length // 2]
+                self._chunks = [text[-self.max_length // 2 :]]
+                self._length = len(self._chunks[0])
+            elif self._head is not None and self._length > 2 * self.max_length:
+                # Amortize tail trimming: only join the chunks once they hold twice the maximum length
+                self._chunks = ["".join(self._chunks)[-self.max_length // 2 :]]
+                self._length = len(self._chunks[0])
         return self
 
     def __iadd__(self, other):
         """Implements the += operator"""
-        self.value += str(other)
-        return self
+        return self.append(str(other))
 
     def __str__(self):
         """String representation"""
@@ -260,6 +499,721 @@ class PrintContainer:
         return len(self.value)
 
 
+class Scope(dict):
+    """
+    Local scope of a function call or comprehension: a dict of its local variables, which falls back to the enclosing
+    scope for lookups instead of copying it, so that creating a scope costs the same whatever the size of the state.
+
+    Assignments and deletions only affect the local variables. Lookups, `in`, `get`, `setdefault` and `keys` also see
+    the enclosing scopes, while iteration and `len` only cover the local variables.
+    """
+
+    __slots__ = ("parent",)
+
+    def __init__(self, parent: dict[str, Any]):
+        self.parent = parent
+
+    def __missing__(self, key):
+        return self.parent[key]
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.parent
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def keys(self):
+        return self.parent.keys() | dict.keys(self)
+
+    def copy(self):
+        scope = Scope(self.parent)
+        scope.update(self)
+        return scope
+
+
+class ExecutionInterrupted(BaseException):
+    """
+    Raised when a code execution runs out of its time budget or is cancelled.
+
+    It derives from `BaseException` so that `try`/`except Exception` blocks of the executed code cannot swallow it:
+    `evaluate_python_code` converts it into an `InterpreterError`.
+    """
+
+    pass
+
+
+class CancellationToken:
+    """Thread-safe flag to cancel running code executions from another thread, e.g. when an agent is interrupted."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def reset(self):
+        self._event.clear()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+def estimate_size(obj: Any, max_items: int = 1000) -> int:
+    """
+    Estimate the memory size of an object in bytes, including the items of containers and the buffers of numpy arrays
+    and pandas objects. The size of containers longer than `max_items` is extrapolated from their first items.
+    """
+    seen = set()
+
+    def size(obj):
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        if type(obj).__module__.split(".")[0] in ("numpy", "pandas"):
+            try:
+                if hasattr(obj, "memory_usage"):
+                    usage = obj.memory_usage(deep=True)
+                    return int(usage.sum() if hasattr(usage, "sum") else usage)
+                return int(obj.nbytes)
+            except Exception:
+                pass
+        total = sys.getsizeof(obj, 0)
+        if isinstance(obj, dict):
+            items = [item for pair in itertools.islice(obj.items(), max_items) for item in pair]
+            length = 2 * len(obj)
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            items = list(itertools.islice(obj, max_items))
+            length = len(obj)
+        else:
+            return total
+        items_size = sum(size(item) for item in items)
+        return total + (items_size * length // len(items) if items else 0)
+
+    return size(obj)
+
+
+def format_size(size: int) -> str:
+    return f"{size / 2**20:.1f} MB"
+
+
+@dataclass
+class VariableStats:
+    name: str
+    type: str
+    size: int
+    spilled: bool = False
+
+
+def _remove_spill_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class StateMemoryManager:
+    """
+    Keeps the variables of an executor's state within a memory budget, by spilling the largest numpy and pandas values
+    to memory-mapped files.
+
+    After each execution, [`~StateMemoryManager.update`] estimates the size of each variable. When the variables held
+    in memory exceed `max_memory`, the largest numpy and pandas values are pickled with their data buffers written to a
+    file under `spill_dir`, and replaced in the state by equal values of the same type whose buffers are mapped from
+    that file: their data is read back by the operating system when it is accessed, and writing to them does not change
+    the file. Data that pickle cannot write out-of-band, such as columns of Python strings, stays in memory.
+
+    Args:
+        max_memory (`int`): Maximum size of the variables held in memory, in bytes.
+        spill_dir (`str`, *optional*): Directory of the spill files. Defaults to a new temporary directory.
+        min_spill_size (`int`, defaults to 1 MB): Minimum size of the data buffers of a value for it to be spilled.
+    """
+
+    def __init__(self, max_memory: int, spill_dir: str | None = None, min_spill_size: int = 2**20):
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self.min_spill_size = min_spill_size
+        self.stats: dict[str, VariableStats] = {}
+        self._spilled: dict[str, Any] = {}
+        self._unspillable: dict[str, int] = {}
+
+    @property
+    def memory_size(self) -> int:
+        """Total size of the variables held in memory, in bytes, as of the last update."""
+        return sum(stats.size for stats in self.stats.values() if not stats.spilled)
+
+    @property
+    def spilled_size(self) -> int:
+        """Total size of the variables spilled to disk, in bytes, as of the last update."""
+        return sum(stats.size for stats in self.stats.values() if stats.spilled)
+
+    def update(self, state: dict[str, Any]):
+        """Refresh the size statistics of the variables of `state`, and spill the largest ones if over budget."""
+        variables = {
+            name: value for name, value in state.items() if name not in EXECUTION_STATE_KEYS and name != "__name__"
+        }
+        self._spilled = {name: value for name, value in self._spilled.items() if variables.get(name) is value}
+        self.stats = {
+            name: VariableStats(
+                name=name, type=type(value).__name__, size=estimate_size(value), spilled=name in self._spilled
+            )
+            for name, value in variables.items()
+        }
+        memory_size = self.memory_size
+        for stats in sorted(self.stats.values(), key=lambda stats: stats.size, reverse=True):
+            if memory_size <= self.max_memory:
+                break
+            value = variables[stats.name]
+            if stats.spilled or type(value).__module__.split(".")[0] not in ("numpy", "pandas"):
+                continue
+            if self._unspillable.get(stats.name) == id(value):
+                continue
+            spilled_value = self._spill(stats.name, value)
+            if spilled_value is None:
+                self._unspillable[stats.name] = id(value)
+                continue
+            state[stats.name] = self._spilled[stats.name] = spilled_value
+            stats.spilled = True
+            memory_size -= stats.size
+
+    def _spill(self, name: str, value: Any) -> Any | None:
+        buffers = []
+        try:
+            payload = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+            buffers = [buffer.raw() for buffer in buffers]
+        except (pickle.PicklingError, TypeError, BufferError) as e:
+            logger.debug(f"Could not spill variable {name} to disk: {type(e).__name__} - {e}")
+            return None
+        if sum(buffer.nbytes for buffer in buffers) < self.min_spill_size:
+            return None
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="smolagents-spill-")
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"{name}-{uuid.uuid4().hex}.bin")
+        offsets = []
+        with open(path, "wb") as file:
+            for buffer in buffers:
+                # Align buffers so that numpy arrays mapped from the file are aligned too
+                file.write(b"\0" * (-file.tell() % 64))
+                offsets.append(file.tell())
+                file.write(buffer)
+        with open(path, "rb") as file:
+            mapped_file = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY))
+        spilled_value = pickle.loads(
+            payload,
+            buffers=[mapped_file[offset : offset + buffer.nbytes] for offset, buffer in zip(offsets, buffers)],
+        )
+        weakref.finalize(spilled_value, _remove_spill_file, path)
+        return spilled_value
+
+
+class ExecutionBudget:
+    """
+    Wall-clock time, CPU time and memory budget of one code execution.
+
+    The interpreter checks it every `BUDGET_CHECK_INTERVAL` operations and after each function call: the check is
+    cooperative, so a single long library call is only stopped once it returns.
+
+    Memory is measured with `tracemalloc`, which is started while executions with a memory budget are running. It
+    traces the allocations of the whole process: when several executions run concurrently, each one also counts the
+    allocations of the others.
+
+    Args:
+        code (`str`): The code being executed, to report the line that was running when the budget ran out.
+        state (`dict[str, Any]`): The state of the execution, to report its largest variables.
+        timeout (`float`, *optional*): Maximum wall-clock time of the execution, in seconds.
+        cpu_timeout (`float`, *optional*): Maximum CPU time of the execution thread, in seconds.
+        cancellation_token (`CancellationToken`, *optional*): Token that cancels the execution when tripped.
+        max_memory (`int`, *optional*): Maximum peak memory allocated by the execution, in bytes.
+        memory_check_interval (`int`, defaults to `BUDGET_CHECK_INTERVAL`): Minimum number of operations between
+            two memory samples.
+    """
+
+    _tracing_lock = threading.Lock()
+    _tracing_users = 0
+    _owns_tracing = False
+
+    def __init__(
+        self,
+        code: str,
+        state: dict[str, Any],
+        timeout: float | None = None,
+        cpu_timeout: float | None = None,
+        cancellation_token: CancellationToken | None = None,
+        max_memory: int | None = None,
+        memory_check_interval: int = BUDGET_CHECK_INTERVAL,
+    ):
+        self.code_lines = code.splitlines()
+        self.state = state
+        self.timeout = timeout
+        self.cpu_timeout = cpu_timeout
+        self.cancellation_token = cancellation_token
+        self.max_memory = max_memory
+        self.memory_check_interval = memory_check_interval
+        self.peak_memory = None
+        self._tracing = max_memory is not None
+        if self._tracing:
+            self._start_tracing()
+            tracemalloc.reset_peak()
+            self.start_memory = tracemalloc.get_traced_memory()[0]
+            self.peak_memory = 0
+            self._next_memory_check = 0
+        self.thread_id = threading.get_ident()
+        self.start_time = time.monotonic()
+        self.start_cpu_time = time.thread_time()
+
+    @classmethod
+    def _start_tracing(cls):
+        with cls._tracing_lock:
+            if cls._tracing_users == 0:
+                cls._owns_tracing = not tracemalloc.is_tracing()
+                if cls._owns_tracing:
+                    tracemalloc.start()
+            cls._tracing_users += 1
+
+    @classmethod
+    def _stop_tracing(cls):
+        with cls._tracing_lock:
+            cls._tracing_users -= 1
+            if cls._tracing_users == 0 and cls._owns_tracing:
+                tracemalloc.stop()
+
+    def sample_memory(self) -> int:
+        """Update and return the peak memory allocated since the start of the execution, in bytes."""
+        _, peak = tracemalloc.get_traced_memory()
+        self.peak_memory = max(self.peak_memory, peak - self.start_memory)
+        return self.peak_memory
+
+    def cpu_time(self) -> float:
+        """CPU time of the thread that started the execution, even when called from another thread if supported."""
+        if threading.get_ident() == self.thread_id or not hasattr(time, "pthread_getcpuclockid"):
+            return time.thread_time()
+        return time.clock_gettime(time.pthread_getcpuclockid(self.thread_id))
+
+    def check(self, node: ast.AST, sample_memory: bool = False):
+        """
+        Raise `ExecutionInterrupted` if the execution was cancelled or exceeded its budget while running `node`.
+        Memory is sampled every `memory_check_interval` operations, or on each check with `sample_memory=True`.
+        """
+        if self.cancellation_token is not None and self.cancellation_token.cancelled:
+            self._interrupt("Execution was cancelled", node)
+        if self.timeout is not None and time.monotonic() - self.start_time > self.timeout:
+            self._interrupt(f"Execution exceeded its wall-clock time budget of {self.timeout} seconds", node)
+        if self.cpu_timeout is not None and self.cpu_time() - self.start_cpu_time > self.cpu_timeout:
+            self._interrupt(f"Execution exceeded its CPU time budget of {self.cpu_timeout} seconds", node)
+        if self._tracing:
+            operations_count = self.state["_operations_count"]["counter"]
+            if sample_memory or operations_count >= self._next_memory_check:
+                self._next_memory_check = operations_count + self.memory_check_interval
+                if self.sample_memory() > self.max_memory:
+                    self._interrupt(
+                        f"Execution exceeded its memory budget of {format_size(self.max_memory)} with a peak "
+                        f"allocation of {format_size(self.peak_memory)}",
+                        node,
+                        details=self._describe_largest_variables(),
+                    )
+
+    def close(self):
+        """Take the last memory sample and stop tracing memory for this execution."""
+        if self._tracing:
+            self.sample_memory()
+            self._stop_tracing()
+            self._tracing = False
+
+    def _describe_largest_variables(self, count: int = 3) -> str:
+        sizes = {name: estimate_size(value) for name, value in list(self.state.items()) if not name.startswith("_")}
+        largest = sorted(sizes, key=sizes.get, reverse=True)[:count]
+        if not largest:
+            return ""
+        return " Largest variables: " + ", ".join(f"{name} ({format_size(sizes[name])})" for name in largest) + "."
+
+    def _interrupt(self, reason: str, node: ast.AST, details: str = ""):
+        elapsed = time.monotonic() - self.start_time
+        cpu_elapsed = self.cpu_time() - self.start_cpu_time
+        lineno = getattr(node, "lineno", None)
+        if lineno is not None and lineno <= len(self.code_lines):
+            location = f"while running line {lineno}: '{self.code_lines[lineno - 1].strip()}'"
+        else:
+            location = f"while running '{ast.unparse(node)}'"
+        raise ExecutionInterrupted(
+            f"{reason} after {elapsed:.2f} seconds ({cpu_elapsed:.2f} seconds of CPU time), {location}.{details}"
+        )
+
+
+async def await_awaitable(awaitable: Any) -> Any:
+    return await awaitable
+
+
+async def cancel_tasks():
+    """Cancel the other tasks of the running event loop and wait for them to finish."""
+    tasks = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def gather(*awaitables: Any, return_exceptions: bool = False) -> list[Any]:
+    """
+    Same as `asyncio.gather`, but can be called outside of a running event loop: the awaitables are only scheduled
+    once the result is awaited.
+    """
+    return await asyncio.gather(*awaitables, return_exceptions=return_exceptions)
+
+
+class EventLoopThread:
+    """
+    Event loop running in a background thread, owned by a [`LocalPythonExecutor`] in async mode to run the awaitables
+    of code actions.
+
+    Each `await` blocks the interpreter until its awaitable is done, while the event loop keeps running the other
+    ones: coroutines gathered with `asyncio.gather` run concurrently, including the coroutine functions defined in the
+    code, whose bodies run on a bounded thread pool, see [`run_function`]. The thread and the pool are started on the
+    first `await`.
+
+    Args:
+        poll_interval (`float`, defaults to `0.05`):
+            Interval between two checks of the execution budget while waiting for an awaitable, in seconds.
+        max_workers (`int`, defaults to `DEFAULT_MAX_ASYNC_WORKERS`):
+            Size of the thread pool running the bodies of the coroutine functions defined in the code.
+    """
+
+    def __init__(self, poll_interval: float = 0.05, max_workers: int = DEFAULT_MAX_ASYNC_WORKERS):
+        self.poll_interval = poll_interval
+        self.max_workers = max_workers
+        self.loop = None
+        self._thread = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.asyncio_module = self._build_asyncio_module()
+
+    def _build_asyncio_module(self) -> ModuleType:
+        # Curated replacement of `asyncio` for code actions: the real module gives access to subprocesses and sockets
+        module = ModuleType("asyncio")
+        module.__all__ = ["gather", "run", "sleep", "wait_for", "Event", "Lock", "Queue", "Semaphore"]
+        module.__all__ += ["CancelledError", "TimeoutError"]
+        module.gather = gather
+        module.run = self.run
+        for name in module.__all__[2:]:
+            setattr(module, name, getattr(asyncio, name))
+        return module
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    self.max_workers, thread_name_prefix="async_def"
+                )
+                self._thread = threading.Thread(target=self.loop.run_forever, name="EventLoopThread", daemon=True)
+                self._thread.start()
+            return self.loop
+
+    def run_function(self, func: Callable, args: tuple, kwargs: dict[str, Any]) -> Coroutine:
+        """
+        Return a coroutine running the interpreted body of a coroutine function defined in the code on the thread
+        pool. Calls made from the pool itself, i.e. by the body of another coroutine function, run in their own thread
+        instead: their caller holds a thread of the pool while it waits for them, so that they could wait forever for
+        one.
+        """
+        return self._run_function(func, args, kwargs, nested=getattr(self._local, "in_worker", False))
+
+    async def _run_function(self, func: Callable, args: tuple, kwargs: dict[str, Any], nested: bool) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def settle(result: Any = None, error: BaseException | None = None):
+            if future.done():  # Cancelled while running
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        def run():
+            self._local.in_worker = True
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                loop.call_soon_threadsafe(settle, None, e)
+            else:
+                loop.call_soon_threadsafe(settle, result)
+            finally:
+                self._local.in_worker = False
+
+        if nested:
+            threading.Thread(target=run, daemon=True).start()
+        else:
+            self._executor.submit(run)
+        return await future
+
+    def run(self, awaitable: Any, budget: ExecutionBudget | None = None, node: ast.AST | None = None) -> Any:
+        """
+        Wait for an awaitable to be done on the event loop and return its result. While waiting, the execution budget
+        is checked every `poll_interval` seconds: when it is exceeded, the awaitable is cancelled.
+        """
+        if not inspect.isawaitable(awaitable):
+            raise InterpreterError(f"Object of type {type(awaitable).__name__} can't be awaited")
+        future = asyncio.run_coroutine_threadsafe(await_awaitable(awaitable), self._start())
+        while not concurrent.futures.wait([future], timeout=self.poll_interval).done:
+            if budget is not None:
+                try:
+                    budget.check(node)
+                except ExecutionInterrupted:
+                    future.cancel()
+                    raise
+        return future.result()
+
+    def close(self):
+        """Stop the event loop, its thread and its thread pool. They are started again by the next `await`."""
+        with self._lock:
+            loop, self.loop = self.loop, None
+            executor, self._executor = self._executor, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(cancel_tasks(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join()
+            loop.close()
+        if executor is not None:
+            # Bodies still running are left to finish, their results are ignored
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_awaitable(awaitable: Any, state: dict[str, Any], node: ast.AST) -> Any:
+    """Await an awaitable in code actions, on the event loop of the state."""
+    if "_event_loop" not in state:
+        if inspect.iscoroutine(awaitable):
+            awaitable.close()
+        raise InterpreterError(
+            f"{type(node).__name__} is only supported in async mode, see `LocalPythonExecutor(async_mode=True)`."
+        )
+    return state["_event_loop"].run(awaitable, state.get("_execution_budget"), node)
+
+
+def iterate_async(iterable: Any, state: dict[str, Any], node: ast.AST) -> Generator:
+    """Iterate over an asynchronous iterable in code actions, awaiting each item on the event loop of the state."""
+    if not hasattr(iterable, "__aiter__"):
+        raise InterpreterError(f"'async for' requires an asynchronous iterable, got {type(iterable).__name__}")
+    iterator = iterable.__aiter__()
+    while True:
+        try:
+            yield run_awaitable(iterator.__anext__(), state, node)
+        except StopAsyncIteration:
+            return
+
+
+def create_coroutine_function(func: Callable, state: dict[str, Any]) -> Callable:
+    """
+    Turn a function defined with `async def` in code actions into a coroutine function. The interpreted body of each
+    call runs on the thread pool of the event loop of the state, with [`EventLoopThread.run_function`], so that
+    coroutines gathered together run concurrently: an `await` in their body only blocks their own thread.
+    """
+
+    async def run_in_loop_thread(*args: Any, **kwargs: Any) -> Any:
+        return func(*args, **kwargs)
+
+    def coroutine_func(*args: Any, **kwargs: Any) -> Coroutine:
+        if "_event_loop" not in state:
+            # Outside of async mode, e.g. with the real `asyncio.run`, the body blocks the loop awaiting it
+            return run_in_loop_thread(*args, **kwargs)
+        return state["_event_loop"].run_function(func, args, kwargs)
+
+    coroutine_func.__ast__ = func.__ast__
+    coroutine_func.__source__ = func.__source__
+    coroutine_func.__name__ = func.__name__
+    return coroutine_func
+
+
+@dataclass
+class LineProfile:
+    """
+    Profile of one source line of executed code.
+
+    Args:
+        lineno (`int`): Line number in the code.
+        source (`str`): Source of the line. Lines of functions defined in previous code actions are shown as
+            `<previous code> ...`, since their number refers to another code.
+        hits (`int`): Number of times statements starting on this line were executed.
+        duration (`float`): Wall time spent on this line, in seconds, excluding the lines it runs (e.g. the body of a
+            loop or of a called function).
+        operations (`int`): Number of interpreter operations spent on this line, excluding the lines it runs.
+        tool_duration (`float`): Part of `duration` spent in tool calls, in seconds.
+    """
+
+    lineno: int
+    source: str
+    hits: int = 0
+    duration: float = 0.0
+    operations: int = 0
+    tool_duration: float = 0.0
+
+
+@dataclass
+class CodeProfile:
+    """Line-level profile of a code execution, recorded by `LocalPythonExecutor(profile=True)`."""
+
+    lines: list[LineProfile]
+    duration: float
+
+    def dict(self) -> dict[str, Any]:
+        return {"lines": [asdict(line) for line in self.lines], "duration": self.duration}
+
+    def render(self, max_lines: int | None = 20) -> str:
+        """Render the profile as a table of the `max_lines` most time-consuming lines, in source order."""
+        lines = sorted(self.lines, key=lambda line: line.duration, reverse=True)[:max_lines]
+        rows = [f"{'Line':>5} {'Hits':>8} {'Time (s)':>10} {'% Time':>7} {'Ops':>10} {'Tools (s)':>10}  Source"]
+        for line in sorted(lines, key=lambda line: line.lineno):
+            share = 100 * line.duration / self.duration if self.duration else 0.0
+            rows.append(
+                f"{line.lineno:>5} {line.hits:>8} {line.duration:>10.4f} {share:>7.1f} {line.operations:>10} "
+                f"{line.tool_duration:>10.4f}  {line.source}"
+            )
+        if len(lines) < len(self.lines):
+            rows.append(f"... {len(self.lines) - len(lines)} more lines")
+        rows.append(f"Total: {self.duration:.4f} s")
+        return "\n".join(rows)
+
+    def __str__(self):
+        return self.render()
+
+
+class LineProfiler:
+    """
+    Records the wall time, operations and tool call time spent on each source line of a code execution.
+
+    Time and operations are attributed to the innermost statement being executed: when a statement starts, what was
+    spent since the last switch is charged to the enclosing statement, and when it ends, to the statement itself.
+    """
+
+    def __init__(self, code: str, module: ast.Module):
+        self.code_lines = code.splitlines()
+        self.own_statements = {id(node) for node in ast.walk(module) if isinstance(node, ast.stmt)}
+        self.lines: dict[tuple[int, str], LineProfile] = {}
+        self.start_time = self.last_time = time.perf_counter()
+        self.last_operations = 0
+        self.current: LineProfile | None = None
+
+    def _line(self, node: ast.stmt) -> LineProfile:
+        if id(node) in self.own_statements:
+            source = self.code_lines[node.lineno - 1].strip()
+        else:
+            source = "<previous code> " + ast.unparse(node).splitlines()[0]
+        key = (node.lineno, source)
+        if key not in self.lines:
+            self.lines[key] = LineProfile(lineno=node.lineno, source=source)
+        return self.lines[key]
+
+    def _switch(self, line: LineProfile | None, operations: int):
+        now = time.perf_counter()
+        if self.current is not None:
+            self.current.duration += now - self.last_time
+            self.current.operations += operations - self.last_operations
+        self.current, self.last_time, self.last_operations = line, now, operations
+
+    @contextmanager
+    def profile(self, node: ast.stmt, operations_count: dict[str, int]):
+        """Attribute what is spent while running the statement `node` to its line."""
+        parent = self.current
+        line = self._line(node)
+        line.hits += 1
+        # The operation counting the statement itself was already counted: it belongs to the statement
+        self._switch(line, operations_count["counter"] - 1)
+        try:
+            yield
+        finally:
+            self._switch(parent, operations_count["counter"])
+
+    def add_tool_duration(self, duration: float):
+        if self.current is not None:
+            self.current.tool_duration += duration
+
+    def report(self) -> CodeProfile:
+        return CodeProfile(
+            lines=sorted(self.lines.values(), key=lambda line: line.lineno),
+            duration=time.perf_counter() - self.start_time,
+        )
+
+
+@dataclass
+class ScheduledCall:
+    """
+    Tool call of a top-level statement, run concurrently with the other independent tool calls of its code action.
+
+    Args:
+        lineno (`int`): Line number of the statement in the code.
+        source (`str`): Source of the statement.
+        start (`float`): Start time of the call, in seconds since the start of the execution.
+        end (`float`): End time of the call, in seconds since the start of the execution.
+    """
+
+    lineno: int
+    source: str
+    start: float
+    end: float
+
+
+@dataclass
+class ConcurrencyTrace:
+    """Tool calls run concurrently in a code execution, recorded by `LocalPythonExecutor(parallel_tool_calls=True)`."""
+
+    calls: list[ScheduledCall]
+
+    def overlaps(self, call: ScheduledCall) -> list[ScheduledCall]:
+        """Other calls that were running at the same time as `call`."""
+        return [
+            other for other in self.calls if other is not call and other.start < call.end and call.start < other.end
+        ]
+
+    def dict(self) -> dict[str, Any]:
+        return {"calls": [asdict(call) for call in self.calls]}
+
+    def render(self) -> str:
+        """Render the trace as a table of the calls, with the lines of the calls that overlapped each of them."""
+        rows = [f"{'Line':>5} {'Start (s)':>10} {'End (s)':>10}  {'Overlapped':<12} Source"]
+        for call in sorted(self.calls, key=lambda call: call.lineno):
+            overlapped = ", ".join(str(other.lineno) for other in self.overlaps(call)) or "-"
+            rows.append(f"{call.lineno:>5} {call.start:>10.4f} {call.end:>10.4f}  {overlapped:<12} {call.source}")
+        return "\n".join(rows)
+
+    def __str__(self):
+        return self.render()
+
+
+@dataclass
+class ToolCallRecord:
+    """
+    Call to a tool made by executed code, recorded by the executor.
+
+    Args:
+        name (`str`): Name of the tool.
+        arguments (`dict[str, Any]`): Arguments of the call, by name. Extra positional arguments are under "args".
+        start_time (`float`): Start time of the call, as given by `time.time()`.
+        end_time (`float`, *optional*): End time of the call, as given by `time.time()`.
+        output_size (`int`, *optional*): Estimated size of the output in bytes, see `estimate_size`.
+        error (`str`, *optional*): Exception raised by the call, if any.
+    """
+
+    name: str
+    arguments: dict[str, Any]
+    start_time: float
+    end_time: float | None = None
+    output_size: int | None = None
+    error: str | None = None
+
+    @property
+    def duration(self) -> float | None:
+        return None if self.end_time is None else self.end_time - self.start_time
+
+    def dict(self) -> dict[str, Any]:
+        return {**asdict(self), "duration": self.duration}
+
+
 class BreakException(Exception):
     pass
 
@@ -273,15 +1227,6 @@ class ReturnException(Exception):
         self.value = value
 
 
-def get_iterable(obj):
-    if isinstance(obj, list):
-        return obj
-    elif hasattr(obj, "__iter__"):
-        return list(obj)
-    else:
-        raise InterpreterError("Object is not iterable")
-
-
 def fix_final_answer_code(code: str) -> str:
     """
     Sometimes an LLM can try to assign a variable to final_answer, which would break the final_answer() tool.
@@ -322,15 +1267,69 @@ def build_import_tree(authorized_imports: list[str]) -> dict[str, Any]:
     return tree
 
 
-def check_import_authorized(import_to_check: str, authorized_imports: list[str]) -> bool:
-    current_node = build_import_tree(authorized_imports)
-    for part in import_to_check.split("."):
-        if "*" in current_node:
-            return True
-        if part not in current_node:
-            return False
-        current_node = current_node[part]
-    return True
+class AuthorizedImports:
+    """
+    Immutable index of authorized imports, to be passed wherever the interpreter expects `authorized_imports`.
+
+    The import tree is built once, and the verdict for each checked module name is memoized: checks on the hot path
+    of the interpreter, such as the safety check of each module-typed value, then cost a dictionary lookup.
+
+    Args:
+        authorized_imports (`list[str]`): The authorized imports, e.g. `["numpy", "pandas.*"]`.
+    """
+
+    def __init__(self, authorized_imports: list[str]):
+        self._imports = tuple(authorized_imports)
+        self._tree = build_import_tree(self._imports)
+        self._verdicts: dict[str, bool] = {}
+
+    def is_authorized(self, import_to_check: str) -> bool:
+        verdict = self._verdicts.get(import_to_check)
+        if verdict is None:
+            verdict = self._verdicts[import_to_check] = self._check(import_to_check)
+        return verdict
+
+    def _check(self, import_to_check: str) -> bool:
+        current_node = self._tree
+        for part in import_to_check.split("."):
+            if "*" in current_node:
+                return True
+            if part not in current_node:
+                return False
+            current_node = current_node[part]
+        return True
+
+    def __iter__(self):
+        return iter(self._imports)
+
+    def __len__(self):
+        return len(self._imports)
+
+    def __contains__(self, item):
+        return item in self._imports
+
+    def __str__(self):
+        # Same format as the list of authorized imports, as it appears in error messages to the model
+        return str(list(self._imports))
+
+    def __repr__(self):
+        return f"AuthorizedImports({list(self._imports)})"
+
+
+@lru_cache(maxsize=64)
+def _get_authorized_imports_index(authorized_imports: tuple[str, ...]) -> AuthorizedImports:
+    return AuthorizedImports(authorized_imports)
+
+
+def get_authorized_imports_index(authorized_imports: list[str] | AuthorizedImports) -> AuthorizedImports:
+    """Return the `AuthorizedImports` index of a list of authorized imports, built once per configuration."""
+    if isinstance(authorized_imports, AuthorizedImports):
+        return authorized_imports
+    return _get_authorized_imports_index(tuple(authorized_imports))
+
+
+def check_import_authorized(import_to_check: str, authorized_imports: list[str] | AuthorizedImports) -> bool:
+    return get_authorized_imports_index(authorized_imports).is_authorized(import_to_check)
 
 
 def evaluate_attribute(
@@ -376,7 +1375,7 @@ def evaluate_lambda(
     args = [arg.arg for arg in lambda_expression.args.args]
 
     def lambda_func(*values: Any) -> Any:
-        new_state = state.copy()
+        new_state = Scope(state)
         for arg, value in zip(args, values):
             new_state[arg] = value
         return evaluate_ast(
@@ -419,10 +1418,10 @@ def create_function(
     custom_tools: dict[str, Callable],
     authorized_imports: list[str],
 ) -> Callable:
-    source_code = ast.unparse(func_def)
+    source_code = getattr(func_def, "source", None) or ast.unparse(func_def)
 
     def new_func(*args: Any, **kwargs: Any) -> Any:
-        func_state = state.copy()
+        func_state = Scope(state)
         arg_names = [arg.arg for arg in func_def.args.args]
         default_values = [
             evaluate_ast(d, state, static_tools, custom_tools, authorized_imports) for d in func_def.args.defaults
@@ -486,8 +1485,11 @@ def evaluate_function_def(
     custom_tools: dict[str, Callable],
     authorized_imports: list[str],
 ) -> Callable:
-    custom_tools[func_def.name] = create_function(func_def, state, static_tools, custom_tools, authorized_imports)
-    return custom_tools[func_def.name]
+    func = create_function(func_def, state, static_tools, custom_tools, authorized_imports)
+    if isinstance(func_def, ast.AsyncFunctionDef):
+        func = create_coroutine_function(func, state)
+    custom_tools[func_def.name] = func
+    return func
 
 
 def evaluate_class_def(
@@ -502,7 +1504,7 @@ def evaluate_class_def(
     class_dict = {}
 
     for stmt in class_def.body:
-        if isinstance(stmt, ast.FunctionDef):
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
             class_dict[stmt.name] = evaluate_ast(stmt, state, static_tools, custom_tools, authorized_imports)
         elif isinstance(stmt, ast.AnnAssign):
             if stmt.value:
@@ -745,7 +1747,8 @@ def set_value(
     elif isinstance(target, ast.Tuple):
         if not isinstance(value, tuple):
             if hasattr(value, "__iter__") and not isinstance(value, (str, bytes)):
-                value = tuple(value)
+                # Like CPython, read at most one value too many from iterators, e.g. an infinite generator
+                value = tuple(itertools.islice(value, len(target.elts) + 1))
             else:
                 raise InterpreterError("Cannot unpack non-tuple value")
         if len(target.elts) != len(value):
@@ -761,6 +1764,16 @@ def set_value(
         setattr(obj, target.attr, value)
 
 
+def print_to_state(state: dict[str, Any], args: tuple, sep: str = " ", end: str = "\n"):
+    """
+    Append printed values to the print outputs of the state. Values other than strings are rendered with
+    `bounded_str`, so that printing a huge object does not build a string that the outputs would truncate anyway.
+    """
+    max_length = state["_print_outputs"].max_length
+    texts = (str(arg) if isinstance(arg, str) or max_length is None else bounded_str(arg, max_length) for arg in args)
+    state["_print_outputs"] += sep.join(texts) + end
+
+
 def evaluate_call(
     call: ast.Call,
     state: dict[str, Any],
@@ -771,7 +1784,7 @@ def evaluate_call(
     if not isinstance(call.func, (ast.Call, ast.Lambda, ast.Attribute, ast.Name, ast.Subscript)):
         raise InterpreterError(f"This is not a correct function: {call.func}).")
 
-    func, func_name = None, None
+    func, func_name, is_static_tool = None, None, False
 
     if isinstance(call.func, ast.Call):
         func = evaluate_ast(call.func, state, static_tools, custom_tools, authorized_imports)
@@ -789,6 +1802,7 @@ def evaluate_call(
             func = state[func_name]
         elif func_name in static_tools:
             func = static_tools[func_name]
+            is_static_tool = True
         elif func_name in custom_tools:
             func = custom_tools[func_name]
         elif func_name in ERRORS:
@@ -822,27 +1836,102 @@ def evaluate_call(
             # Normal keyword argument
             kwargs[keyword.arg] = evaluate_ast(keyword.value, state, static_tools, custom_tools, authorized_imports)
 
-    if func_name == "super":
-        if not args:
-            if "__class__" in state and "self" in state:
-                return super(state["__class__"], state["self"])
-            else:
-                raise InterpreterError("super() needs at least one argument")
-        cls = args[0]
-        if not isinstance(cls, type):
-            raise InterpreterError("super() argument 1 must be type")
-        if len(args) == 1:
-            return super(cls)
-        elif len(args) == 2:
-            instance = args[1]
-            return super(cls, instance)
-        else:
-            raise InterpreterError("super() takes at most 2 arguments")
+    result = call_function(func, func_name, args, kwargs, state, static_tools, is_static_tool)
+    if "_execution_budget" in state:
+        state["_execution_budget"].check(call)
+    return result
+
+
+def get_tool_call_arguments(tool: Tool, args: tuple | list, kwargs: dict[str, Any]) -> dict[str, Any]:
+    """Return the arguments of a tool call by name, using the inputs of the tool."""
+    if not args:
+        return dict(kwargs)
+    if len(tool.inputs) < len(args):
+        return {"args": list(args), **kwargs}
+    return {**dict(zip(tool.inputs, args)), **kwargs}
+
+
+def call_tool(name: str, tool: Callable, args: tuple | list, kwargs: dict[str, Any], state: dict[str, Any]) -> Any:
+    """
+    Call a tool from executed code, recording the call in the `ToolCallRecord`s of the state under the key
+    "_tool_calls" if the tool is a [`Tool`], and its duration in the profiler if the code is profiled. Only the first
+    `MAX_TOOL_CALL_RECORDS` calls of an execution are recorded.
+    """
+    tool_calls = state.get("_tool_calls")
+    profiler = state.get("_profiler")
+    if tool_calls is None and profiler is None:
+        return tool(*args, **kwargs)
+    record = None
+    if tool_calls is not None and len(tool_calls) < MAX_TOOL_CALL_RECORDS:
+        recorded_tool = tool if isinstance(tool, Tool) else inspect.unwrap(tool)
+        if isinstance(recorded_tool, Tool):
+            record = ToolCallRecord(
+                name=name, arguments=get_tool_call_arguments(recorded_tool, args, kwargs), start_time=time.time()
+            )
+            tool_calls.append(record)
+    start_time = time.perf_counter()
+    try:
+        output = tool(*args, **kwargs)
+    except FinalAnswerException as e:
+        if record is not None:
+            record.output_size = estimate_size(e.value)
+        raise
+    except BaseException as e:
+        if record is not None:
+            record.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        if record is not None:
+            record.end_time = time.time()
+        if profiler is not None:
+            profiler.add_tool_duration(time.perf_counter() - start_time)
+    if record is not None:
+        record.output_size = estimate_size(output)
+    return output
+
+
+def call_function(
+    func: Callable,
+    func_name: str | None,
+    args: list[Any],
+    kwargs: dict[str, Any],
+    state: dict[str, Any],
+    static_tools: dict[str, Callable],
+    is_static_tool: bool = False,
+) -> Any:
+    """
+    Call a resolved function with already evaluated arguments, applying the interpreter's special cases
+    (`super`, `print`) and its security checks on builtins and dunder functions.
+
+    `is_static_tool` tells that the function was looked up in `static_tools`: it is then allowed even if it is a
+    builtin, which spares the lookup of its module.
+    """
+    if func_name == "super":
+        if not args:
+            if "__class__" in state and "self" in state:
+                return super(state["__class__"], state["self"])
+            else:
+                raise InterpreterError("super() needs at least one argument")
+        cls = args[0]
+        if not isinstance(cls, type):
+            raise InterpreterError("super() argument 1 must be type")
+        if len(args) == 1:
+            return super(cls)
+        elif len(args) == 2:
+            instance = args[1]
+            return super(cls, instance)
+        else:
+            raise InterpreterError("super() takes at most 2 arguments")
     elif func_name == "print":
-        state["_print_outputs"] += " ".join(map(str, args)) + "\n"
+        print_to_state(state, args)
         return None
     else:  # Assume it's a callable object
-        if (inspect.getmodule(func) == builtins) and inspect.isbuiltin(func) and (func not in static_tools.values()):
+        if (
+            not is_static_tool
+            and inspect.isbuiltin(func)
+            and (inspect.getmodule(func) == builtins)
+            and (func not in static_tools.values())
+        ):
             raise InterpreterError(
                 f"Invoking a builtin function that has not been explicitly added as a tool is not allowed ({func_name})."
             )
@@ -854,6 +1943,8 @@ def evaluate_call(
             and (func.__name__ not in ALLOWED_DUNDER_METHODS)
         ):
             raise InterpreterError(f"Forbidden call to dunder function: {func.__name__}")
+        if func_name not in BASE_PYTHON_TOOLS and static_tools.get(func_name) is func:
+            return call_tool(func_name, func, args, kwargs, state)
         return func(*args, **kwargs)
 
 
@@ -887,6 +1978,8 @@ def evaluate_name(
     if name.id in state:
         return state[name.id]
     elif name.id in static_tools:
+        if isinstance(static_tools, StaticTools):
+            return static_tools.get_safe(name.id, authorized_imports)
         return safer_func(static_tools[name.id], static_tools=static_tools, authorized_imports=authorized_imports)
     elif name.id in custom_tools:
         return custom_tools[name.id]
@@ -963,7 +2056,7 @@ def evaluate_if(
 
 
 def evaluate_for(
-    for_loop: ast.For,
+    for_loop: ast.For | ast.AsyncFor,
     state: dict[str, Any],
     static_tools: dict[str, Callable],
     custom_tools: dict[str, Callable],
@@ -971,6 +2064,8 @@ def evaluate_for(
 ) -> Any:
     result = None
     iterator = evaluate_ast(for_loop.iter, state, static_tools, custom_tools, authorized_imports)
+    if isinstance(for_loop, ast.AsyncFor):
+        iterator = iterate_async(iterator, state, for_loop)
     for counter in iterator:
         set_value(
             for_loop.target,
@@ -992,6 +2087,34 @@ def evaluate_for(
     return result
 
 
+def iterate_comprehension(
+    generators: list[ast.comprehension],
+    state: dict[str, Any],
+    static_tools: dict[str, Callable],
+    custom_tools: dict[str, Callable],
+    authorized_imports: list[str],
+    index: int = 0,
+) -> Generator[dict[str, Any]]:
+    """
+    Lazily yield the scope of each element of a comprehension. As in CPython, each `for` clause is nested in the
+    previous ones, and iterables are consumed one value at a time.
+    """
+    generator = generators[index]
+    for value in evaluate_ast(generator.iter, state, static_tools, custom_tools, authorized_imports):
+        new_state = Scope(state)
+        set_value(generator.target, value, new_state, static_tools, custom_tools, authorized_imports)
+        if all(
+            evaluate_ast(if_clause, new_state, static_tools, custom_tools, authorized_imports)
+            for if_clause in generator.ifs
+        ):
+            if index == len(generators) - 1:
+                yield new_state
+            else:
+                yield from iterate_comprehension(
+                    generators, new_state, static_tools, custom_tools, authorized_imports, index + 1
+                )
+
+
 def evaluate_listcomp(
     listcomp: ast.ListComp,
     state: dict[str, Any],
@@ -999,41 +2122,12 @@ def evaluate_listcomp(
     custom_tools: dict[str, Callable],
     authorized_imports: list[str],
 ) -> list[Any]:
-    def inner_evaluate(generators: list[ast.comprehension], index: int, current_state: dict[str, Any]) -> list[Any]:
-        if index >= len(generators):
-            return [
-                evaluate_ast(
-                    listcomp.elt,
-                    current_state,
-                    static_tools,
-                    custom_tools,
-                    authorized_imports,
-                )
-            ]
-        generator = generators[index]
-        iter_value = evaluate_ast(
-            generator.iter,
-            current_state,
-            static_tools,
-            custom_tools,
-            authorized_imports,
+    return [
+        evaluate_ast(listcomp.elt, new_state, static_tools, custom_tools, authorized_imports)
+        for new_state in iterate_comprehension(
+            listcomp.generators, state, static_tools, custom_tools, authorized_imports
         )
-        result = []
-        for value in iter_value:
-            new_state = current_state.copy()
-            if isinstance(generator.target, ast.Tuple):
-                for idx, elem in enumerate(generator.target.elts):
-                    new_state[elem.id] = value[idx]
-            else:
-                new_state[generator.target.id] = value
-            if all(
-                evaluate_ast(if_clause, new_state, static_tools, custom_tools, authorized_imports)
-                for if_clause in generator.ifs
-            ):
-                result.extend(inner_evaluate(generators, index + 1, new_state))
-        return result
-
-    return inner_evaluate(listcomp.generators, 0, state)
+    ]
 
 
 def evaluate_setcomp(
@@ -1043,32 +2137,12 @@ def evaluate_setcomp(
     custom_tools: dict[str, Callable],
     authorized_imports: list[str],
 ) -> set[Any]:
-    result = set()
-    for gen in setcomp.generators:
-        iter_value = evaluate_ast(gen.iter, state, static_tools, custom_tools, authorized_imports)
-        for value in iter_value:
-            new_state = state.copy()
-            set_value(
-                gen.target,
-                value,
-                new_state,
-                static_tools,
-                custom_tools,
-                authorized_imports,
-            )
-            if all(
-                evaluate_ast(if_clause, new_state, static_tools, custom_tools, authorized_imports)
-                for if_clause in gen.ifs
-            ):
-                element = evaluate_ast(
-                    setcomp.elt,
-                    new_state,
-                    static_tools,
-                    custom_tools,
-                    authorized_imports,
-                )
-                result.add(element)
-    return result
+    return {
+        evaluate_ast(setcomp.elt, new_state, static_tools, custom_tools, authorized_imports)
+        for new_state in iterate_comprehension(
+            setcomp.generators, state, static_tools, custom_tools, authorized_imports
+        )
+    }
 
 
 def evaluate_try(
@@ -1177,8 +2251,39 @@ def evaluate_with(
             context.__exit__(None, None, None)
 
 
-def get_safe_module(raw_module, authorized_imports, visited=None):
-    """Creates a safe copy of a module or returns the original if it's a function"""
+def evaluate_async_with(
+    with_node: ast.AsyncWith,
+    state: dict[str, Any],
+    static_tools: dict[str, Callable],
+    custom_tools: dict[str, Callable],
+    authorized_imports: list[str],
+) -> None:
+    managers = []
+    for item in with_node.items:
+        manager = evaluate_ast(item.context_expr, state, static_tools, custom_tools, authorized_imports)
+        value = run_awaitable(manager.__aenter__(), state, with_node)
+        managers.append(manager)
+        if item.optional_vars:
+            set_value(item.optional_vars, value, state, static_tools, custom_tools, authorized_imports)
+
+    try:
+        for stmt in with_node.body:
+            evaluate_ast(stmt, state, static_tools, custom_tools, authorized_imports)
+    except Exception as e:
+        for manager in reversed(managers):
+            run_awaitable(manager.__aexit__(type(e), e, e.__traceback__), state, with_node)
+        raise
+    else:
+        for manager in reversed(managers):
+            run_awaitable(manager.__aexit__(None, None, None), state, with_node)
+
+
+def get_safe_module(raw_module, authorized_imports, visited=None, wrapped_modules=None):
+    """
+    Creates a safe copy of a module or returns the original if it's a function.
+
+    If `wrapped_modules` is given, each created safe module is recorded in it, mapped to its raw module.
+    """
     # If it's a function or non-module object, return it directly
     if not isinstance(raw_module, ModuleType):
         return raw_module
@@ -1195,6 +2300,8 @@ def get_safe_module(raw_module, authorized_imports, visited=None):
 
     # Create new module for actual modules
     safe_module = ModuleType(raw_module.__name__)
+    if wrapped_modules is not None:
+        wrapped_modules[safe_module] = raw_module
 
     # Copy all attributes by reference, recursively checking modules
     for attr_name in dir(raw_module):
@@ -1208,19 +2315,135 @@ def get_safe_module(raw_module, authorized_imports, visited=None):
             continue
         # Recursively process nested modules, passing visited set
         if isinstance(attr_value, ModuleType):
-            attr_value = get_safe_module(attr_value, authorized_imports, visited=visited)
+            attr_value = get_safe_module(
+                attr_value, authorized_imports, visited=visited, wrapped_modules=wrapped_modules
+            )
 
         setattr(safe_module, attr_name, attr_value)
 
     return safe_module
 
 
+class SafeModuleCache:
+    """
+    Process-wide cache of the safe module wrappers built by `get_safe_module`, keyed by module identity and
+    authorized imports.
+
+    Building a wrapper walks the whole package tree, which is slow for large packages like numpy or pandas: the cache
+    builds it once, then each lookup returns a copy of the cached tree of wrappers. Copies keep agents isolated from
+    each other, as they were with fresh wrappers: assigning an attribute on an imported module does not leak to other
+    imports. Copies are lazy: a lookup only copies the top-level module, and each submodule is copied when first
+    accessed.
+
+    A cached wrapper is stale as soon as an attribute of its module was added, removed or reassigned since it was built,
+    for instance when a submodule is imported later on: the whole tree is then rebuilt on the next lookup.
+    """
+
+    def __init__(self):
+        # (raw module, authorized imports) -> (safe module, wrappers), where wrappers maps each safe module of the tree
+        # to its raw module, a snapshot of the raw module's attributes, its plain attributes and its wrapped submodules
+        self._entries: dict[tuple[ModuleType, frozenset[str]], tuple[ModuleType, dict[ModuleType, tuple]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, raw_module: Any, authorized_imports: list[str]) -> Any:
+        """Return a safe copy of a module, or the original object if it's not a module."""
+        if not isinstance(raw_module, ModuleType):
+            return raw_module
+        key = (raw_module, frozenset(authorized_imports))
+        entry = self._entries.get(key)
+        if entry is None or self._is_stale(*entry[1][entry[0]][:2]):
+            entry = self._build(key)
+        return self._copy(entry[0], entry, key, {})
+
+    def _build(self, key: tuple[ModuleType, frozenset[str]]) -> tuple[ModuleType, dict[ModuleType, tuple]]:
+        raw_module, authorized_imports = key
+        wrapped_modules = {}
+        safe_module = get_safe_module(raw_module, list(authorized_imports), wrapped_modules=wrapped_modules)
+        wrappers = {}
+        for wrapper, raw in wrapped_modules.items():
+            attributes, submodules = {}, {}
+            for name, value in vars(wrapper).items():
+                if isinstance(value, ModuleType) and value in wrapped_modules:
+                    submodules[name] = value
+                else:
+                    attributes[name] = value
+            wrappers[wrapper] = (raw, dict(vars(raw)), attributes, submodules)
+        entry = (safe_module, wrappers)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    @staticmethod
+    def _is_stale(raw_module: ModuleType, snapshot: dict[str, Any]) -> bool:
+        attributes = vars(raw_module)
+        return len(attributes) != len(snapshot) or any(
+            name not in attributes or attributes[name] is not value for name, value in snapshot.items()
+        )
+
+    def _copy(self, safe_module: ModuleType, entry: tuple, key: tuple, copies: dict) -> ModuleType:
+        wrappers = entry[1]
+        _, _, attributes, submodules = wrappers[safe_module]
+        module_copy = copies[safe_module] = ModuleType(safe_module.__name__)
+        copy_attributes = vars(module_copy)
+        copy_attributes.update(attributes)
+        if not submodules:
+            return module_copy
+        fallback = attributes.get("__getattr__")
+
+        def load_submodule(name: str) -> Any:
+            submodule = submodules.get(name)
+            if submodule is None:
+                if fallback is not None:
+                    return fallback(name)
+                raise AttributeError(f"module {safe_module.__name__!r} has no attribute {name!r}")
+            raw_submodule, snapshot = wrappers[submodule][:2]
+            if self._is_stale(raw_submodule, snapshot):
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                value = self.get(raw_submodule, key[1])
+            else:
+                value = copies.get(submodule) or self._copy(submodule, entry, key, copies)
+            copy_attributes[name] = value
+            return value
+
+        # Module-level __getattr__ and __dir__ (PEP 562) resolve submodules that were not copied yet
+        copy_attributes["__getattr__"] = load_submodule
+        copy_attributes["__dir__"] = lambda: sorted({*copy_attributes, *submodules})
+        return module_copy
+
+    def prewarm(self, module_names: list[str], authorized_imports: list[str]):
+        """Build the wrappers of the given modules ahead of their first import; wildcard suffixes are ignored."""
+        for module_name in module_names:
+            module_name = module_name.removesuffix(".*")
+            if "*" in module_name:
+                continue
+            try:
+                self.get(import_module(module_name), authorized_imports)
+            except ImportError as e:
+                logger.info(f"Skipping pre-warming of module {module_name}: {type(e).__name__} - {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+SAFE_MODULE_CACHE = SafeModuleCache()
+
+
+def get_imported_module(raw_module: ModuleType, state: dict[str, Any], authorized_imports) -> ModuleType:
+    """Safe version of an imported module. In async mode, `asyncio` is replaced by the curated module of the event loop."""
+    if raw_module is asyncio and "_event_loop" in state:
+        return state["_event_loop"].asyncio_module
+    return SAFE_MODULE_CACHE.get(raw_module, authorized_imports)
+
+
 def evaluate_import(expression, state, authorized_imports):
     if isinstance(expression, ast.Import):
         for alias in expression.names:
             if check_import_authorized(alias.name, authorized_imports):
                 raw_module = import_module(alias.name)
-                state[alias.asname or alias.name] = get_safe_module(raw_module, authorized_imports)
+                state[alias.asname or alias.name] = get_imported_module(raw_module, state, authorized_imports)
             else:
                 raise InterpreterError(
                     f"Import of {alias.name} is not allowed. Authorized imports are: {str(authorized_imports)}"
@@ -1229,7 +2452,7 @@ def evaluate_import(expression, state, authorized_imports):
     elif isinstance(expression, ast.ImportFrom):
         if check_import_authorized(expression.module, authorized_imports):
             raw_module = __import__(expression.module, fromlist=[alias.name for alias in expression.names])
-            module = get_safe_module(raw_module, authorized_imports)
+            module = get_imported_module(raw_module, state, authorized_imports)
             if expression.names[0].name == "*":  # Handle "from module import *"
                 if hasattr(module, "__all__"):  # If module has __all__, import only those names
                     for name in module.__all__:
@@ -1259,37 +2482,9 @@ def evaluate_dictcomp(
     authorized_imports: list[str],
 ) -> dict[Any, Any]:
     result = {}
-    for gen in dictcomp.generators:
-        iter_value = evaluate_ast(gen.iter, state, static_tools, custom_tools, authorized_imports)
-        for value in iter_value:
-            new_state = state.copy()
-            set_value(
-                gen.target,
-                value,
-                new_state,
-                static_tools,
-                custom_tools,
-                authorized_imports,
-            )
-            if all(
-                evaluate_ast(if_clause, new_state, static_tools, custom_tools, authorized_imports)
-                for if_clause in gen.ifs
-            ):
-                key = evaluate_ast(
-                    dictcomp.key,
-                    new_state,
-                    static_tools,
-                    custom_tools,
-                    authorized_imports,
-                )
-                val = evaluate_ast(
-                    dictcomp.value,
-                    new_state,
-                    static_tools,
-                    custom_tools,
-                    authorized_imports,
-                )
-                result[key] = val
+    for new_state in iterate_comprehension(dictcomp.generators, state, static_tools, custom_tools, authorized_imports):
+        key = evaluate_ast(dictcomp.key, new_state, static_tools, custom_tools, authorized_imports)
+        result[key] = evaluate_ast(dictcomp.value, new_state, static_tools, custom_tools, authorized_imports)
     return result
 
 
@@ -1301,29 +2496,10 @@ def evaluate_generatorexp(
     authorized_imports: list[str],
 ) -> Generator[Any]:
     def generator():
-        for gen in genexp.generators:
-            iter_value = evaluate_ast(gen.iter, state, static_tools, custom_tools, authorized_imports)
-            for value in iter_value:
-                new_state = state.copy()
-                set_value(
-                    gen.target,
-                    value,
-                    new_state,
-                    static_tools,
-                    custom_tools,
-                    authorized_imports,
-                )
-                if all(
-                    evaluate_ast(if_clause, new_state, static_tools, custom_tools, authorized_imports)
-                    for if_clause in gen.ifs
-                ):
-                    yield evaluate_ast(
-                        genexp.elt,
-                        new_state,
-                        static_tools,
-                        custom_tools,
-                        authorized_imports,
-                    )
+        for new_state in iterate_comprehension(
+            genexp.generators, state, static_tools, custom_tools, authorized_imports
+        ):
+            yield evaluate_ast(genexp.elt, new_state, static_tools, custom_tools, authorized_imports)
 
     return generator()
 
@@ -1348,9 +2524,9 @@ def evaluate_delete(
     for target in delete_node.targets:
         if isinstance(target, ast.Name):
             # Handle simple variable deletion (del x)
-            if target.id in state:
+            try:
                 del state[target.id]
-            else:
+            except KeyError:
                 raise InterpreterError(f"Cannot delete name '{target.id}': name is not defined")
         elif isinstance(target, ast.Subscript):
             # Handle index/key deletion (del x[y])
@@ -1388,15 +2564,36 @@ def evaluate_ast(
             Functions that may be called during the evaluation. Trying to change one of these static_tools will raise an error.
         custom_tools (`Dict[str, Callable]`):
             Functions that may be called during the evaluation. These custom_tools can be overwritten.
-        authorized_imports (`List[str]`):
+        authorized_imports (`List[str]` or `AuthorizedImports`):
             The list of modules that can be imported by the code. By default, only a few safe modules are allowed.
             If it contains "*", it will authorize any import. Use this at your own risk!
+            Passing an `AuthorizedImports` index avoids rebuilding the import tree on each authorization check.
     """
-    if state.setdefault("_operations_count", {"counter": 0})["counter"] >= MAX_OPERATIONS:
+    try:
+        operations_count = state["_operations_count"]
+    except KeyError:
+        operations_count = state.setdefault("_operations_count", {"counter": 0})
+    if operations_count["counter"] >= MAX_OPERATIONS:
         raise InterpreterError(
             f"Reached the max number of operations of {MAX_OPERATIONS}. Maybe there is an infinite loop somewhere in the code, or you're just asking too many calculations."
         )
-    state["_operations_count"]["counter"] += 1
+    operations_count["counter"] += 1
+    if not operations_count["counter"] % BUDGET_CHECK_INTERVAL and "_execution_budget" in state:
+        state["_execution_budget"].check(expression)
+    if isinstance(expression, ast.stmt) and "_profiler" in state:
+        with state["_profiler"].profile(expression, operations_count):
+            return evaluate_ast_node(expression, state, static_tools, custom_tools, authorized_imports)
+    return evaluate_ast_node(expression, state, static_tools, custom_tools, authorized_imports)
+
+
+def evaluate_ast_node(
+    expression: ast.AST,
+    state: dict[str, Any],
+    static_tools: dict[str, Callable],
+    custom_tools: dict[str, Callable],
+    authorized_imports: list[str],
+):
+    """Evaluate a node of the abstract syntax tree by dispatching on its type, without the bookkeeping of `evaluate_ast`."""
     common_params = (state, static_tools, custom_tools, authorized_imports)
     if isinstance(expression, ast.Assign):
         # Assignment -> we evaluate the assignment which should update the state
@@ -1441,7 +2638,7 @@ def evaluate_ast(
         return evaluate_condition(expression, *common_params)
     elif isinstance(expression, ast.Lambda):
         return evaluate_lambda(expression, *common_params)
-    elif isinstance(expression, ast.FunctionDef):
+    elif isinstance(expression, (ast.FunctionDef, ast.AsyncFunctionDef)):
         return evaluate_function_def(expression, *common_params)
     elif isinstance(expression, ast.Dict):
         # Dict -> evaluate all keys and values
@@ -1451,7 +2648,7 @@ def evaluate_ast(
     elif isinstance(expression, ast.Expr):
         # Expression -> evaluate the content
         return evaluate_ast(expression.value, *common_params)
-    elif isinstance(expression, ast.For):
+    elif isinstance(expression, (ast.For, ast.AsyncFor)):
         # For loop -> execute the loop
         return evaluate_for(expression, *common_params)
     elif isinstance(expression, ast.FormattedValue):
@@ -1515,160 +2712,2604 @@ def evaluate_ast(
         return None
     elif isinstance(expression, ast.Delete):
         return evaluate_delete(expression, *common_params)
+    elif isinstance(expression, ast.Await):
+        # Await -> wait for the awaitable on the event loop of the executor
+        return run_awaitable(evaluate_ast(expression.value, *common_params), state, expression)
+    elif isinstance(expression, ast.AsyncWith):
+        return evaluate_async_with(expression, *common_params)
     else:
         # For now we refuse anything else. Let's add things as we need them.
         raise InterpreterError(f"{expression.__class__.__name__} is not supported.")
 
 
-class FinalAnswerException(Exception):
-    def __init__(self, value):
-        self.value = value
+# Signature shared by all the closures built by `compile_ast`: (state, static_tools, custom_tools, authorized_imports)
+CompiledNode = Callable[[dict[str, Any], dict[str, Callable], dict[str, Callable], list[str]], Any]
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.FloorDiv: operator.floordiv,
+    ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+}
 
+INPLACE_OPERATORS = {
+    ast.Add: operator.iadd,
+    ast.Sub: operator.isub,
+    ast.Mult: operator.imul,
+    ast.Div: operator.itruediv,
+    ast.Mod: operator.imod,
+    ast.Pow: operator.ipow,
+    ast.FloorDiv: operator.ifloordiv,
+    ast.BitAnd: operator.iand,
+    ast.BitOr: operator.ior,
+    ast.BitXor: operator.ixor,
+    ast.LShift: operator.ilshift,
+    ast.RShift: operator.irshift,
+}
 
-def evaluate_python_code(
-    code: str,
-    static_tools: dict[str, Callable] | None = None,
-    custom_tools: dict[str, Callable] | None = None,
-    state: dict[str, Any] | None = None,
-    authorized_imports: list[str] = BASE_BUILTIN_MODULES,
-    max_print_outputs_length: int = DEFAULT_MAX_LEN_OUTPUT,
-):
-    """
-    Evaluate a python expression using the content of the variables stored in a state and only evaluating a given set
-    of functions.
+COMPARISON_OPERATORS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+    ast.In: lambda left, right: left in right,
+    ast.NotIn: lambda left, right: left not in right,
+}
 
-    This function will recurse through the nodes of the tree provided.
 
-    Args:
-        code (`str`):
-            The code to evaluate.
-        static_tools (`Dict[str, Callable]`):
-            The functions that may be called during the evaluation. These can also be agents in a multiagent setting.
-            These tools cannot be overwritten in the code: any assignment to their name will raise an error.
-        custom_tools (`Dict[str, Callable]`):
-            The functions that may be called during the evaluation.
-            These tools can be overwritten in the code: any assignment to their name will overwrite them.
-        state (`Dict[str, Any]`):
-            A dictionary mapping variable names to values. The `state` should contain the initial inputs but will be
-            updated by this function to contain all variables as they are evaluated.
-            The print outputs will be stored in the state under the key "_print_outputs".
+def compiled_node(node: ast.AST, evaluate: CompiledNode, check_result: bool = True) -> CompiledNode:
+    """
+    Wrap a node closure with the bookkeeping that `evaluate_ast` applies to every node it visits: the operations
+    count against `MAX_OPERATIONS`, the execution budget and the profiling of statements, then the safety check of the
+    returned value.
     """
-    try:
-        expression = ast.parse(code)
-    except SyntaxError as e:
-        raise InterpreterError(
-            f"Code parsing failed on line {e.lineno} due to: {type(e).__name__}\n"
-            f"{e.text}"
-            f"{' ' * (e.offset or 0)}^\n"
-            f"Error: {str(e)}"
-        )
 
-    if state is None:
-        state = {}
-    static_tools = static_tools.copy() if static_tools is not None else {}
-    custom_tools = custom_tools if custom_tools is not None else {}
-    result = None
-    state["_print_outputs"] = PrintContainer()
-    state["_operations_count"] = {"counter": 0}
+    is_statement = isinstance(node, ast.stmt)
 
-    if "final_answer" in static_tools:
-        previous_final_answer = static_tools["final_answer"]
+    def run(state, static_tools, custom_tools, authorized_imports):
+        try:
+            operations_count = state["_operations_count"]
+        except KeyError:
+            operations_count = state.setdefault("_operations_count", {"counter": 0})
+        if operations_count["counter"] >= MAX_OPERATIONS:
+            raise InterpreterError(
+                f"Reached the max number of operations of {MAX_OPERATIONS}. Maybe there is an infinite loop somewhere in the code, or you're just asking too many calculations."
+            )
+        operations_count["counter"] += 1
+        if not operations_count["counter"] % BUDGET_CHECK_INTERVAL and "_execution_budget" in state:
+            state["_execution_budget"].check(node)
+        if is_statement and "_profiler" in state:
+            with state["_profiler"].profile(node, operations_count):
+                result = evaluate(state, static_tools, custom_tools, authorized_imports)
+        else:
+            result = evaluate(state, static_tools, custom_tools, authorized_imports)
+        if check_result and type(result) not in SAFE_RESULT_TYPES:
+            check_safer_result(result, static_tools, authorized_imports)
+        return result
 
-        def final_answer(*args, **kwargs):  # Allow arbitrary arguments to be passed
-            raise FinalAnswerException(previous_final_answer(*args, **kwargs))
+    return run
 
-        static_tools["final_answer"] = final_answer
 
-    try:
-        for node in expression.body:
-            result = evaluate_ast(node, state, static_tools, custom_tools, authorized_imports)
-        state["_print_outputs"].value = truncate_content(
-            str(state["_print_outputs"]), max_length=max_print_outputs_length
-        )
-        is_final_answer = False
-        return result, is_final_answer
-    except FinalAnswerException as e:
-        state["_print_outputs"].value = truncate_content(
-            str(state["_print_outputs"]), max_length=max_print_outputs_length
-        )
-        is_final_answer = True
-        return e.value, is_final_answer
-    except Exception as e:
-        state["_print_outputs"].value = truncate_content(
-            str(state["_print_outputs"]), max_length=max_print_outputs_length
-        )
-        raise InterpreterError(
-            f"Code execution failed at line '{ast.get_source_segment(code, node)}' due to: {type(e).__name__}: {e}"
-        )
+def compile_statements(statements: list[ast.AST]) -> list[CompiledNode]:
+    return [compile_ast(statement) for statement in statements]
 
 
-@dataclass
-class CodeOutput:
-    output: Any
-    logs: str
-    is_final_answer: bool
+def compile_target(target: ast.AST) -> Callable[..., None]:
+    """Compile an assignment target into a closure `(value, state, static_tools, custom_tools, authorized_imports)`."""
+    if isinstance(target, ast.Name):
+        name_id = target.id
 
+        def assign_name(value, state, static_tools, custom_tools, authorized_imports):
+            if name_id in static_tools:
+                raise InterpreterError(f"Cannot assign to name '{name_id}': doing this would erase the existing tool!")
+            state[name_id] = value
 
-class PythonExecutor(ABC):
-    @abstractmethod
-    def send_tools(self, tools: dict[str, Tool]) -> None: ...
+        return assign_name
+    elif isinstance(target, ast.Tuple):
+        elements = [compile_target(elt) for elt in target.elts]
+
+        def assign_tuple(value, state, static_tools, custom_tools, authorized_imports):
+            if not isinstance(value, tuple):
+                if hasattr(value, "__iter__") and not isinstance(value, (str, bytes)):
+                    value = tuple(itertools.islice(value, len(elements) + 1))
+                else:
+                    raise InterpreterError("Cannot unpack non-tuple value")
+            if len(elements) != len(value):
+                raise InterpreterError("Cannot unpack tuple of wrong size")
+            for i, assign_element in enumerate(elements):
+                assign_element(value[i], state, static_tools, custom_tools, authorized_imports)
+
+        return assign_tuple
+    elif isinstance(target, ast.Subscript):
+        evaluate_obj, evaluate_key = compile_ast(target.value), compile_ast(target.slice)
 
-    @abstractmethod
-    def send_variables(self, variables: dict[str, Any]) -> None: ...
+        def assign_subscript(value, state, static_tools, custom_tools, authorized_imports):
+            obj = evaluate_obj(state, static_tools, custom_tools, authorized_imports)
+            key = evaluate_key(state, static_tools, custom_tools, authorized_imports)
+            obj[key] = value
 
-    @abstractmethod
-    def __call__(self, code_action: str) -> CodeOutput: ...
+        return assign_subscript
+    elif isinstance(target, ast.Attribute):
+        evaluate_obj, attr = compile_ast(target.value), target.attr
 
+        def assign_attribute(value, state, static_tools, custom_tools, authorized_imports):
+            obj = evaluate_obj(state, static_tools, custom_tools, authorized_imports)
+            setattr(obj, attr, value)
 
-class LocalPythonExecutor(PythonExecutor):
-    """
-    Executor of Python code in a local environment.
+        return assign_attribute
 
-    This executor evaluates Python code with restricted access to imports and built-in functions,
-    making it suitable for running untrusted code. It maintains state between executions,
-    allows for custom tools and functions to be made available to the code, and captures
-    print outputs separately from return values.
+    # Like `set_value`, other targets are silently ignored
+    return lambda value, state, static_tools, custom_tools, authorized_imports: None
 
-    Args:
-        additional_authorized_imports (`list[str]`):
-            Additional authorized imports for the executor.
-        max_print_outputs_length (`int`, defaults to `DEFAULT_MAX_LEN_OUTPUT=50_000`):
-            Maximum length of the print outputs.
-        additional_functions (`dict[str, Callable]`, *optional*):
-            Additional Python functions to be added to the executor.
-    """
 
-    def __init__(
-        self,
-        additional_authorized_imports: list[str],
-        max_print_outputs_length: int | None = None,
-        additional_functions: dict[str, Callable] | None = None,
-    ):
-        self.custom_tools = {}
-        self.state = {"__name__": "__main__"}
-        self.max_print_outputs_length = max_print_outputs_length
-        if max_print_outputs_length is None:
-            self.max_print_outputs_length = DEFAULT_MAX_LEN_OUTPUT
-        self.additional_authorized_imports = additional_authorized_imports
-        self.authorized_imports = list(set(BASE_BUILTIN_MODULES) | set(self.additional_authorized_imports))
-        self._check_authorized_imports_are_installed()
-        self.static_tools = None
-        self.additional_functions = additional_functions or {}
+def compile_unsupported(expression: Any) -> CompiledNode:
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        raise InterpreterError(f"{expression.__class__.__name__} is not supported.")
 
-    def _check_authorized_imports_are_installed(self):
-        """
-        Check that all authorized imports are installed on the system.
+    return evaluate
 
-        Handles wildcard imports ("*") and partial star-pattern imports (e.g., "os.*").
 
-        Raises:
-            InterpreterError: If any of the authorized modules are not installed.
-        """
-        missing_modules = [
-            base_module
-            for imp in self.authorized_imports
-            if imp != "*" and find_spec(base_module := imp.split(".")[0]) is None
-        ]
+def compile_constant(expression: ast.Constant) -> CompiledNode:
+    value = expression.value
+    return lambda state, static_tools, custom_tools, authorized_imports: value
+
+
+def compile_name(name: ast.Name) -> CompiledNode:
+    name_id = name.id
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        if name_id in state:
+            return state[name_id]
+        return evaluate_name(name, state, static_tools, custom_tools, authorized_imports)
+
+    return evaluate
+
+
+def compile_attribute(expression: ast.Attribute) -> CompiledNode:
+    attr = expression.attr
+    evaluate_value = compile_ast(expression.value)
+
+    if attr.startswith("__") and attr.endswith("__"):
+
+        def evaluate_dunder(state, static_tools, custom_tools, authorized_imports):
+            raise InterpreterError(f"Forbidden access to dunder attribute: {attr}")
+
+        return evaluate_dunder
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        return getattr(evaluate_value(state, static_tools, custom_tools, authorized_imports), attr)
+
+    return evaluate
+
+
+def compile_subscript(subscript: ast.Subscript) -> CompiledNode:
+    evaluate_index, evaluate_value = compile_ast(subscript.slice), compile_ast(subscript.value)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        index = evaluate_index(state, static_tools, custom_tools, authorized_imports)
+        value = evaluate_value(state, static_tools, custom_tools, authorized_imports)
+        try:
+            return value[index]
+        except (KeyError, IndexError, TypeError) as e:
+            error_message = f"Could not index {value} with '{index}': {type(e).__name__}: {e}"
+            if isinstance(index, str) and isinstance(value, Mapping):
+                close_matches = difflib.get_close_matches(index, list(value.keys()))
+                if len(close_matches) > 0:
+                    error_message += f". Maybe you meant one of these indexes instead: {str(close_matches)}"
+            raise InterpreterError(error_message) from e
+
+    return evaluate
+
+
+def compile_slice(expression: ast.Slice) -> CompiledNode:
+    bounds = [
+        compile_ast(bound) if bound is not None else None
+        for bound in (expression.lower, expression.upper, expression.step)
+    ]
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        return slice(
+            *(
+                bound(state, static_tools, custom_tools, authorized_imports) if bound is not None else None
+                for bound in bounds
+            )
+        )
+
+    return evaluate
+
+
+def compile_unaryop(expression: ast.UnaryOp) -> CompiledNode:
+    evaluate_operand = compile_ast(expression.operand)
+    op = expression.op
+    if isinstance(op, ast.USub):
+        return lambda *params: -evaluate_operand(*params)
+    elif isinstance(op, ast.UAdd):
+        return evaluate_operand
+    elif isinstance(op, ast.Not):
+        return lambda *params: not evaluate_operand(*params)
+    elif isinstance(op, ast.Invert):
+        return lambda *params: ~evaluate_operand(*params)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        evaluate_operand(state, static_tools, custom_tools, authorized_imports)
+        raise InterpreterError(f"Unary operation {op.__class__.__name__} is not supported.")
+
+    return evaluate
+
+
+def compile_binop(binop: ast.BinOp) -> CompiledNode:
+    evaluate_left, evaluate_right = compile_ast(binop.left), compile_ast(binop.right)
+    op = BINARY_OPERATORS.get(type(binop.op))
+    if op is None:
+
+        def evaluate_unsupported(state, static_tools, custom_tools, authorized_imports):
+            evaluate_left(state, static_tools, custom_tools, authorized_imports)
+            evaluate_right(state, static_tools, custom_tools, authorized_imports)
+            raise NotImplementedError(f"Binary operation {type(binop.op).__name__} is not implemented.")
+
+        return evaluate_unsupported
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        left_val = evaluate_left(state, static_tools, custom_tools, authorized_imports)
+        return op(left_val, evaluate_right(state, static_tools, custom_tools, authorized_imports))
+
+    return evaluate
+
+
+def compile_boolop(node: ast.BoolOp) -> CompiledNode:
+    values = compile_statements(node.values)
+    is_and = isinstance(node.op, ast.And)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        for value in values:
+            result = value(state, static_tools, custom_tools, authorized_imports)
+            # Short-circuit: 'and' stops on the first falsy value, 'or' on the first truthy value
+            if (not result) if is_and else result:
+                return result
+        return result
+
+    return evaluate
+
+
+def compile_compare(condition: ast.Compare) -> CompiledNode:
+    evaluate_left = compile_ast(condition.left)
+    comparisons = [
+        (COMPARISON_OPERATORS[type(op)], compile_ast(c)) for op, c in zip(condition.ops, condition.comparators)
+    ]
+    if len(comparisons) == 1:
+        compare, evaluate_right = comparisons[0]
+
+        def evaluate_single(state, static_tools, custom_tools, authorized_imports):
+            left = evaluate_left(state, static_tools, custom_tools, authorized_imports)
+            return compare(left, evaluate_right(state, static_tools, custom_tools, authorized_imports))
+
+        return evaluate_single
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        result = True
+        left = evaluate_left(state, static_tools, custom_tools, authorized_imports)
+        for i, (compare, evaluate_right) in enumerate(comparisons):
+            right = evaluate_right(state, static_tools, custom_tools, authorized_imports)
+            current_result = compare(left, right)
+            if current_result is False:
+                return False
+            result = current_result if i == 0 else (result and current_result)
+            left = right
+        return result
+
+    return evaluate
+
+
+def compile_ifexp(expression: ast.IfExp) -> CompiledNode:
+    evaluate_test = compile_ast(expression.test)
+    evaluate_body, evaluate_orelse = compile_ast(expression.body), compile_ast(expression.orelse)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        if evaluate_test(state, static_tools, custom_tools, authorized_imports):
+            return evaluate_body(state, static_tools, custom_tools, authorized_imports)
+        return evaluate_orelse(state, static_tools, custom_tools, authorized_imports)
+
+    return evaluate
+
+
+def compile_collection(expression: ast.Tuple | ast.List | ast.Set) -> CompiledNode:
+    elements = compile_statements(expression.elts)
+    container = {ast.Tuple: tuple, ast.List: list, ast.Set: set}[type(expression)]
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        return container([elt(state, static_tools, custom_tools, authorized_imports) for elt in elements])
+
+    return evaluate
+
+
+def compile_dict(expression: ast.Dict) -> CompiledNode:
+    items = [(compile_ast(k), compile_ast(v)) for k, v in zip(expression.keys, expression.values)]
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        result = {}
+        for evaluate_key, evaluate_value in items:
+            key = evaluate_key(state, static_tools, custom_tools, authorized_imports)
+            result[key] = evaluate_value(state, static_tools, custom_tools, authorized_imports)
+        return result
+
+    return evaluate
+
+
+def compile_formatted_value(expression: ast.FormattedValue) -> CompiledNode:
+    evaluate_value = compile_ast(expression.value)
+    if not expression.format_spec:
+        return evaluate_value
+    evaluate_format_spec = compile_ast(expression.format_spec)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        value = evaluate_value(state, static_tools, custom_tools, authorized_imports)
+        return format(value, evaluate_format_spec(state, static_tools, custom_tools, authorized_imports))
+
+    return evaluate
+
+
+def compile_joined_str(expression: ast.JoinedStr) -> CompiledNode:
+    values = compile_statements(expression.values)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        return "".join([str(value(state, static_tools, custom_tools, authorized_imports)) for value in values])
+
+    return evaluate
+
+
+def compile_call(call: ast.Call) -> CompiledNode:
+    if not isinstance(call.func, (ast.Call, ast.Lambda, ast.Attribute, ast.Name, ast.Subscript)):
+
+        def evaluate_incorrect_function(state, static_tools, custom_tools, authorized_imports):
+            raise InterpreterError(f"This is not a correct function: {call.func}).")
+
+        return evaluate_incorrect_function
+
+    args = [
+        (isinstance(arg, ast.Starred), compile_ast(arg.value if isinstance(arg, ast.Starred) else arg))
+        for arg in call.args
+    ]
+    keywords = [(keyword.arg, compile_ast(keyword.value)) for keyword in call.keywords]
+
+    func_name = None
+    is_attribute, is_name = isinstance(call.func, ast.Attribute), isinstance(call.func, ast.Name)
+    is_subscript = isinstance(call.func, ast.Subscript)
+    if is_attribute:
+        evaluate_obj, func_name = compile_ast(call.func.value), call.func.attr
+    elif is_name:
+        func_name = call.func.id
+    else:
+        evaluate_func = compile_ast(call.func)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        is_static_tool = False
+        if is_attribute:
+            obj = evaluate_obj(state, static_tools, custom_tools, authorized_imports)
+            if not hasattr(obj, func_name):
+                raise InterpreterError(f"Object {obj} has no attribute {func_name}")
+            func = getattr(obj, func_name)
+        elif is_name:
+            if func_name in state:
+                func = state[func_name]
+            elif func_name in static_tools:
+                func = static_tools[func_name]
+                is_static_tool = True
+            elif func_name in custom_tools:
+                func = custom_tools[func_name]
+            elif func_name in ERRORS:
+                func = ERRORS[func_name]
+            else:
+                raise InterpreterError(
+                    f"Forbidden function evaluation: '{func_name}' is not among the explicitly allowed tools or defined/imported in the preceding code"
+                )
+        else:
+            func = evaluate_func(state, static_tools, custom_tools, authorized_imports)
+            if is_subscript and not callable(func):
+                raise InterpreterError(f"This is not a correct function: {call.func}).")
+
+        arg_values = []
+        for is_starred, evaluate_arg in args:
+            if is_starred:
+                arg_values.extend(evaluate_arg(state, static_tools, custom_tools, authorized_imports))
+            else:
+                arg_values.append(evaluate_arg(state, static_tools, custom_tools, authorized_imports))
+
+        kwargs = {}
+        for keyword_name, evaluate_keyword in keywords:
+            if keyword_name is None:
+                # **kwargs unpacking
+                starred_dict = evaluate_keyword(state, static_tools, custom_tools, authorized_imports)
+                if not isinstance(starred_dict, dict):
+                    raise InterpreterError(f"Cannot unpack non-dict value in **kwargs: {type(starred_dict).__name__}")
+                kwargs.update(starred_dict)
+            else:
+                kwargs[keyword_name] = evaluate_keyword(state, static_tools, custom_tools, authorized_imports)
+
+        result = call_function(func, func_name, arg_values, kwargs, state, static_tools, is_static_tool)
+        if "_execution_budget" in state:
+            state["_execution_budget"].check(call)
+        return result
+
+    return evaluate
+
+
+def compile_lambda(lambda_expression: ast.Lambda) -> CompiledNode:
+    args = [arg.arg for arg in lambda_expression.args.args]
+    evaluate_body = compile_ast(lambda_expression.body)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        def lambda_func(*values: Any) -> Any:
+            new_state = Scope(state)
+            for arg, value in zip(args, values):
+                new_state[arg] = value
+            return evaluate_body(new_state, static_tools, custom_tools, authorized_imports)
+
+        return lambda_func
+
+    return evaluate
+
+
+def compile_function_def(func_def: ast.FunctionDef) -> CompiledNode:
+    source_code = getattr(func_def, "source", None) or ast.unparse(func_def)
+    arg_names = [arg.arg for arg in func_def.args.args]
+    defaults = compile_statements(func_def.args.defaults)
+    body = compile_statements(func_def.body)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        def new_func(*args: Any, **kwargs: Any) -> Any:
+            func_state = Scope(state)
+            default_values = [default(state, static_tools, custom_tools, authorized_imports) for default in defaults]
+
+            # Apply default values
+            default_args = dict(zip(arg_names[-len(default_values) :], default_values))
+
+            # Set positional arguments
+            for name, value in zip(arg_names, args):
+                func_state[name] = value
+
+            # Set keyword arguments
+            for name, value in kwargs.items():
+                func_state[name] = value
+
+            # Handle variable arguments
+            if func_def.args.vararg:
+                func_state[func_def.args.vararg.arg] = args
+
+            if func_def.args.kwarg:
+                func_state[func_def.args.kwarg.arg] = kwargs
+
+            # Set default values for arguments that were not provided
+            for name, value in default_args.items():
+                if name not in func_state:
+                    func_state[name] = value
+
+            # Update function state with self and __class__
+            if arg_names and arg_names[0] == "self":
+                if args:
+                    func_state["self"] = args[0]
+                    func_state["__class__"] = args[0].__class__
+
+            result = None
+            try:
+                for stmt in body:
+                    result = stmt(func_state, static_tools, custom_tools, authorized_imports)
+            except ReturnException as e:
+                result = e.value
+
+            if func_def.name == "__init__":
+                return None
+
+            return result
+
+        # Store original AST, source code, and name
+        new_func.__ast__ = func_def
+        new_func.__source__ = source_code
+        new_func.__name__ = func_def.name
+
+        if isinstance(func_def, ast.AsyncFunctionDef):
+            new_func = create_coroutine_function(new_func, state)
+        custom_tools[func_def.name] = new_func
+        return new_func
+
+    return evaluate
+
+
+def compile_class_def(class_def: ast.ClassDef) -> CompiledNode:
+    bases = compile_statements(class_def.bases)
+    # Each class body statement is compiled into a closure `(class_dict, state, static_tools, custom_tools, authorized_imports)`
+    body = []
+
+    for stmt in class_def.body:
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+
+            def define_method(class_dict, *params, name=stmt.name, evaluate_method=compile_ast(stmt)):
+                class_dict[name] = evaluate_method(*params)
+
+            body.append(define_method)
+        elif isinstance(stmt, ast.AnnAssign):
+
+            def annotated_assign(
+                class_dict,
+                state,
+                static_tools,
+                custom_tools,
+                authorized_imports,
+                stmt=stmt,
+                evaluate_value=compile_ast(stmt.value) if stmt.value else None,
+                evaluate_annotation=compile_ast(stmt.annotation),
+                evaluate_target_value=compile_ast(stmt.target.value) if hasattr(stmt.target, "value") else None,
+                evaluate_target_slice=compile_ast(stmt.target.slice) if hasattr(stmt.target, "slice") else None,
+            ):
+                params = (static_tools, custom_tools, authorized_imports)
+                if evaluate_value:
+                    value = evaluate_value(state, *params)
+                target = stmt.target
+                # Handle target types for annotation
+                if isinstance(target, ast.Name):
+                    # Simple variable annotation like "x: int"
+                    annotation = evaluate_annotation(state, *params)
+                    class_dict.setdefault("__annotations__", {})[target.id] = annotation
+                    if evaluate_value:
+                        class_dict[target.id] = value
+                elif isinstance(target, ast.Attribute):
+                    # Attribute annotation like "obj.attr: int"
+                    obj = evaluate_target_value(class_dict, *params)
+                    if evaluate_value:
+                        setattr(obj, target.attr, value)
+                elif isinstance(target, ast.Subscript):
+                    # Subscript annotation like "dict[key]: int"
+                    container = evaluate_target_value(class_dict, *params)
+                    index = evaluate_target_slice(state, *params)
+                    if evaluate_value:
+                        container[index] = value
+                else:
+                    raise InterpreterError(f"Unsupported AnnAssign target in class body: {type(target).__name__}")
+
+            body.append(annotated_assign)
+        elif isinstance(stmt, ast.Assign):
+
+            def assign(
+                class_dict,
+                state,
+                static_tools,
+                custom_tools,
+                authorized_imports,
+                targets=stmt.targets,
+                evaluate_value=compile_ast(stmt.value),
+                evaluate_target_values=[
+                    compile_ast(target.value) if isinstance(target, ast.Attribute) else None for target in stmt.targets
+                ],
+            ):
+                params = (static_tools, custom_tools, authorized_imports)
+                value = evaluate_value(state, *params)
+                for target, evaluate_target_value in zip(targets, evaluate_target_values):
+                    if isinstance(target, ast.Name):
+                        class_dict[target.id] = value
+                    elif isinstance(target, ast.Attribute):
+                        setattr(evaluate_target_value(class_dict, *params), target.attr, value)
+
+            body.append(assign)
+        elif isinstance(stmt, ast.Pass):
+            pass
+        elif (
+            isinstance(stmt, ast.Expr)
+            and stmt == class_def.body[0]
+            and isinstance(stmt.value, ast.Constant)
+            and isinstance(stmt.value.value, str)
+        ):
+            # Check if it is a docstring: first statement in class body which is a string literal expression
+            def set_docstring(class_dict, *params, docstring=stmt.value.value):
+                class_dict["__doc__"] = docstring
+
+            body.append(set_docstring)
+        else:
+
+            def unsupported_statement(class_dict, *params, stmt_name=stmt.__class__.__name__):
+                raise InterpreterError(f"Unsupported statement in class body: {stmt_name}")
+
+            body.append(unsupported_statement)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        base_classes = [base(state, static_tools, custom_tools, authorized_imports) for base in bases]
+        class_dict = {}
+        for stmt in body:
+            stmt(class_dict, state, static_tools, custom_tools, authorized_imports)
+        new_class = type(class_def.name, tuple(base_classes), class_dict)
+        state[class_def.name] = new_class
+        return new_class
+
+    return evaluate
+
+
+def compile_assign(assign: ast.Assign) -> CompiledNode:
+    evaluate_value = compile_ast(assign.value)
+    targets = [compile_target(target) for target in assign.targets]
+    if len(targets) == 1:
+        assign_target = targets[0]
+
+        def evaluate_single(state, static_tools, custom_tools, authorized_imports):
+            result = evaluate_value(state, static_tools, custom_tools, authorized_imports)
+            assign_target(result, state, static_tools, custom_tools, authorized_imports)
+            return result
+
+        return evaluate_single
+
+    starred = [isinstance(target, ast.Starred) for target in assign.targets]
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        result = evaluate_value(state, static_tools, custom_tools, authorized_imports)
+        expanded_values = []
+        for is_starred in starred:
+            if is_starred:
+                expanded_values.extend(result)
+            else:
+                expanded_values.append(result)
+        for assign_target, value in zip(targets, expanded_values):
+            assign_target(value, state, static_tools, custom_tools, authorized_imports)
+        return result
+
+    return evaluate
+
+
+def compile_annassign(annassign: ast.AnnAssign) -> CompiledNode:
+    if not annassign.value:
+        return lambda state, static_tools, custom_tools, authorized_imports: None
+    evaluate_value, assign_target = compile_ast(annassign.value), compile_target(annassign.target)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        value = evaluate_value(state, static_tools, custom_tools, authorized_imports)
+        assign_target(value, state, static_tools, custom_tools, authorized_imports)
+        return value
+
+    return evaluate
+
+
+def compile_augassign(expression: ast.AugAssign) -> CompiledNode:
+    def compile_current_value(target: ast.AST) -> Callable:
+        if isinstance(target, ast.Name):
+            name_id = target.id
+            return lambda state, static_tools, custom_tools, authorized_imports: state.get(name_id, 0)
+        elif isinstance(target, ast.Subscript):
+            evaluate_obj, evaluate_key = compile_ast(target.value), compile_ast(target.slice)
+
+            def get_item(*params):
+                obj = evaluate_obj(*params)
+                return obj[evaluate_key(*params)]
+
+            return get_item
+        elif isinstance(target, ast.Attribute):
+            evaluate_obj, attr = compile_ast(target.value), target.attr
+            return lambda *params: getattr(evaluate_obj(*params), attr)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            container = tuple if isinstance(target, ast.Tuple) else list
+            elements = [compile_current_value(elt) for elt in target.elts]
+            return lambda *params: container([get_element(*params) for get_element in elements])
+
+        def unsupported_target(*params):
+            raise InterpreterError("AugAssign not supported for {type(target)} targets.")
+
+        return unsupported_target
+
+    get_current_value = compile_current_value(expression.target)
+    evaluate_value = compile_ast(expression.value)
+    assign_target = compile_target(expression.target)
+    is_add = isinstance(expression.op, ast.Add)
+    op = INPLACE_OPERATORS.get(type(expression.op))
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        current_value = get_current_value(state, static_tools, custom_tools, authorized_imports)
+        value_to_add = evaluate_value(state, static_tools, custom_tools, authorized_imports)
+        if op is None:
+            raise InterpreterError(f"Operation {type(expression.op).__name__} is not supported.")
+        if is_add and isinstance(current_value, list) and not isinstance(value_to_add, list):
+            raise InterpreterError(f"Cannot add non-list value {value_to_add} to a list.")
+        current_value = op(current_value, value_to_add)
+        # Update the state: current_value has been updated in-place
+        assign_target(current_value, state, static_tools, custom_tools, authorized_imports)
+        return current_value
+
+    return evaluate
+
+
+def compile_body(statements: list[ast.AST]) -> CompiledNode:
+    """Compile a block of statements, returning the last non-None statement result like `evaluate_if`."""
+    body = compile_statements(statements)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        result = None
+        for stmt in body:
+            line_result = stmt(state, static_tools, custom_tools, authorized_imports)
+            if line_result is not None:
+                result = line_result
+        return result
+
+    return evaluate
+
+
+def compile_if(if_statement: ast.If) -> CompiledNode:
+    evaluate_test = compile_ast(if_statement.test)
+    evaluate_body, evaluate_orelse = compile_body(if_statement.body), compile_body(if_statement.orelse)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        if evaluate_test(state, static_tools, custom_tools, authorized_imports):
+            return evaluate_body(state, static_tools, custom_tools, authorized_imports)
+        return evaluate_orelse(state, static_tools, custom_tools, authorized_imports)
+
+    return evaluate
+
+
+def compile_for(for_loop: ast.For | ast.AsyncFor) -> CompiledNode:
+    evaluate_iter = compile_ast(for_loop.iter)
+    assign_target = compile_target(for_loop.target)
+    body = compile_statements(for_loop.body)
+    is_async = isinstance(for_loop, ast.AsyncFor)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        result = None
+        iterator = evaluate_iter(state, static_tools, custom_tools, authorized_imports)
+        if is_async:
+            iterator = iterate_async(iterator, state, for_loop)
+        for counter in iterator:
+            assign_target(counter, state, static_tools, custom_tools, authorized_imports)
+            for node in body:
+                try:
+                    line_result = node(state, static_tools, custom_tools, authorized_imports)
+                    if line_result is not None:
+                        result = line_result
+                except BreakException:
+                    return result
+                except ContinueException:
+                    break
+        return result
+
+    return evaluate
+
+
+def compile_while(while_loop: ast.While) -> CompiledNode:
+    evaluate_test = compile_ast(while_loop.test)
+    body = compile_statements(while_loop.body)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        iterations = 0
+        while evaluate_test(state, static_tools, custom_tools, authorized_imports):
+            for node in body:
+                try:
+                    node(state, static_tools, custom_tools, authorized_imports)
+                except BreakException:
+                    return None
+                except ContinueException:
+                    break
+            iterations += 1
+            if iterations > MAX_WHILE_ITERATIONS:
+                raise InterpreterError(f"Maximum number of {MAX_WHILE_ITERATIONS} iterations in While loop exceeded")
+        return None
+
+    return evaluate
+
+
+def compile_listcomp(listcomp: ast.ListComp) -> CompiledNode:
+    iterate_states = compile_comprehension_generators(listcomp.generators)
+    evaluate_elt = compile_ast(listcomp.elt)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        return [
+            evaluate_elt(new_state, static_tools, custom_tools, authorized_imports)
+            for new_state in iterate_states(state, static_tools, custom_tools, authorized_imports)
+        ]
+
+    return evaluate
+
+
+def compile_comprehension_generators(generators: list[ast.comprehension]) -> Callable:
+    """
+    Compile comprehension clauses into a closure lazily yielding, for each element, the state in which the element is
+    evaluated. Like `iterate_comprehension`, each clause is nested in the previous ones.
+    """
+    clauses = [(compile_ast(gen.iter), compile_target(gen.target), compile_statements(gen.ifs)) for gen in generators]
+    last_index = len(clauses) - 1
+
+    def iterate_states(state, static_tools, custom_tools, authorized_imports, index=0):
+        evaluate_iter, assign_target, ifs = clauses[index]
+        for value in evaluate_iter(state, static_tools, custom_tools, authorized_imports):
+            new_state = Scope(state)
+            assign_target(value, new_state, static_tools, custom_tools, authorized_imports)
+            if all(if_clause(new_state, static_tools, custom_tools, authorized_imports) for if_clause in ifs):
+                if index == last_index:
+                    yield new_state
+                else:
+                    yield from iterate_states(new_state, static_tools, custom_tools, authorized_imports, index + 1)
+
+    return iterate_states
+
+
+def compile_setcomp(setcomp: ast.SetComp) -> CompiledNode:
+    iterate_states = compile_comprehension_generators(setcomp.generators)
+    evaluate_elt = compile_ast(setcomp.elt)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        return {
+            evaluate_elt(new_state, static_tools, custom_tools, authorized_imports)
+            for new_state in iterate_states(state, static_tools, custom_tools, authorized_imports)
+        }
+
+    return evaluate
+
+
+def compile_dictcomp(dictcomp: ast.DictComp) -> CompiledNode:
+    iterate_states = compile_comprehension_generators(dictcomp.generators)
+    evaluate_key, evaluate_value = compile_ast(dictcomp.key), compile_ast(dictcomp.value)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        result = {}
+        for new_state in iterate_states(state, static_tools, custom_tools, authorized_imports):
+            key = evaluate_key(new_state, static_tools, custom_tools, authorized_imports)
+            result[key] = evaluate_value(new_state, static_tools, custom_tools, authorized_imports)
+        return result
+
+    return evaluate
+
+
+def compile_generatorexp(genexp: ast.GeneratorExp) -> CompiledNode:
+    iterate_states = compile_comprehension_generators(genexp.generators)
+    evaluate_elt = compile_ast(genexp.elt)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        def generator():
+            for new_state in iterate_states(state, static_tools, custom_tools, authorized_imports):
+                yield evaluate_elt(new_state, static_tools, custom_tools, authorized_imports)
+
+        return generator()
+
+    return evaluate
+
+
+def compile_try(try_node: ast.Try) -> CompiledNode:
+    body, orelse, finalbody = (
+        compile_statements(try_node.body),
+        compile_statements(try_node.orelse),
+        compile_statements(try_node.finalbody),
+    )
+    handlers = [
+        (
+            compile_ast(handler.type) if handler.type is not None else None,
+            handler.name,
+            compile_statements(handler.body),
+        )
+        for handler in try_node.handlers
+    ]
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        try:
+            for stmt in body:
+                stmt(state, static_tools, custom_tools, authorized_imports)
+        except Exception as e:
+            matched = False
+            for evaluate_type, handler_name, handler_body in handlers:
+                if evaluate_type is None or isinstance(
+                    e, evaluate_type(state, static_tools, custom_tools, authorized_imports)
+                ):
+                    matched = True
+                    if handler_name:
+                        state[handler_name] = e
+                    for stmt in handler_body:
+                        stmt(state, static_tools, custom_tools, authorized_imports)
+                    break
+            if not matched:
+                raise e
+        else:
+            for stmt in orelse:
+                stmt(state, static_tools, custom_tools, authorized_imports)
+        finally:
+            for stmt in finalbody:
+                stmt(state, static_tools, custom_tools, authorized_imports)
+
+    return evaluate
+
+
+def compile_raise(raise_node: ast.Raise) -> CompiledNode:
+    evaluate_exc = compile_ast(raise_node.exc) if raise_node.exc is not None else None
+    evaluate_cause = compile_ast(raise_node.cause) if raise_node.cause is not None else None
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        exc = evaluate_exc(state, static_tools, custom_tools, authorized_imports) if evaluate_exc else None
+        cause = evaluate_cause(state, static_tools, custom_tools, authorized_imports) if evaluate_cause else None
+        if exc is not None:
+            if cause is not None:
+                raise exc from cause
+            else:
+                raise exc
+        else:
+            raise InterpreterError("Re-raise is not supported without an active exception")
+
+    return evaluate
+
+
+def compile_assert(assert_node: ast.Assert) -> CompiledNode:
+    evaluate_test = compile_ast(assert_node.test)
+    evaluate_msg = compile_ast(assert_node.msg) if assert_node.msg else None
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        if not evaluate_test(state, static_tools, custom_tools, authorized_imports):
+            if evaluate_msg:
+                raise AssertionError(evaluate_msg(state, static_tools, custom_tools, authorized_imports))
+            else:
+                # Include the failing condition in the assertion message
+                raise AssertionError(f"Assertion failed: {ast.unparse(assert_node.test)}")
+
+    return evaluate
+
+
+def compile_with(with_node: ast.With) -> CompiledNode:
+    items = [(compile_ast(item.context_expr), item.optional_vars) for item in with_node.items]
+    body = compile_statements(with_node.body)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        contexts = []
+        for evaluate_context_expr, optional_vars in items:
+            context_expr = evaluate_context_expr(state, static_tools, custom_tools, authorized_imports)
+            if optional_vars:
+                state[optional_vars.id] = context_expr.__enter__()
+                contexts.append(state[optional_vars.id])
+            else:
+                contexts.append(context_expr.__enter__())
+
+        try:
+            for stmt in body:
+                stmt(state, static_tools, custom_tools, authorized_imports)
+        except Exception as e:
+            for context in reversed(contexts):
+                context.__exit__(type(e), e, e.__traceback__)
+            raise
+        else:
+            for context in reversed(contexts):
+                context.__exit__(None, None, None)
+
+    return evaluate
+
+
+def compile_async_with(with_node: ast.AsyncWith) -> CompiledNode:
+    items = [
+        (compile_ast(item.context_expr), compile_target(item.optional_vars) if item.optional_vars else None)
+        for item in with_node.items
+    ]
+    body = compile_statements(with_node.body)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        managers = []
+        for evaluate_context_expr, assign_target in items:
+            manager = evaluate_context_expr(state, static_tools, custom_tools, authorized_imports)
+            value = run_awaitable(manager.__aenter__(), state, with_node)
+            managers.append(manager)
+            if assign_target is not None:
+                assign_target(value, state, static_tools, custom_tools, authorized_imports)
+
+        try:
+            for stmt in body:
+                stmt(state, static_tools, custom_tools, authorized_imports)
+        except Exception as e:
+            for manager in reversed(managers):
+                run_awaitable(manager.__aexit__(type(e), e, e.__traceback__), state, with_node)
+            raise
+        else:
+            for manager in reversed(managers):
+                run_awaitable(manager.__aexit__(None, None, None), state, with_node)
+
+    return evaluate
+
+
+def compile_await(await_node: ast.Await) -> CompiledNode:
+    evaluate_value = compile_ast(await_node.value)
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        return run_awaitable(evaluate_value(state, static_tools, custom_tools, authorized_imports), state, await_node)
+
+    return evaluate
+
+
+def compile_delete(delete_node: ast.Delete) -> CompiledNode:
+    targets = [
+        (target, compile_ast(target.value), compile_ast(target.slice))
+        if isinstance(target, ast.Subscript)
+        else (target, None, None)
+        for target in delete_node.targets
+    ]
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        for target, evaluate_obj, evaluate_index in targets:
+            if isinstance(target, ast.Name):
+                try:
+                    del state[target.id]
+                except KeyError:
+                    raise InterpreterError(f"Cannot delete name '{target.id}': name is not defined")
+            elif isinstance(target, ast.Subscript):
+                obj = evaluate_obj(state, static_tools, custom_tools, authorized_imports)
+                index = evaluate_index(state, static_tools, custom_tools, authorized_imports)
+                try:
+                    del obj[index]
+                except (TypeError, KeyError, IndexError) as e:
+                    raise InterpreterError(f"Cannot delete index/key: {str(e)}")
+            else:
+                raise InterpreterError(f"Deletion of {type(target).__name__} targets is not supported")
+
+    return evaluate
+
+
+def compile_return(return_node: ast.Return) -> CompiledNode:
+    evaluate_value = compile_ast(return_node.value) if return_node.value else None
+
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        raise ReturnException(
+            evaluate_value(state, static_tools, custom_tools, authorized_imports) if evaluate_value else None
+        )
+
+    return evaluate
+
+
+def compile_import(expression: ast.Import | ast.ImportFrom) -> CompiledNode:
+    return lambda state, static_tools, custom_tools, authorized_imports: evaluate_import(
+        expression, state, authorized_imports
+    )
+
+
+def compile_pass(expression: ast.Pass) -> CompiledNode:
+    return lambda state, static_tools, custom_tools, authorized_imports: None
+
+
+def compile_break(expression: ast.Break) -> CompiledNode:
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        raise BreakException()
+
+    return evaluate
+
+
+def compile_continue(expression: ast.Continue) -> CompiledNode:
+    def evaluate(state, static_tools, custom_tools, authorized_imports):
+        raise ContinueException()
+
+    return evaluate
+
+
+NODE_COMPILERS = {
+    ast.Assign: compile_assign,
+    ast.AnnAssign: compile_annassign,
+    ast.AugAssign: compile_augassign,
+    ast.Call: compile_call,
+    ast.Constant: compile_constant,
+    ast.Tuple: compile_collection,
+    ast.GeneratorExp: compile_generatorexp,
+    ast.ListComp: compile_listcomp,
+    ast.DictComp: compile_dictcomp,
+    ast.SetComp: compile_setcomp,
+    ast.UnaryOp: compile_unaryop,
+    ast.Starred: lambda expression: compile_ast(expression.value),
+    ast.BoolOp: compile_boolop,
+    ast.Break: compile_break,
+    ast.Continue: compile_continue,
+    ast.BinOp: compile_binop,
+    ast.Compare: compile_compare,
+    ast.Lambda: compile_lambda,
+    ast.FunctionDef: compile_function_def,
+    ast.AsyncFunctionDef: compile_function_def,
+    ast.Dict: compile_dict,
+    ast.Expr: lambda expression: compile_ast(expression.value),
+    ast.For: compile_for,
+    ast.AsyncFor: compile_for,
+    ast.FormattedValue: compile_formatted_value,
+    ast.If: compile_if,
+    ast.JoinedStr: compile_joined_str,
+    ast.List: compile_collection,
+    ast.Name: compile_name,
+    ast.Subscript: compile_subscript,
+    ast.IfExp: compile_ifexp,
+    ast.Attribute: compile_attribute,
+    ast.Slice: compile_slice,
+    ast.While: compile_while,
+    ast.Import: compile_import,
+    ast.ImportFrom: compile_import,
+    ast.ClassDef: compile_class_def,
+    ast.Try: compile_try,
+    ast.Raise: compile_raise,
+    ast.Assert: compile_assert,
+    ast.With: compile_with,
+    ast.Set: compile_collection,
+    ast.Return: compile_return,
+    ast.Pass: compile_pass,
+    ast.Delete: compile_delete,
+    ast.Await: compile_await,
+    ast.AsyncWith: compile_async_with,
+}
+
+# Nodes whose result is known to be a literal or a string, hence never needs the safety check
+UNCHECKED_NODES = (ast.Constant, ast.JoinedStr, ast.Pass, ast.Break, ast.Continue)
+
+
+def compile_ast(expression: ast.AST) -> CompiledNode:
+    """
+    Compile an abstract syntax tree into a tree of Python closures, to be evaluated with
+    `(state, static_tools, custom_tools, authorized_imports)` like `evaluate_ast`.
+
+    The resulting closures behave exactly like `evaluate_ast`: same operations accounting, same security checks and
+    same errors, raised at evaluation time only. But the node dispatch happens once at compile time, instead of on
+    every evaluation of the node, which makes loops and function calls much faster.
+
+    Args:
+        expression (`ast.AST`):
+            The code to compile, as an abstract syntax tree.
+
+    Returns:
+        `Callable`: The compiled node.
+    """
+    compiler = NODE_COMPILERS.get(type(expression), compile_unsupported)
+    return compiled_node(expression, compiler(expression), check_result=not isinstance(expression, UNCHECKED_NODES))
+
+
+def compile_module(module: ast.Module) -> list[CompiledNode]:
+    """Compile each top-level statement of a parsed module with `compile_ast`."""
+    return compile_statements(module.body)
+
+
+def parse_code(code: str) -> ast.Module:
+    """Parse code into an AST module, raising an `InterpreterError` pointing to the faulty line on syntax errors."""
+    try:
+        return ast.parse(code)
+    except SyntaxError as e:
+        raise InterpreterError(
+            f"Code parsing failed on line {e.lineno} due to: {type(e).__name__}\n"
+            f"{e.text}"
+            f"{' ' * (e.offset or 0)}^\n"
+            f"Error: {str(e)}"
+        )
+
+
+# Builtins whose calls on constant arguments are folded, when no tool, function or variable shadows them
+FOLDABLE_BUILTINS = {
+    name: BASE_PYTHON_TOOLS[name]
+    for name in ("abs", "bool", "chr", "divmod", "float", "int", "len", "max", "min", "ord", "round", "str", "sum")
+}
+# Folded constants above this length or bit length are left to be computed at evaluation time
+MAX_FOLDED_SIZE = 4096
+
+
+def is_foldable_value(value: Any) -> bool:
+    """Whether a value can be stored in an `ast.Constant` and is small enough to be folded."""
+    if isinstance(value, (tuple, frozenset)):
+        return len(value) <= MAX_FOLDED_SIZE and all(is_foldable_value(item) for item in value)
+    if isinstance(value, (str, bytes)):
+        return len(value) <= MAX_FOLDED_SIZE
+    if isinstance(value, int):
+        return value.bit_length() <= MAX_FOLDED_SIZE
+    return value is None or isinstance(value, (float, complex))
+
+
+def is_cheap_binop(op: ast.operator, left: Any, right: Any) -> bool:
+    """Whether a binary operation on constants is cheap to compute, before computing it."""
+    if isinstance(op, ast.Mod):
+        # Printf-style formatting can build arbitrarily large strings
+        return not isinstance(left, (str, bytes))
+    if isinstance(op, ast.Pow) and isinstance(left, int) and isinstance(right, int):
+        return right < 0 or left.bit_length() * right <= MAX_FOLDED_SIZE
+    if isinstance(op, ast.LShift) and isinstance(right, int):
+        return right <= MAX_FOLDED_SIZE
+    if isinstance(op, ast.Mult):
+        for sequence, count in ((left, right), (right, left)):
+            if isinstance(sequence, (str, bytes, tuple)) and isinstance(count, int):
+                return len(sequence) * count <= MAX_FOLDED_SIZE
+    return True
+
+
+class ConstantFolder(ast.NodeTransformer):
+    """
+    Optimization pass run on parsed code before interpretation.
+
+    LLM-generated code is full of literal arithmetic, constant f-strings and `if False:` debug branches, which the
+    interpreter would otherwise evaluate again on every loop iteration. This pass:
+    - folds operations on constants, constant f-strings and calls to `FOLDABLE_BUILTINS` with constant arguments,
+    - turns literal containers of constants into constants built once, where this does not change semantics: tuples,
+      containers tested with `in`, and lists iterated over by loops and comprehensions,
+    - drops the branches of `if`, `while` and conditional expressions whose test is constant, except in the last
+      statement of the code, whose value the code returns.
+
+    Folding follows the evaluation rules of the interpreter, and operations that fail are left to fail at evaluation
+    time. Replacement nodes keep the locations of the nodes they replace, so errors point to the same lines. Function
+    definitions keep the source of their unfolded code in a `source` attribute, which agent-defined functions expose
+    as `__source__`.
+
+    Args:
+        bound_names (`set[str]`): Names bound anywhere in the code, whose calls are never folded.
+    """
+
+    def __init__(self, bound_names: set[str]):
+        self.bound_names = bound_names
+        self.folded_builtins: set[str] = set()
+        self.function_depth = 0
+        self.last_statement: ast.stmt | None = None
+
+    @staticmethod
+    def fold(node: ast.AST, compute: Callable[[], Any]) -> ast.AST:
+        try:
+            value = compute()
+        except Exception:
+            return node
+        if not is_foldable_value(value):
+            return node
+        return ast.copy_location(ast.Constant(value=value), node)
+
+    @staticmethod
+    def constant_container(node: ast.AST, container_type: type) -> ast.AST:
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)) and all(
+            isinstance(elt, ast.Constant) for elt in node.elts
+        ):
+            return ConstantFolder.fold(node, lambda: container_type(elt.value for elt in node.elts))
+        return node
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        super().generic_visit(node)
+        # Dropped branches can leave a block empty
+        if not isinstance(node, ast.Module) and getattr(node, "body", None) == []:
+            node.body = [ast.copy_location(ast.Pass(), node)]
+        return node
+
+    def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef | ast.Lambda) -> ast.AST:
+        # Functions can be called in later steps, after a builtin has been shadowed
+        self.function_depth += 1
+        if not isinstance(node, ast.Lambda):
+            # Agent-defined functions expose the source of the code as written, not as folded
+            node.source = ast.unparse(node)
+        try:
+            return self.generic_visit(node)
+        finally:
+            self.function_depth -= 1
+
+    visit_AsyncFunctionDef = visit_Lambda = visit_FunctionDef
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        operator_function = BINARY_OPERATORS.get(type(node.op))
+        if (
+            operator_function is None
+            or not isinstance(node.left, ast.Constant)
+            or not isinstance(node.right, ast.Constant)
+            or not is_cheap_binop(node.op, node.left.value, node.right.value)
+        ):
+            return node
+        return self.fold(node, lambda: operator_function(node.left.value, node.right.value))
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> ast.AST:
+        self.generic_visit(node)
+        if not isinstance(node.operand, ast.Constant):
+            return node
+        value = node.operand.value
+        if isinstance(node.op, ast.UAdd):
+            return node.operand
+        elif isinstance(node.op, ast.USub):
+            return self.fold(node, lambda: -value)
+        elif isinstance(node.op, ast.Not):
+            return self.fold(node, lambda: not value)
+        elif isinstance(node.op, ast.Invert):
+            return self.fold(node, lambda: ~value)
+        return node
+
+    def visit_BoolOp(self, node: ast.BoolOp) -> ast.AST:
+        self.generic_visit(node)
+        is_short_circuit_value = (lambda x: not x) if isinstance(node.op, ast.And) else (lambda x: bool(x))
+        values = []
+        for index, value in enumerate(node.values):
+            if isinstance(value, ast.Constant) and index < len(node.values) - 1:
+                if is_short_circuit_value(value.value):
+                    values.append(value)
+                    break
+                continue  # A constant that does not short-circuit never is the result
+            values.append(value)
+        if len(values) == 1:
+            return values[0]
+        node.values = values
+        return node
+
+    def visit_Compare(self, node: ast.Compare) -> ast.AST:
+        self.generic_visit(node)
+        for index, (op, comparator) in enumerate(zip(node.ops, node.comparators)):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                container_type = frozenset if isinstance(comparator, ast.Set) else tuple
+                node.comparators[index] = self.constant_container(comparator, container_type)
+        if (
+            len(node.ops) == 1
+            and not isinstance(node.ops[0], (ast.Is, ast.IsNot))
+            and isinstance(node.left, ast.Constant)
+            and isinstance(node.comparators[0], ast.Constant)
+        ):
+            operator_function = COMPARISON_OPERATORS[type(node.ops[0])]
+            return self.fold(node, lambda: operator_function(node.left.value, node.comparators[0].value))
+        return node
+
+    def visit_Tuple(self, node: ast.Tuple) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.ctx, ast.Load):
+            return self.constant_container(node, tuple)
+        return node
+
+    def visit_FormattedValue(self, node: ast.FormattedValue) -> ast.AST:
+        self.generic_visit(node)
+        # Conversions are left to the interpreter, and large widths or precisions would build large strings
+        if node.conversion != -1 or not isinstance(node.value, ast.Constant):
+            return node
+        if node.format_spec is None:
+            return self.fold(node, lambda: str(node.value.value))
+        if isinstance(node.format_spec, ast.Constant) and not re.search(r"\d{4,}", node.format_spec.value):
+            return self.fold(node, lambda: str(format(node.value.value, node.format_spec.value)))
+        return node
+
+    def visit_JoinedStr(self, node: ast.JoinedStr) -> ast.AST:
+        self.generic_visit(node)
+        if all(isinstance(value, ast.Constant) for value in node.values):
+            return self.fold(node, lambda: "".join(str(value.value) for value in node.values))
+        return node
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        self.generic_visit(node)
+        name = node.func.id if isinstance(node.func, ast.Name) else None
+        if (
+            name not in FOLDABLE_BUILTINS
+            or name in self.bound_names
+            or self.function_depth
+            or node.keywords
+            or not all(isinstance(arg, ast.Constant) for arg in node.args)
+        ):
+            return node
+        folded = self.fold(node, lambda: FOLDABLE_BUILTINS[name](*(arg.value for arg in node.args)))
+        if folded is not node:
+            self.folded_builtins.add(name)
+        return folded
+
+    def visit_For(self, node: ast.For | ast.AsyncFor | ast.comprehension) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.iter, ast.List):
+            node.iter = self.constant_container(node.iter, tuple)
+        return node
+
+    visit_AsyncFor = visit_comprehension = visit_For
+
+    def visit_Module(self, node: ast.Module) -> ast.AST:
+        # The code returns the value of its last statement: a constant `if` or `while` there is kept, so that the code
+        # still returns the value of the branch that runs, or `None`
+        self.last_statement = node.body[-1] if node.body else None
+        return self.generic_visit(node)
+
+    def visit_If(self, node: ast.If) -> ast.AST | list[ast.stmt]:
+        self.generic_visit(node)
+        if not isinstance(node.test, ast.Constant) or node is self.last_statement:
+            return node
+        return node.body if node.test.value else node.orelse
+
+    def visit_IfExp(self, node: ast.IfExp) -> ast.AST:
+        self.generic_visit(node)
+        if not isinstance(node.test, ast.Constant):
+            return node
+        return node.body if node.test.value else node.orelse
+
+    def visit_While(self, node: ast.While) -> ast.AST | list[ast.stmt]:
+        self.generic_visit(node)
+        # The interpreter never runs the `else` block of loops
+        if isinstance(node.test, ast.Constant) and not node.test.value and node is not self.last_statement:
+            return []
+        return node
+
+
+def get_bound_names(module: ast.Module) -> set[str]:
+    """Return the names bound anywhere in a module: assigned names, arguments, functions, classes and imports."""
+    names = set()
+    for node in ast.walk(module):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+    return names
+
+
+def optimize_module(module: ast.Module) -> tuple[ast.Module, set[str]]:
+    """
+    Return an optimized copy of a parsed module with `ConstantFolder`, and the names of the builtins whose calls were
+    folded: the optimized code only behaves like the original while these builtins are not shadowed.
+    """
+    folder = ConstantFolder(get_bound_names(module))
+    optimized = folder.visit(copy.deepcopy(module))
+    return optimized, folder.folded_builtins
+
+
+class CodeValidation:
+    """
+    Static validation of a code blob, run once before interpreting it.
+
+    A single pass over the syntax tree finds the imports, dunder attribute accesses and calls to undefined functions
+    that would fail at runtime, so that the code is rejected before running any of its statements, with the same
+    error messages. Nodes guarded by a `try` or `with` statement are left to the runtime checks, since the error could
+    be caught there.
+
+    Whether a called name is defined depends on the state, the tools and the functions defined by previous code, so
+    the pass only collects the names that the code calls without ever defining them: they are checked by [`check`].
+    Only calls that always run are collected: calls in function bodies, in branches and loop bodies, or on the right
+    side of boolean operators may never run, and are left to the runtime checks.
+
+    Args:
+        module (`ast.Module`): The parsed code.
+        authorized_imports (`AuthorizedImports`): The authorized imports.
+    """
+
+    def __init__(self, module: ast.Module, authorized_imports: AuthorizedImports):
+        self.authorized_imports = authorized_imports
+        # In the order of the statements: (top-level statement, error message or None, called name or None)
+        self._issues: list[tuple[ast.stmt, str | None, str | None]] = []
+        self._defined_names: set[str] = set()
+        self._star_import = False
+        for statement in module.body:
+            self._visit(statement, statement, guarded=False, conditional=False)
+        if self._star_import:
+            # Any name can be defined by the star import
+            self._issues = [issue for issue in self._issues if issue[1] is not None]
+        else:
+            self._issues = [issue for issue in self._issues if issue[2] not in self._defined_names]
+
+    def _visit(self, node: ast.AST, statement: ast.stmt, guarded: bool, conditional: bool, is_callee: bool = False):
+        if isinstance(node, (ast.Try, ast.TryStar, ast.With)):
+            guarded = True
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            self._visit_import(node, statement, guarded)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            self._defined_names.add(node.name)
+        elif isinstance(node, ast.arg):
+            self._defined_names.add(node.arg)
+        elif isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            self._defined_names.add(node.id)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            self._defined_names.update(node.names)
+        elif isinstance(node, ast.ExceptHandler) and node.name is not None:
+            self._defined_names.add(node.name)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name is not None:
+            self._defined_names.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest is not None:
+            self._defined_names.add(node.rest)
+        elif isinstance(node, ast.Attribute) and not guarded and not is_callee and isinstance(node.ctx, ast.Load):
+            if node.attr.startswith("__") and node.attr.endswith("__"):
+                self._issues.append((statement, f"Forbidden access to dunder attribute: {node.attr}", None))
+        elif isinstance(node, ast.Call) and not guarded and not conditional and isinstance(node.func, ast.Name):
+            self._issues.append((statement, None, node.func.id))
+        for field_name, value in ast.iter_fields(node):
+            for index, child in enumerate(value if isinstance(value, list) else [value]):
+                if isinstance(child, ast.AST):
+                    self._visit(
+                        child,
+                        statement,
+                        guarded,
+                        conditional or self._runs_conditionally(node, field_name, index),
+                        is_callee=isinstance(node, ast.Call) and child is node.func,
+                    )
+
+    @staticmethod
+    def _runs_conditionally(node: ast.AST, field_name: str, index: int) -> bool:
+        """Whether the child of a node found in field `field_name` at `index` may not run when the node runs."""
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            return field_name == "body"
+        if isinstance(node, (ast.If, ast.IfExp, ast.While)):
+            return field_name != "test"
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.comprehension)):
+            return field_name != "iter"
+        if isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp)):
+            return field_name != "generators" or index > 0
+        if isinstance(node, ast.BoolOp):
+            return index > 0
+        if isinstance(node, ast.Match):
+            return field_name == "cases"
+        if isinstance(node, ast.Assert):
+            return field_name == "msg"
+        # Generator expressions are evaluated lazily
+        return isinstance(node, ast.GeneratorExp)
+
+    def _visit_import(self, node: ast.Import | ast.ImportFrom, statement: ast.stmt, guarded: bool):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                self._defined_names.add(alias.asname or alias.name.split(".")[0])
+                if not guarded and not self.authorized_imports.is_authorized(alias.name):
+                    self._issues.append(
+                        (
+                            statement,
+                            f"Import of {alias.name} is not allowed. Authorized imports are: {str(self.authorized_imports)}",
+                            None,
+                        )
+                    )
+            return
+        self._star_import = self._star_import or any(alias.name == "*" for alias in node.names)
+        self._defined_names.update(alias.asname or alias.name for alias in node.names)
+        if not guarded and node.module is not None and not self.authorized_imports.is_authorized(node.module):
+            self._issues.append(
+                (
+                    statement,
+                    f"Import from {node.module} is not allowed. Authorized imports are: {str(self.authorized_imports)}",
+                    None,
+                )
+            )
+
+    def check(
+        self, state: dict[str, Any], static_tools: dict[str, Callable], custom_tools: dict[str, Callable]
+    ) -> tuple[ast.stmt, str] | None:
+        """Return the first top-level statement that is bound to fail, along with its error message, if any."""
+        for statement, error, called_name in self._issues:
+            if error is not None:
+                return statement, error
+            if (
+                called_name not in state
+                and called_name not in static_tools
+                and called_name not in custom_tools
+                and called_name not in ERRORS
+            ):
+                return (
+                    statement,
+                    f"Forbidden function evaluation: '{called_name}' is not among the explicitly allowed tools or defined/imported in the preceding code",
+                )
+        return None
+
+
+# Syntax supported by the interpreter, the only one allowed in code run by the native engine
+NATIVE_SUPPORTED_NODES = (
+    *(node for node in NODE_COMPILERS if node not in (ast.AsyncFunctionDef, ast.AsyncFor, ast.AsyncWith, ast.Await)),
+    ast.Module,
+    ast.expr_context,
+    ast.operator,
+    ast.unaryop,
+    ast.boolop,
+    ast.cmpop,
+    ast.comprehension,
+    ast.arguments,
+    ast.arg,
+    ast.keyword,
+    ast.alias,
+    ast.withitem,
+    ast.ExceptHandler,
+)
+
+# Attributes giving access to frames and code objects, hence to the globals of other modules
+NATIVE_FORBIDDEN_ATTRIBUTES = frozenset(
+    {
+        "f_back",
+        "f_builtins",
+        "f_code",
+        "f_globals",
+        "f_locals",
+        "gi_code",
+        "gi_frame",
+        "cr_code",
+        "cr_frame",
+        "ag_code",
+        "ag_frame",
+        "tb_frame",
+        "tb_next",
+    }
+)
+
+
+class NativeAccessChecks(ast.NodeTransformer):
+    """
+    Wrap the attributes and subscripts read by native code in a call to `NativeCode.CHECK_NAME`, which checks their
+    values with `check_safer_result` like the interpreter does, e.g. to reject `random._os`.
+
+    Wherever native code can swallow an exception, i.e. at the start of `except` and `finally` blocks and after `with`
+    statements, a call to `NativeCode.INTERRUPT_CHECK_NAME` raises again the interruption of an execution that ran out
+    of its budget, see [`native_check_interrupt`].
+    """
+
+    @staticmethod
+    def interrupt_check(node: ast.AST) -> ast.stmt:
+        call = ast.Call(ast.Name(NativeCode.INTERRUPT_CHECK_NAME, ast.Load()), [], [])
+        return ast.copy_location(ast.Expr(call), node)
+
+    def visit_access(self, node: ast.Attribute | ast.Subscript) -> ast.expr:
+        self.generic_visit(node)
+        if not isinstance(node.ctx, ast.Load):
+            return node
+        return ast.copy_location(ast.Call(ast.Name(NativeCode.CHECK_NAME, ast.Load()), [node], []), node)
+
+    visit_Attribute = visit_Subscript = visit_access
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> ast.ExceptHandler:
+        self.generic_visit(node)
+        node.body.insert(0, self.interrupt_check(node))
+        return node
+
+    def visit_Try(self, node: ast.Try) -> ast.Try:
+        self.generic_visit(node)
+        if node.finalbody:
+            node.finalbody.insert(0, self.interrupt_check(node))
+        return node
+
+    def visit_With(self, node: ast.With) -> list[ast.stmt]:
+        # A context manager can swallow the exception on exit
+        self.generic_visit(node)
+        return [node, self.interrupt_check(node)]
+
+
+class NativeCode:
+    """
+    Code verified and compiled for the `"native"` engine, which runs it with CPython `exec` instead of interpreting it.
+
+    The verification applies the rules of the interpreter to every node, including the ones guarded by a `try`: only
+    syntax supported by the interpreter, no dunder attribute, no dunder name other than `__name__`, no attribute giving
+    access to frames or code objects, and no relative import. Imports, calls to undefined functions and assignments to
+    tools are checked by [`CodeValidation`] and [`check`], like for the interpreter. At runtime, the values of
+    attributes and subscripts are checked with [`NativeAccessChecks`].
+
+    The value of the last statement is kept as the result of the code, like with the interpreter.
+
+    Args:
+        module (`ast.Module`): The parsed code.
+    """
+
+    FILENAME = "<code action>"
+    RESULT_NAME = "__result__"
+    CHECK_NAME = "__check__"
+    INTERRUPT_CHECK_NAME = "__check_interrupt__"
+
+    def __init__(self, module: ast.Module):
+        self.module = module
+        self.error: tuple[ast.stmt, str] | None = None
+        self.assigned_names: set[str] = set()
+        for statement in module.body:
+            for node in ast.walk(statement):
+                error = self._verify(node)
+                if error is not None:
+                    self.error = statement, error
+                    return
+        self.result_name = None
+        body = list(module.body)
+        if body and isinstance(body[-1], ast.Expr):
+            result = ast.Assign(targets=[ast.Name(self.RESULT_NAME, ast.Store())], value=body[-1].value)
+            body[-1] = ast.copy_location(result, body[-1])
+            self.result_name = self.RESULT_NAME
+        elif body and isinstance(body[-1], (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            target = body[-1].targets[-1] if isinstance(body[-1], ast.Assign) else body[-1].target
+            self.result_name = target.id if isinstance(target, ast.Name) else None
+        checked_module = NativeAccessChecks().visit(ast.Module(body=copy.deepcopy(body), type_ignores=[]))
+        self.code = compile(ast.fix_missing_locations(checked_module), self.FILENAME, "exec")
+
+    def _verify(self, node: ast.AST) -> str | None:
+        if not isinstance(node, NATIVE_SUPPORTED_NODES):
+            return f"{type(node).__name__} is not supported."
+        if isinstance(node, ast.Attribute):
+            if node.attr.startswith("__") and node.attr.endswith("__"):
+                return f"Forbidden access to dunder attribute: {node.attr}"
+            if node.attr in NATIVE_FORBIDDEN_ATTRIBUTES:
+                return f"Forbidden access to attribute: {node.attr}"
+        elif isinstance(node, ast.Name):
+            if node.id.startswith("__") and node.id.endswith("__") and node.id != "__name__":
+                return f"Forbidden access to dunder name: {node.id}"
+            if not isinstance(node.ctx, ast.Load):
+                self.assigned_names.add(node.id)
+        elif isinstance(node, ast.ImportFrom) and node.level:
+            return "Relative imports are not supported."
+        return None
+
+    def check(self, static_tools: dict[str, Callable]) -> tuple[ast.stmt, str] | None:
+        """Return the first top-level statement that must not run, along with its error message, if any."""
+        if self.error is not None:
+            return self.error
+        for name in self.assigned_names & static_tools.keys():
+            statement = next(
+                statement
+                for statement in self.module.body
+                if any(isinstance(node, ast.Name) and node.id == name for node in ast.walk(statement))
+            )
+            return statement, f"Cannot assign to name '{name}': doing this would erase the existing tool!"
+        return None
+
+    def statement_at(self, lineno: int) -> ast.stmt | None:
+        """Return the top-level statement spanning a line, if any."""
+        return next(
+            (statement for statement in self.module.body if statement.lineno <= lineno <= statement.end_lineno), None
+        )
+
+
+class ParsedCode:
+    """
+    Parsed code stored in a [`CodeCache`], along with its optimized and compiled statements, its native code and its
+    static validations once they have been needed. Static validations always run on the parsed code, as written.
+    """
+
+    def __init__(self, module: ast.Module):
+        self.module = module
+        self._optimized: tuple[ast.Module, set[str]] | None = None
+        self._compiled: dict[bool, list[CompiledNode]] = {}
+        self._native: NativeCode | None = None
+        self._validations: dict[tuple[str, ...], CodeValidation] = {}
+
+    @property
+    def optimized(self) -> ast.Module:
+        """The module optimized by `optimize_module`, which the interpreter runs instead of the parsed one."""
+        if self._optimized is None:
+            self._optimized = optimize_module(self.module)
+        return self._optimized[0]
+
+    def can_run_optimized(self, state: dict[str, Any], static_tools: dict[str, Callable], custom_tools) -> bool:
+        """Whether the optimized module behaves like the parsed one: none of the builtins it folded is shadowed."""
+        self.optimized
+        return all(
+            name not in state and name not in custom_tools and static_tools.get(name) is FOLDABLE_BUILTINS[name]
+            for name in self._optimized[1]
+        )
+
+    def compile(self, optimized: bool = True) -> list[CompiledNode]:
+        """Return the compiled statements of the optimized or parsed module, compiling them on the first call."""
+        compiled = self._compiled.get(optimized)
+        if compiled is None:
+            compiled = self._compiled[optimized] = compile_module(self.optimized if optimized else self.module)
+        return compiled
+
+    @property
+    def compiled(self) -> list[CompiledNode]:
+        return self.compile()
+
+    @property
+    def native(self) -> NativeCode:
+        if self._native is None:
+            self._native = NativeCode(self.module)
+        return self._native
+
+    def validation(self, authorized_imports: AuthorizedImports) -> CodeValidation:
+        """Return the static validation of the code for these authorized imports, running it on the first call."""
+        key = tuple(authorized_imports)
+        validation = self._validations.get(key)
+        if validation is None:
+            validation = self._validations[key] = CodeValidation(self.module, authorized_imports)
+        return validation
+
+
+class CodeCache:
+    """
+    Bounded LRU cache of parsed code, keyed by a hash of the source text.
+
+    Repeated code actions, for instance on retries or when many agents emit the same helper snippets, then skip
+    parsing and compiling. Cached syntax trees and compiled statements are never mutated during evaluation, so one
+    cache can safely be shared across executors and threads.
+
+    Args:
+        maxsize (`int`, defaults to `128`): Maximum number of code blobs kept in the cache.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, ParsedCode] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, code: str) -> ParsedCode:
+        """Return the parsed code from the cache, parsing it on a miss."""
+        key = hashlib.sha256(code.encode()).hexdigest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = ParsedCode(parse_code(code))
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FinalAnswerException(Exception):
+    def __init__(self, value):
+        self.value = value
+
+
+# Nodes allowed in the arguments of tool calls run concurrently: they read variables, but never call anything
+CONCURRENT_ARGUMENT_NODES = (
+    ast.Constant,
+    ast.Name,
+    ast.Attribute,
+    ast.Subscript,
+    ast.Slice,
+    ast.JoinedStr,
+    ast.FormattedValue,
+    ast.List,
+    ast.Tuple,
+    ast.Dict,
+    ast.Set,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.BoolOp,
+    ast.Compare,
+    ast.IfExp,
+    ast.Starred,
+    ast.expr_context,
+    ast.operator,
+    ast.unaryop,
+    ast.boolop,
+    ast.cmpop,
+)
+
+
+def get_concurrent_tool_call(
+    statement: ast.stmt, static_tools: dict[str, Callable]
+) -> tuple[ast.Call, set[str], set[str]] | None:
+    """
+    Return the tool call of a top-level statement `tool(...)` or `a, b = tool(...)` whose arguments call nothing else,
+    with the names read by its arguments and the names it assigns. Return `None` for any other statement.
+    """
+    if isinstance(statement, ast.Expr):
+        call, targets = statement.value, []
+    elif isinstance(statement, ast.Assign):
+        call, targets = statement.value, statement.targets
+    elif isinstance(statement, ast.AnnAssign) and statement.value is not None:
+        call, targets = statement.value, [statement.target]
+    else:
+        return None
+    if not isinstance(call, ast.Call) or not isinstance(call.func, ast.Name):
+        return None
+    if call.func.id not in static_tools or call.func.id in BASE_PYTHON_TOOLS or call.func.id == "final_answer":
+        return None
+    arguments = [*call.args, *(keyword.value for keyword in call.keywords)]
+    argument_nodes = [node for argument in arguments for node in ast.walk(argument)]
+    if not all(isinstance(node, CONCURRENT_ARGUMENT_NODES) for node in argument_nodes):
+        return None
+    assigned = set()
+    for node in (node for target in targets for node in ast.walk(target)):
+        if isinstance(node, ast.Name):
+            assigned.add(node.id)
+        elif not isinstance(node, (ast.Tuple, ast.List, ast.Starred, ast.expr_context)):
+            return None
+    return call, {node.id for node in argument_nodes if isinstance(node, ast.Name)}, assigned
+
+
+def schedule_tool_calls(
+    statements: Iterable[tuple[ast.stmt, Callable]],
+    state: dict[str, Any],
+    static_tools: dict[str, Callable],
+    custom_tools: dict[str, Callable],
+    authorized_imports: list[str],
+    trace: ConcurrencyTrace,
+) -> Generator[tuple[ast.stmt, Callable]]:
+    """
+    Run the independent tool calls of consecutive top-level statements concurrently, from the def-use graph of the
+    statements: each call starts as soon as the statements assigning the variables read by its arguments are done.
+
+    Yields the `(node, evaluate_node)` pairs of the statements, to be run in order like in `evaluate_python_code`.
+    Evaluating a statement whose call was scheduled waits for the call, then assigns its result: assignments and
+    errors happen in the order of the statements, and any other statement only runs after all the previous ones, so
+    that the print outputs and the state are the same as with a sequential execution.
+
+    The side effects of the tools are not: a call may already be running, or done, when a previous statement fails,
+    e.g. with `a = fail('x')\nb = send('email')`, the email is sent although the execution fails at the first line.
+    """
+    start_time = time.perf_counter()
+    batch = []
+
+    def run_batch():
+        if len(batch) < 2:
+            yield from ((node, evaluate_node) for node, evaluate_node, *_ in batch)
+            return
+        # Each call depends on the previous statements assigning a variable read by its arguments
+        dependencies = [
+            {previous for previous, (*_, assigned_names) in enumerate(batch[:index]) if read & assigned_names}
+            for index, (_, _, _, read, _) in enumerate(batch)
+        ]
+        futures, assigned = {}, set()
+        pool = concurrent.futures.ThreadPoolExecutor(len(batch), thread_name_prefix="tool_call")
+
+        def run_call(node: ast.stmt, call: ast.Call) -> Any:
+            start = time.perf_counter() - start_time
+            try:
+                return evaluate_ast(call, state, static_tools, custom_tools, authorized_imports)
+            finally:
+                end = time.perf_counter() - start_time
+                trace.calls.append(ScheduledCall(node.lineno, ast.unparse(node).splitlines()[0], start, end))
+
+        def start_ready_calls():
+            for index, (node, _, call, _, _) in enumerate(batch):
+                if index not in futures and dependencies[index] <= assigned:
+                    futures[index] = pool.submit(run_call, node, call)
+
+        def assign_result(index: int, node: ast.stmt) -> Callable:
+            def evaluate(state, static_tools, custom_tools, authorized_imports):
+                value = futures[index].result()
+                if isinstance(node, ast.Assign):
+                    targets = node.targets
+                elif isinstance(node, ast.AnnAssign):
+                    targets = [node.target]
+                else:
+                    targets = []
+                for target in targets:
+                    set_value(target, value, state, static_tools, custom_tools, authorized_imports)
+                assigned.add(index)
+                start_ready_calls()
+                return value
+
+            return evaluate
+
+        try:
+            start_ready_calls()
+            for index, (node, *_) in enumerate(batch):
+                yield node, assign_result(index, node)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    for node, evaluate_node in statements:
+        tool_call = get_concurrent_tool_call(node, static_tools)
+        if tool_call is not None:
+            batch.append((node, evaluate_node, *tool_call))
+            continue
+        yield from run_batch()
+        batch = []
+        yield node, evaluate_node
+    yield from run_batch()
+
+
+# Audit events blocked while code runs with the native engine, outside of tool calls: process creation, native code
+# loading, file modifications and opening files other than Python modules
+NATIVE_BLOCKED_AUDIT_EVENTS = (
+    "open",
+    "os.chmod",
+    "os.chown",
+    "os.link",
+    "os.mkdir",
+    "os.putenv",
+    "os.rename",
+    "os.symlink",
+    "os.unsetenv",
+    "os.utime",
+    "os.system",
+    "os.exec",
+    "os.spawn",
+    "os.posix_spawn",
+    "os.fork",
+    "os.forkpty",
+    "os.kill",
+    "os.killpg",
+    "os.remove",
+    "os.rmdir",
+    "os.truncate",
+    "shutil.copyfile",
+    "shutil.copytree",
+    "shutil.rmtree",
+    "subprocess.Popen",
+    "socket.bind",
+    "socket.connect",
+    "ctypes.",
+    "webbrowser.open",
+)
+
+# Whether the current thread runs code with the native engine, outside of a tool call
+native_execution = threading.local()
+native_audit_hook_lock = threading.Lock()
+native_audit_hook_installed = False
+
+
+# Files that lazy imports of authorized modules may read while code runs with the native engine
+NATIVE_MODULE_FILE_SUFFIXES = tuple(all_suffixes())
+
+
+def native_audit_hook(event: str, args: tuple):
+    if getattr(native_execution, "active", False) and event.startswith(NATIVE_BLOCKED_AUDIT_EVENTS):
+        if event == "open" and args[1] == "r" and str(args[0]).endswith(NATIVE_MODULE_FILE_SUFFIXES):
+            return
+        raise InterpreterError(f"Forbidden operation in code: {event}")
+
+
+def install_native_audit_hook():
+    """
+    Install `native_audit_hook` with `sys.addaudithook`, once per process: audit hooks cannot be removed, but outside of
+    native executions the hook only costs a thread-local lookup per audit event.
+    """
+    global native_audit_hook_installed
+    with native_audit_hook_lock:
+        if not native_audit_hook_installed:
+            sys.addaudithook(native_audit_hook)
+            native_audit_hook_installed = True
+
+
+@contextmanager
+def native_execution_guard(active: bool):
+    """Set whether the audit hook guards the current thread, restoring the previous setting on exit."""
+    previous = getattr(native_execution, "active", False)
+    native_execution.active = active
+    try:
+        yield
+    finally:
+        native_execution.active = previous
+
+
+def native_check_interrupt():
+    """
+    Raise again the `ExecutionInterrupted` of the native execution running in the current thread, if its budget ran
+    out: called by native code where it could have caught the interruption, e.g. with a bare `except:`.
+    """
+    watchdog = getattr(native_execution, "watchdog", None)
+    if watchdog is not None and watchdog.error is not None:
+        raise watchdog.error
+
+
+def trusted_tool(name: str, tool: Callable, state: dict[str, Any]) -> Callable:
+    """
+    Wrap a tool called by native code, so that its call is recorded with `call_tool` and its own operations are not
+    blocked by the audit hook.
+    """
+
+    @wraps(tool)
+    def call(*args, **kwargs):
+        with native_execution_guard(False):
+            return call_tool(name, tool, args, kwargs, state)
+
+    return call
+
+
+class NativeWatchdog:
+    """
+    Thread checking the execution budget of code run with the native engine, which cannot check it cooperatively.
+    When the budget runs out, `ExecutionInterrupted` is raised asynchronously in the thread running the code, which
+    stops it at its next bytecode instruction: a single long library call is only stopped once it returns. It is raised
+    again at each poll until the code returns, in case a library caught it, and code that catches it raises it again
+    with [`native_check_interrupt`].
+
+    Args:
+        budget (`ExecutionBudget`): The budget of the execution, started in the thread running the code.
+        native_code (`NativeCode`): The code being run, to report the statement that was running.
+        poll_interval (`float`, defaults to `0.05`): Interval between two checks of the budget, in seconds.
+    """
+
+    def __init__(self, budget: ExecutionBudget, native_code: NativeCode, poll_interval: float = 0.05):
+        self.budget = budget
+        self.native_code = native_code
+        self.poll_interval = poll_interval
+        self.error: ExecutionInterrupted | None = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._running = True
+        self._thread = threading.Thread(target=self._watch, name="NativeWatchdog", daemon=True)
+
+    def __enter__(self) -> "NativeWatchdog":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        self._stopped.set()
+        self._thread.join()
+
+    def stop(self):
+        """Stop raising `ExecutionInterrupted` in the thread running the code, once it returned."""
+        with self._lock:
+            self._running = False
+            if self.error is not None:
+                # Clear the exception if the code returned before it was raised
+                self._set_async_exception(None)
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            error = self.error
+            if error is None:
+                try:
+                    self.budget.check(self._current_statement(), sample_memory=True)
+                    continue
+                except ExecutionInterrupted as e:
+                    error = e
+            with self._lock:
+                if not self._running:
+                    return
+                self.error = error
+                self._set_async_exception(ExecutionInterrupted)
+
+    def _current_statement(self) -> ast.AST:
+        frame = sys._current_frames().get(self.budget.thread_id)
+        while frame is not None and frame.f_code.co_filename != NativeCode.FILENAME:
+            frame = frame.f_back
+        statement = self.native_code.statement_at(frame.f_lineno) if frame is not None else None
+        return statement if statement is not None else self.native_code.module
+
+    def _set_async_exception(self, exception: type[BaseException] | None):
+        import ctypes
+
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(
+            ctypes.c_ulong(self.budget.thread_id), ctypes.py_object(exception) if exception is not None else None
+        )
+
+
+def get_native_error_statement(native_code: NativeCode, error: BaseException) -> ast.stmt | None:
+    """Return the top-level statement of native code that raised an error, from its traceback or the one it replaced."""
+    for exception in (error, error.__context__):
+        traceback = exception.__traceback__ if exception is not None else None
+        while traceback is not None:
+            if traceback.tb_frame.f_code.co_filename == NativeCode.FILENAME:
+                return native_code.statement_at(traceback.tb_lineno)
+            traceback = traceback.tb_next
+    return None
+
+
+def evaluate_native(
+    native_code: NativeCode,
+    state: dict[str, Any],
+    static_tools: dict[str, Callable],
+    custom_tools: dict[str, Callable],
+    authorized_imports: AuthorizedImports,
+) -> Any:
+    """
+    Run verified code with CPython `exec`, with the state as globals and restricted builtins: the exception classes,
+    the tools and functions, and an `__import__` that only gives the safe wrappers of authorized modules. Prints are
+    captured in the state like with the interpreter, and the code runs under `native_audit_hook`.
+    """
+    install_native_audit_hook()
+
+    def native_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level or not check_import_authorized(name, authorized_imports):
+            raise InterpreterError(
+                f"Import of {name} is not allowed. Authorized imports are: {str(authorized_imports)}"
+            )
+        # Authorized modules are trusted like tools: their initialization may read data files
+        with native_execution_guard(False):
+            module = get_imported_module(import_module(name), state, authorized_imports)
+            if fromlist:
+                return module
+            return get_imported_module(import_module(name.split(".")[0]), state, authorized_imports)
+
+    def native_print(*args, sep=" ", end="\n"):
+        print_to_state(state, args, sep, end)
+
+    def native_check(value):
+        if type(value) not in SAFE_RESULT_TYPES:
+            check_safer_result(value, static_tools, authorized_imports)
+        return value
+
+    def check_attribute_name(name):
+        if isinstance(name, str) and name.startswith("__") and name.endswith("__"):
+            raise InterpreterError(f"Forbidden access to dunder attribute: {name}")
+        if name in NATIVE_FORBIDDEN_ATTRIBUTES:
+            raise InterpreterError(f"Forbidden access to attribute: {name}")
+
+    def native_getattr(obj, name, default=None):
+        check_attribute_name(name)
+        return native_check(getattr(obj, name, default))
+
+    def native_hasattr(obj, name):
+        check_attribute_name(name)
+        return hasattr(obj, name)
+
+    def native_setattr(obj, name, value):
+        check_attribute_name(name)
+        setattr(obj, name, value)
+
+    def native_parallel_map(func, iterable, max_workers=None):
+        if not callable(func):
+            return tools["parallel_map"](func, iterable, max_workers)
+
+        # The mapped function runs in the threads of the pool, which the audit hook must guard too
+        @wraps(func)
+        def guarded_func(item):
+            with native_execution_guard(True):
+                return func(item)
+
+        return tools["parallel_map"](guarded_func, iterable, max_workers)
+
+    tools = {
+        name: static_tools.get_safe(name, authorized_imports) if isinstance(static_tools, StaticTools) else tool
+        for name, tool in static_tools.items()
+    }
+    state["__builtins__"] = {
+        **ERRORS,
+        **custom_tools,
+        **{
+            name: tool if name in BASE_PYTHON_TOOLS else trusted_tool(name, tool, state)
+            for name, tool in tools.items()
+        },
+        "__build_class__": builtins.__build_class__,
+        "__import__": native_import,
+        native_code.CHECK_NAME: native_check,
+        native_code.INTERRUPT_CHECK_NAME: native_check_interrupt,
+        "getattr": native_getattr,
+        "hasattr": native_hasattr,
+        "setattr": native_setattr,
+        "print": native_print,
+    }
+    if "parallel_map" in tools:
+        state["__builtins__"]["parallel_map"] = native_parallel_map
+    state.pop(native_code.RESULT_NAME, None)
+    budget = state.get("_execution_budget")
+    previous_watchdog = getattr(native_execution, "watchdog", None)
+    with NativeWatchdog(budget, native_code) if budget is not None else nullcontext() as watchdog:
+        native_execution.watchdog = watchdog
+        try:
+            with native_execution_guard(True):
+                exec(native_code.code, state)
+        except ExecutionInterrupted:
+            if watchdog is not None:
+                watchdog.stop()
+                if watchdog.error is not None:
+                    raise watchdog.error from None
+            raise
+        finally:
+            native_execution.watchdog = previous_watchdog
+            # Functions defined in the code keep their own reference to the builtins
+            state.pop("__builtins__", None)
+    if native_code.result_name == native_code.RESULT_NAME:
+        return state.pop(native_code.RESULT_NAME)
+    return state.get(native_code.result_name) if native_code.result_name is not None else None
+
+
+def evaluate_python_code(
+    code: str,
+    static_tools: dict[str, Callable] | None = None,
+    custom_tools: dict[str, Callable] | None = None,
+    state: dict[str, Any] | None = None,
+    authorized_imports: list[str] | AuthorizedImports = BASE_BUILTIN_MODULES,
+    max_print_outputs_length: int = DEFAULT_MAX_LEN_OUTPUT,
+    engine: Literal["ast", "compiled", "native"] = "ast",
+    code_cache: CodeCache | None = None,
+    print_callback: Callable[[str], None] | None = None,
+    timeout: float | None = None,
+    cpu_timeout: float | None = None,
+    cancellation_token: CancellationToken | None = None,
+    max_memory: int | None = None,
+    memory_check_interval: int = BUDGET_CHECK_INTERVAL,
+    profile: bool = False,
+    event_loop: EventLoopThread | None = None,
+    parallel_tool_calls: bool = False,
+    record_tool_calls: bool = False,
+):
+    """
+    Evaluate a python expression using the content of the variables stored in a state and only evaluating a given set
+    of functions.
+
+    This function will recurse through the nodes of the tree provided.
+
+    Args:
+        code (`str`):
+            The code to evaluate.
+        static_tools (`Dict[str, Callable]`):
+            The functions that may be called during the evaluation. These can also be agents in a multiagent setting.
+            These tools cannot be overwritten in the code: any assignment to their name will raise an error.
+        custom_tools (`Dict[str, Callable]`):
+            The functions that may be called during the evaluation.
+            These tools can be overwritten in the code: any assignment to their name will overwrite them.
+        state (`Dict[str, Any]`):
+            A dictionary mapping variable names to values. The `state` should contain the initial inputs but will be
+            updated by this function to contain all variables as they are evaluated.
+            The print outputs will be stored in the state under the key "_print_outputs".
+        engine (`Literal["ast", "compiled", "native"]`, defaults to `"ast"`):
+            Evaluation engine: `"ast"` walks the syntax tree with `evaluate_ast`, `"compiled"` first compiles it into
+            closures with `compile_ast`, which is much faster on loops and function calls. `"native"` verifies the
+            code statically with `NativeCode`, then runs it with CPython `exec`, see `evaluate_native`.
+        code_cache (`CodeCache`, *optional*):
+            Cache of parsed and compiled code: if provided, code that was already evaluated is not parsed again.
+        print_callback (`Callable[[str], None]`, *optional*):
+            Function called with print outputs as soon as they are printed, see [`PrintContainer`].
+        timeout (`float`, *optional*):
+            Maximum wall-clock time of the execution, in seconds. Defaults to `DEFAULT_NATIVE_TIMEOUT` with the
+            `"native"` engine, which has no limit on the number of operations.
+        cpu_timeout (`float`, *optional*):
+            Maximum CPU time of the execution, in seconds.
+        cancellation_token (`CancellationToken`, *optional*):
+            Token that stops the execution when cancelled from another thread.
+        max_memory (`int`, *optional*):
+            Maximum peak memory allocated by the execution, in bytes. The peak is stored in the state's execution
+            budget, under the key "_execution_budget".
+        memory_check_interval (`int`, defaults to `BUDGET_CHECK_INTERVAL`):
+            Minimum number of operations between two samples of the allocated memory.
+        profile (`bool`, defaults to `False`):
+            Whether to profile the execution line by line. The `LineProfiler` is stored in the state under the key
+            "_profiler".
+        event_loop (`EventLoopThread`, *optional*):
+            Event loop on which to run the awaitables of the code, which enables `await`, `async for`, `async with`
+            and `async def`. It is stored in the state under the key "_event_loop".
+        parallel_tool_calls (`bool`, defaults to `False`):
+            Whether to run the independent tool calls of top-level statements concurrently, see
+            `schedule_tool_calls`. The `ConcurrencyTrace` of the calls is stored in the state under the key
+            "_concurrency_trace".
+        record_tool_calls (`bool`, defaults to `False`):
+            Whether to record the calls to [`Tool`]s made by the code, with `call_tool`. The `ToolCallRecord`s of the
+            calls are stored in the state under the key "_tool_calls".
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unsupported engine: {engine}")
+    parsed_code = code_cache.get(code) if code_cache is not None else ParsedCode(parse_code(code))
+    expression = parsed_code.module
+
+    if state is None:
+        state = {}
+    authorized_imports = get_authorized_imports_index(authorized_imports)
+    static_tools = StaticTools(static_tools)
+    custom_tools = custom_tools if custom_tools is not None else {}
+    optimized = parsed_code.can_run_optimized(state, static_tools, custom_tools)
+    module = parsed_code.optimized if optimized else expression
+    result = None
+    state["_print_outputs"] = PrintContainer(max_length=max_print_outputs_length, callback=print_callback)
+    state["_operations_count"] = {"counter": 0}
+    if engine == "native" and timeout is None:
+        timeout = DEFAULT_NATIVE_TIMEOUT
+    if any(budget is not None for budget in (timeout, cpu_timeout, cancellation_token, max_memory)):
+        state["_execution_budget"] = ExecutionBudget(
+            code, state, timeout, cpu_timeout, cancellation_token, max_memory, memory_check_interval
+        )
+    else:
+        state.pop("_execution_budget", None)
+    if profile:
+        state["_profiler"] = LineProfiler(code, module)
+    else:
+        state.pop("_profiler", None)
+    if event_loop is not None:
+        state["_event_loop"] = event_loop
+    else:
+        state.pop("_event_loop", None)
+    if parallel_tool_calls:
+        state["_concurrency_trace"] = ConcurrencyTrace(calls=[])
+    else:
+        state.pop("_concurrency_trace", None)
+    if record_tool_calls:
+        state["_tool_calls"] = []
+    else:
+        state.pop("_tool_calls", None)
+
+    if "final_answer" in static_tools:
+        previous_final_answer = static_tools["final_answer"]
+
+        @wraps(previous_final_answer)  # Keep a reference to the tool, to record the arguments of its calls
+        def final_answer(*args, **kwargs):  # Allow arbitrary arguments to be passed
+            raise FinalAnswerException(previous_final_answer(*args, **kwargs))
+
+        static_tools["final_answer"] = final_answer
+
+    if engine == "compiled":
+        statements = zip(module.body, parsed_code.compile(optimized))
+    elif engine == "native":
+        # The whole code is run at once by `evaluate_native`, CPython does its own constant folding
+        statements = ()
+    else:
+        statements = ((node, partial(evaluate_ast, node)) for node in module.body)
+    if parallel_tool_calls:
+        statements = schedule_tool_calls(
+            statements, state, static_tools, custom_tools, authorized_imports, state["_concurrency_trace"]
+        )
+
+    try:
+        static_error = parsed_code.validation(authorized_imports).check(state, static_tools, custom_tools)
+        if static_error is None and engine == "native":
+            static_error = parsed_code.native.check(static_tools)
+        if static_error is not None:
+            node, error_message = static_error
+            raise InterpreterError(error_message)
+        if engine == "native":
+            node = None
+            result = evaluate_native(parsed_code.native, state, static_tools, custom_tools, authorized_imports)
+        for node, evaluate_node in statements:
+            result = evaluate_node(state, static_tools, custom_tools, authorized_imports)
+        is_final_answer = False
+        return result, is_final_answer
+    except FinalAnswerException as e:
+        is_final_answer = True
+        return e.value, is_final_answer
+    except (Exception, ExecutionInterrupted) as e:
+        if engine == "native" and node is None:
+            node = get_native_error_statement(parsed_code.native, e)
+            if node is None:
+                # The error was raised before running any statement, e.g. when preparing the tools
+                raise InterpreterError(f"Code execution failed due to: {type(e).__name__}: {e}")
+        raise InterpreterError(
+            f"Code execution failed at line '{ast.get_source_segment(code, node)}' due to: {type(e).__name__}: {e}"
+        )
+    finally:
+        if "_execution_budget" in state:
+            state["_execution_budget"].close()
+
+
+@dataclass
+class CodeOutput:
+    output: Any
+    logs: str
+    is_final_answer: bool
+    peak_memory: int | None = None
+    profile: CodeProfile | None = None
+    concurrency_trace: ConcurrencyTrace | None = None
+    # Timed records are left out of comparisons of outputs
+    tool_calls: list[ToolCallRecord] | None = field(default=None, compare=False)
+
+
+@dataclass
+class StateSnapshot:
+    """
+    Snapshot of the variables and functions of a [`LocalPythonExecutor`], taken with
+    [`~LocalPythonExecutor.snapshot`].
+
+    Only the mappings from names to values are copied, so taking a snapshot is cheap even with large variables:
+    restoring it undoes assignments, deletions and definitions, but not in-place mutations of mutable values such as
+    `my_list.append(x)`.
+    """
+
+    state: dict[str, Any]
+    custom_tools: dict[str, Callable]
+
+
+class PythonExecutor(ABC):
+    @abstractmethod
+    def send_tools(self, tools: dict[str, Tool]) -> None: ...
+
+    @abstractmethod
+    def send_variables(self, variables: dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    def __call__(self, code_action: str) -> CodeOutput: ...
+
+
+class LocalPythonExecutor(PythonExecutor):
+    """
+    Executor of Python code in a local environment.
+
+    This executor evaluates Python code with restricted access to imports and built-in functions,
+    making it suitable for running untrusted code. It maintains state between executions,
+    allows for custom tools and functions to be made available to the code, and captures
+    print outputs separately from return values.
+
+    Args:
+        additional_authorized_imports (`list[str]`):
+            Additional authorized imports for the executor.
+        max_print_outputs_length (`int`, defaults to `DEFAULT_MAX_LEN_OUTPUT=50_000`):
+            Maximum length of the print outputs.
+        additional_functions (`dict[str, Callable]`, *optional*):
+            Additional Python functions to be added to the executor.
+        engine (`Literal["ast", "compiled", "native"]`, defaults to `"ast"`):
+            Evaluation engine. `"compiled"` compiles each code action into Python closures once before running it,
+            instead of re-dispatching on every node visit: it is much faster on loops, with the same security checks.
+            `"native"` verifies each code action statically against the same rules, then runs it with CPython `exec`
+            under restricted builtins and an audit hook: it runs at native speed, but operations are not counted.
+        code_cache (`CodeCache`, *optional*):
+            Cache of parsed and compiled code actions, whose `hits` and `misses` counters are available through
+            `executor.code_cache`. Pass the same instance to several executors to share it. Defaults to a new
+            cache owned by this executor.
+        prewarm_imports (`bool`, defaults to `False`):
+            Whether to build the safe wrappers of `additional_authorized_imports` modules at initialization, so that
+            their first import in code actions is as fast as the next ones.
+        print_callback (`Callable[[str], None]`, *optional*):
+            Function called with print outputs as soon as they are printed by code actions. See also
+            [`~LocalPythonExecutor.stream`].
+        timeout (`float`, *optional*):
+            Maximum wall-clock time of each code execution, in seconds. Defaults to `DEFAULT_NATIVE_TIMEOUT` with the
+            `"native"` engine.
+        cpu_timeout (`float`, *optional*):
+            Maximum CPU time of each code execution, in seconds.
+        max_memory (`int`, *optional*):
+            Maximum peak memory allocated by each code execution, in bytes. When it is exceeded, the execution fails
+            with an error listing the largest variables. When set, the peak is also reported in
+            `CodeOutput.peak_memory`.
+        memory_check_interval (`int`, defaults to `BUDGET_CHECK_INTERVAL=100`):
+            Minimum number of operations between two samples of the allocated memory.
+        profile (`bool`, defaults to `False`):
+            Whether to profile code executions line by line: wall time, operations and time spent in tool calls. The
+            profile is reported in `CodeOutput.profile`, and slows down the execution.
+        rollback_on_error (`bool`, defaults to `False`):
+            Whether to restore the variables and functions as they were before a code execution that fails, instead
+            of keeping the assignments made until the error. In-place mutations of mutable values are not undone: see
+            [`StateSnapshot`].
+        max_state_memory (`int`, *optional*):
+            Maximum size of the variables kept in memory between code executions, in bytes. Beyond it, the largest
+            numpy and pandas variables are spilled to memory-mapped files, see [`StateMemoryManager`]. The size of each
+            variable is then available in `executor.state_manager.stats`.
+        spill_dir (`str`, *optional*):
+            Directory of the files of spilled variables. Defaults to a new temporary directory.
+        async_mode (`bool`, defaults to `False`):
+            Whether code actions can use `await`, `async for`, `async with` and `async def`, e.g. to await tools whose
+            `forward` is a coroutine function. The executor then owns an [`EventLoopThread`] running the awaitables,
+            so that coroutines gathered with `asyncio.gather` run concurrently. `import asyncio` gives a curated
+            module with `gather`, `run`, `sleep`, `wait_for` and synchronization primitives.
+        max_parallel_workers (`int`, defaults to `DEFAULT_MAX_PARALLEL_WORKERS=8`):
+            Size of the thread pool of the `parallel_map` function of code actions, see [`ParallelMap`].
+        parallel_tool_calls (`bool`, defaults to `False`):
+            Whether to run the tool calls of consecutive top-level statements concurrently when their arguments do
+            not depend on each other's results, e.g. several searches with literal queries. The print outputs and
+            variables are the same as with a sequential execution, and the calls that overlapped are reported in
+            `CodeOutput.concurrency_trace`. The tools must be thread-safe, and safe to call even if a previous
+            statement fails: a call may start before the previous statements are done, so its side effects, e.g.
+            sending an email, can happen although the execution fails before reaching it.
+        record_tool_calls (`bool`, defaults to `False`):
+            Whether to record the calls to [`Tool`]s made by code actions, with their arguments, duration, output size
+            and error, in `CodeOutput.tool_calls`. Plain functions are not recorded, and at most
+            `MAX_TOOL_CALL_RECORDS` calls are recorded per code action.
+
+    Running executions can be stopped from another thread with `executor.cancellation_token.cancel()`, until the
+    token is reset: this is what `MultiStepAgent.interrupt()` does. Time budgets and cancellation are checked while
+    the interpreter runs, so a single long call to a library function is only stopped once it returns.
+    """
+
+    def __init__(
+        self,
+        additional_authorized_imports: list[str],
+        max_print_outputs_length: int | None = None,
+        additional_functions: dict[str, Callable] | None = None,
+        engine: Literal["ast", "compiled", "native"] = "ast",
+        code_cache: CodeCache | None = None,
+        prewarm_imports: bool = False,
+        print_callback: Callable[[str], None] | None = None,
+        timeout: float | None = None,
+        cpu_timeout: float | None = None,
+        max_memory: int | None = None,
+        memory_check_interval: int = BUDGET_CHECK_INTERVAL,
+        profile: bool = False,
+        rollback_on_error: bool = False,
+        max_state_memory: int | None = None,
+        spill_dir: str | None = None,
+        async_mode: bool = False,
+        max_parallel_workers: int = DEFAULT_MAX_PARALLEL_WORKERS,
+        parallel_tool_calls: bool = False,
+        record_tool_calls: bool = False,
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unsupported engine: {engine}")
+        self.engine = engine
+        self.rollback_on_error = rollback_on_error
+        self.state_manager = StateMemoryManager(max_state_memory, spill_dir) if max_state_memory is not None else None
+        self.event_loop = EventLoopThread() if async_mode else None
+        self.parallel_map = ParallelMap(max_parallel_workers)
+        self.parallel_tool_calls = parallel_tool_calls
+        self.record_tool_calls = record_tool_calls
+        self.print_callback = print_callback
+        self.timeout = timeout
+        self.cpu_timeout = cpu_timeout
+        self.max_memory = max_memory
+        self.memory_check_interval = memory_check_interval
+        self.profile = profile
+        self.cancellation_token = CancellationToken()
+        self.code_cache = code_cache if code_cache is not None else CodeCache()
+        self.custom_tools = {}
+        self.state = {"__name__": "__main__"}
+        self.max_print_outputs_length = max_print_outputs_length
+        if max_print_outputs_length is None:
+            self.max_print_outputs_length = DEFAULT_MAX_LEN_OUTPUT
+        self.additional_authorized_imports = additional_authorized_imports
+        self.authorized_imports = list(set(BASE_BUILTIN_MODULES) | set(self.additional_authorized_imports))
+        if async_mode and "asyncio" not in self.authorized_imports:
+            self.authorized_imports.append("asyncio")
+        self.authorized_imports_index = AuthorizedImports(self.authorized_imports)
+        self._check_authorized_imports_are_installed()
+        if prewarm_imports:
+            SAFE_MODULE_CACHE.prewarm(self.additional_authorized_imports, self.authorized_imports)
+        self.static_tools = None
+        self.additional_functions = additional_functions or {}
+
+    def _check_authorized_imports_are_installed(self):
+        """
+        Check that all authorized imports are installed on the system.
+
+        Handles wildcard imports ("*") and partial star-pattern imports (e.g., "os.*").
+
+        Raises:
+            InterpreterError: If any of the authorized modules are not installed.
+        """
+        missing_modules = [
+            base_module
+            for imp in self.authorized_imports
+            if imp != "*" and find_spec(base_module := imp.split(".")[0]) is None
+        ]
         if missing_modules:
             raise InterpreterError(
                 f"Non-installed authorized modules: {', '.join(missing_modules)}. "
@@ -1676,23 +5317,416 @@ class LocalPythonExecutor(PythonExecutor):
             )
 
     def __call__(self, code_action: str) -> CodeOutput:
-        output, is_final_answer = evaluate_python_code(
-            code_action,
-            static_tools=self.static_tools,
-            custom_tools=self.custom_tools,
-            state=self.state,
-            authorized_imports=self.authorized_imports,
-            max_print_outputs_length=self.max_print_outputs_length,
-        )
+        snapshot = self.snapshot() if self.rollback_on_error else None
+        try:
+            output, is_final_answer = evaluate_python_code(
+                code_action,
+                static_tools=self.static_tools,
+                custom_tools=self.custom_tools,
+                state=self.state,
+                authorized_imports=self.authorized_imports_index,
+                max_print_outputs_length=self.max_print_outputs_length,
+                engine=self.engine,
+                code_cache=self.code_cache,
+                print_callback=self.print_callback,
+                timeout=self.timeout,
+                cpu_timeout=self.cpu_timeout,
+                cancellation_token=self.cancellation_token,
+                max_memory=self.max_memory,
+                memory_check_interval=self.memory_check_interval,
+                profile=self.profile,
+                event_loop=self.event_loop,
+                parallel_tool_calls=self.parallel_tool_calls,
+                record_tool_calls=self.record_tool_calls,
+            )
+        except InterpreterError as e:
+            if snapshot is None:
+                raise
+            self.restore(snapshot)
+            raise InterpreterError(
+                f"{e}\nThe variables and functions were restored to their values before this code execution."
+            ) from e
+        finally:
+            if self.state_manager is not None:
+                self.state_manager.update(self.state)
         logs = str(self.state["_print_outputs"])
-        return CodeOutput(output=output, logs=logs, is_final_answer=is_final_answer)
+        return CodeOutput(
+            output=output,
+            logs=logs,
+            is_final_answer=is_final_answer,
+            peak_memory=self.state["_execution_budget"].peak_memory,
+            profile=self.state["_profiler"].report() if self.profile else None,
+            concurrency_trace=self.state.get("_concurrency_trace"),
+            tool_calls=self.state.get("_tool_calls"),
+        )
+
+    def stream(self, code_action: str) -> Generator[str | CodeOutput]:
+        """
+        Execute code and stream its print outputs as they are produced.
+
+        Args:
+            code_action (`str`): Code to execute.
+
+        Yields:
+            `str`: Print outputs, as soon as they are printed.
+            `CodeOutput`: Output of the execution, yielded last.
+
+        Raises:
+            InterpreterError: If the code execution fails, after all its print outputs were yielded.
+        """
+        outputs = queue.Queue()
+        result = {}
+        print_callback = self.print_callback
+
+        def callback(text: str):
+            if print_callback is not None:
+                print_callback(text)
+            outputs.put(text)
+
+        def run():
+            try:
+                result["output"] = self(code_action)
+            except BaseException as e:
+                result["error"] = e
+            finally:
+                outputs.put(None)
+
+        self.print_callback = callback
+        try:
+            thread = threading.Thread(target=run, daemon=True)
+            thread.start()
+            while (text := outputs.get()) is not None:
+                yield text
+            thread.join()
+        finally:
+            self.print_callback = print_callback
+        if "error" in result:
+            raise result["error"]
+        yield result["output"]
 
     def send_variables(self, variables: dict[str, Any]):
         self.state.update(variables)
 
     def send_tools(self, tools: dict[str, Tool]):
         # Combine agent tools, base Python tools, and additional Python functions
-        self.static_tools = {**tools, **BASE_PYTHON_TOOLS.copy(), **self.additional_functions}
+        self.static_tools = StaticTools(
+            {**tools, **BASE_PYTHON_TOOLS.copy(), "parallel_map": self.parallel_map, **self.additional_functions}
+        )
+
+    def snapshot(self) -> StateSnapshot:
+        """Take a snapshot of the variables and functions, to be restored later with [`~LocalPythonExecutor.restore`]."""
+        return StateSnapshot(state=self.state.copy(), custom_tools=self.custom_tools.copy())
+
+    def restore(self, snapshot: StateSnapshot):
+        """
+        Restore the variables and functions of a snapshot. The state is updated in place, so that functions defined
+        by code actions keep seeing the current variables. The logs of the last execution are kept.
+        """
+        execution_state = {key: self.state[key] for key in EXECUTION_STATE_KEYS if key in self.state}
+        self.state.clear()
+        self.state.update(snapshot.state)
+        self.state.update(execution_state)
+        self.custom_tools.clear()
+        self.custom_tools.update(snapshot.custom_tools)
+
+    def fork(self) -> "LocalPythonExecutor":
+        """
+        Create an executor with the same tools and settings, starting from a snapshot of the current variables and
+        functions: code run by either executor then does not change the variables of the other one, e.g. to try
+        alternative code candidates from the same starting point.
+
+        Values are shared rather than copied, so in-place mutations of mutable values are seen by both executors.
+        Functions defined before the fork also keep reading global variables from the state of this executor.
+        """
+        forked = copy.copy(self)
+        snapshot = self.snapshot()
+        forked.state, forked.custom_tools = snapshot.state, snapshot.custom_tools
+        forked.cancellation_token = CancellationToken()
+        # The fork owns its thread pool, so that cleaning it up does not stop the one of this executor
+        forked.parallel_map = ParallelMap(self.parallel_map.max_workers)
+        if self.static_tools is not None:
+            forked.static_tools = self.static_tools.copy()
+            forked.static_tools["parallel_map"] = forked.parallel_map
+        if self.state_manager is not None:
+            forked.state_manager = StateMemoryManager(
+                self.state_manager.max_memory, self.state_manager.spill_dir, self.state_manager.min_spill_size
+            )
+        if self.event_loop is not None:
+            forked.event_loop = EventLoopThread(self.event_loop.poll_interval, self.event_loop.max_workers)
+        return forked
+
+    def cleanup(self):
+        """Stop the thread pool of `parallel_map` and, in async mode, the event loop of the executor."""
+        self.parallel_map.shutdown()
+        if self.event_loop is not None:
+            self.event_loop.close()
+
+
+def send_message(connection, message: Any):
+    """
+    Send a message through a multiprocessing connection, pickled with protocol 5: large buffers such as numpy arrays
+    are sent out-of-band as raw bytes, without being copied into the pickle payload.
+    """
+    buffers = []
+    payload = pickle.dumps(message, protocol=5, buffer_callback=buffers.append)
+    buffers = [buffer.raw() for buffer in buffers]
+    connection.send([buffer.nbytes for buffer in buffers])
+    connection.send_bytes(payload)
+    for buffer in buffers:
+        connection.send_bytes(buffer)
+
+
+def receive_message(connection) -> Any:
+    """Receive a message sent with `send_message`: out-of-band buffers are received into writable memory."""
+    buffer_sizes = connection.recv()
+    payload = connection.recv_bytes()
+    buffers = []
+    for size in buffer_sizes:
+        buffer = bytearray(size)
+        if size:
+            connection.recv_bytes_into(buffer)
+        else:
+            connection.recv_bytes()
+        buffers.append(buffer)
+    return pickle.loads(payload, buffers=buffers)
+
+
+def send_reply(connection, status: Literal["result", "error"], value: Any):
+    """Send a reply through a connection, degrading values that cannot be pickled into their string representation."""
+    try:
+        send_message(connection, (status, value))
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        if status == "error":
+            value = InterpreterError(f"{type(value).__name__}: {value}")
+        elif isinstance(value, CodeOutput):
+            value = replace(value, output=str(value.output))
+        else:
+            value = str(value)
+        logger.warning(f"Could not pickle {status} to send it to another process, sending a string instead: {e}")
+        send_message(connection, (status, value))
+
+
+class ProcessToolProxy:
+    """
+    Callable standing for a tool in a worker process: calls are run by the parent process, which owns the tool.
+    Proxies sharing a connection share a lock, so that calls from several threads, e.g. with `parallel_map`, do not
+    interleave their messages.
+    """
+
+    def __init__(self, name: str, connection, lock=None):
+        self.name = self.__name__ = name
+        self.connection = connection
+        self.lock = lock if lock is not None else threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self.lock:
+            send_message(self.connection, ("call_tool", self.name, args, kwargs))
+            status, value = receive_message(self.connection)
+        if status == "error":
+            raise value
+        return value
+
+
+def run_process_worker(connection):
+    """Main loop of a worker process: own a `LocalPythonExecutor` and run the commands sent by the parent process."""
+    executor = None
+    tool_calls_lock = threading.Lock()
+    while True:
+        try:
+            command, *args = receive_message(connection)
+        except (EOFError, OSError):
+            return
+        try:
+            result = None
+            if command == "init":
+                additional_authorized_imports, executor_kwargs = args
+                if executor is not None:
+                    executor.cleanup()
+                executor = LocalPythonExecutor(additional_authorized_imports, **executor_kwargs)
+                executor.send_tools({})
+            elif command == "send_tools":
+                executor.send_tools({name: ProcessToolProxy(name, connection, tool_calls_lock) for name in args[0]})
+            elif command == "send_variables":
+                executor.send_variables(args[0])
+            elif command == "call":
+                result = executor(args[0])
+            elif command == "close":
+                # Stop the thread pools and event loop of the executor, which would otherwise outlive it in the reused worker
+                if executor is not None:
+                    executor.cleanup()
+                executor = None
+            send_reply(connection, "result", result)
+        except Exception as e:
+            if command == "call" and (logs := str(executor.state.get("_print_outputs", ""))):
+                e = InterpreterError(f"Execution logs:\n{logs}\n{e}")
+            send_reply(connection, "error", e)
+
+
+class ProcessWorker:
+    """Persistent worker process, running `run_process_worker`."""
+
+    def __init__(self, context):
+        self.connection, worker_connection = context.Pipe()
+        self.process = context.Process(target=run_process_worker, args=(worker_connection,), daemon=True)
+        self.process.start()
+        worker_connection.close()
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def terminate(self):
+        self.connection.close()
+        self.process.terminate()
+        self.process.join()
+
+
+class LocalProcessPool:
+    """
+    Pool of persistent worker processes for [`LocalProcessPythonExecutor`].
+
+    Each executor takes a worker out of the pool for its whole lifetime, and gives it back on cleanup: the worker is
+    then reused by the next executor, which avoids paying the process startup time for each agent. New workers are
+    started as needed.
+
+    Args:
+        max_idle_workers (`int`, *optional*): Maximum number of idle workers kept alive. Defaults to the CPU count.
+        start_method (`str`, defaults to `"spawn"`): Multiprocessing start method of the workers. `"spawn"` is safe to
+            use from multi-threaded servers, `"fork"` starts workers faster where it is available.
+    """
+
+    def __init__(self, max_idle_workers: int | None = None, start_method: str = "spawn"):
+        self.max_idle_workers = max_idle_workers if max_idle_workers is not None else os.cpu_count() or 1
+        self.context = multiprocessing.get_context(start_method)
+        self._idle_workers: list[ProcessWorker] = []
+        self._lock = threading.Lock()
+
+    def prestart(self, count: int):
+        """Start workers until `count` of them are idle, so that the next executors can start without waiting."""
+        with self._lock:
+            while len(self._idle_workers) < min(count, self.max_idle_workers):
+                self._idle_workers.append(ProcessWorker(self.context))
+
+    def acquire(self) -> ProcessWorker:
+        with self._lock:
+            while self._idle_workers:
+                worker = self._idle_workers.pop()
+                if worker.is_alive():
+                    return worker
+        return ProcessWorker(self.context)
+
+    def release(self, worker: ProcessWorker):
+        with self._lock:
+            if worker.is_alive() and len(self._idle_workers) < self.max_idle_workers:
+                self._idle_workers.append(worker)
+                return
+        worker.terminate()
+
+    def shutdown(self):
+        """Terminate all idle workers."""
+        with self._lock:
+            workers, self._idle_workers = self._idle_workers, []
+        for worker in workers:
+            worker.terminate()
+
+    def __len__(self):
+        return len(self._idle_workers)
+
+
+LOCAL_PROCESS_POOL = LocalProcessPool()
+
+
+class LocalProcessPythonExecutor(PythonExecutor):
+    """
+    Executor of Python code with a [`LocalPythonExecutor`] running in a separate worker process.
+
+    Each executor owns one persistent worker process, which holds its interpreter state: agents running in threads
+    of the same process are not limited by the GIL anymore, and scale across cores. Tools stay in the parent process:
+    when the code calls a tool, the call is sent back and run there. Variables, tool arguments and outputs are
+    pickled to cross the process boundary, with large buffers such as numpy arrays sent out-of-band; outputs that
+    cannot be pickled are returned as their string representation.
+
+    Args:
+        additional_authorized_imports (`list[str]`):
+            Additional authorized imports for the executor.
+        pool (`LocalProcessPool`, *optional*):
+            Pool to take the worker process from. Defaults to a pool shared by all executors of the process.
+        **kwargs:
+            Additional arguments to pass to the [`LocalPythonExecutor`] of the worker process: they must be picklable.
+    """
+
+    def __init__(self, additional_authorized_imports: list[str], pool: LocalProcessPool | None = None, **kwargs):
+        self.additional_authorized_imports = additional_authorized_imports
+        self.executor_kwargs = kwargs
+        self.pool = pool if pool is not None else LOCAL_PROCESS_POOL
+        self.tools = {}
+        self.worker = self.pool.acquire()
+        self._request("init", additional_authorized_imports, kwargs)
+
+    def _request(self, command: str, *args) -> Any:
+        if self.worker is None:
+            raise InterpreterError("This executor was cleaned up: its worker process is not available anymore.")
+        try:
+            send_message(self.worker.connection, (command, *args))
+            while True:
+                message = receive_message(self.worker.connection)
+                if message[0] != "call_tool":
+                    break
+                _, name, args, kwargs = message
+                try:
+                    send_reply(self.worker.connection, "result", self.tools[name](*args, **kwargs))
+                except Exception as e:
+                    send_reply(self.worker.connection, "error", e)
+        except (EOFError, OSError) as e:
+            self.worker.terminate()
+            self.worker = self.pool.acquire()
+            send_message(self.worker.connection, ("init", self.additional_authorized_imports, self.executor_kwargs))
+            receive_message(self.worker.connection)
+            self._request("send_tools", list(self.tools))
+            raise InterpreterError(
+                f"The worker process died while running '{command}', so the interpreter state was lost: {e}"
+            )
+        status, value = message
+        if status == "error":
+            raise value
+        return value
+
+    def send_tools(self, tools: dict[str, Tool]):
+        self.tools = dict(tools)
+        self._request("send_tools", list(self.tools))
+
+    def send_variables(self, variables: dict[str, Any]):
+        self._request("send_variables", variables)
 
+    def __call__(self, code_action: str) -> CodeOutput:
+        return self._request("call", code_action)
 
-__all__ = ["evaluate_python_code", "LocalPythonExecutor"]
+    def cleanup(self):
+        """Give the worker process back to the pool, after resetting its interpreter state."""
+        if self.worker is None:
+            return
+        worker, self.worker = self.worker, None
+        try:
+            send_message(worker.connection, ("close",))
+            receive_message(worker.connection)
+        except (EOFError, OSError):
+            worker.terminate()
+            return
+        self.pool.release(worker)
+
+
+__all__ = [
+    "evaluate_python_code",
+    "AuthorizedImports",
+    "CancellationToken",
+    "CodeCache",
+    "ConcurrencyTrace",
+    "EventLoopThread",
+    "LocalPythonExecutor",
+    "LocalProcessPool",
+    "LocalProcessPythonExecutor",
+    "NativeCode",
+    "ParallelMap",
+    "StateMemoryManager",
+    "StateSnapshot",
+    "ToolCallRecord",
+]
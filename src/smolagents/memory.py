@@ -11,6 +11,7 @@ from smolagents.utils import AgentError, make_json_serializable
 if TYPE_CHECKING:
     import PIL.Image
 
+    from smolagents.local_python_executor import CodeProfile
     from smolagents.models import ChatMessage
     from smolagents.monitoring import AgentLogger
 
@@ -26,9 +27,13 @@ class ToolCall:
     name: str
     arguments: Any
     id: str
+    # Only set for calls made from code actions, which are timed by the executor
+    timing: Timing | None = None
+    output_size: int | None = None
+    error: str | None = None
 
     def dict(self):
-        return {
+        tool_call = {
             "id": self.id,
             "type": "function",
             "function": {
@@ -36,6 +41,9 @@ class ToolCall:
                 "arguments": make_json_serializable(self.arguments),
             },
         }
+        if self.timing is not None:
+            tool_call.update(timing=self.timing.dict(), output_size=self.output_size, error=self.error)
+        return tool_call
 
 
 @dataclass
@@ -62,6 +70,8 @@ class ActionStep(MemoryStep):
     action_output: Any = None
     token_usage: TokenUsage | None = None
     is_final_answer: bool = False
+    profile: "CodeProfile | None" = None
+    code_tool_calls: list[ToolCall] | None = None
 
     def dict(self):
         # We overwrite the method to parse the tool_calls and action_output manually
@@ -87,6 +97,8 @@ class ActionStep(MemoryStep):
             "action_output": make_json_serializable(self.action_output),
             "token_usage": asdict(self.token_usage) if self.token_usage else None,
             "is_final_answer": self.is_final_answer,
+            "profile": self.profile.dict() if self.profile else None,
+            "code_tool_calls": [tc.dict() for tc in self.code_tool_calls] if self.code_tool_calls else [],
         }
 
     def to_messages(self, summary_mode: bool = False) -> list[ChatMessage]:
@@ -250,7 +262,8 @@ class AgentMemory:
 
         Args:
             logger (`AgentLogger`): The logger to print replay logs to.
-            detailed (`bool`, default `False`): If True, also displays the memory at each step. Defaults to False.
+            detailed (`bool`, default `False`): If True, also displays the memory at each step, and the profile of
+                code actions if the executor recorded one. Defaults to False.
                 Careful: will increase log length exponentially. Use only for debugging.
         """
         logger.console.log("Replaying the agent's steps:")
@@ -264,6 +277,8 @@ class AgentMemory:
                     logger.log_messages(step.model_input_messages, level=LogLevel.ERROR)
                 if step.model_output is not None:
                     logger.log_markdown(title="Agent output:", content=step.model_output, level=LogLevel.ERROR)
+                if detailed and step.profile is not None:
+                    logger.log_markdown(title="Code profile:", content=step.profile.render(), level=LogLevel.ERROR)
             elif isinstance(step, PlanningStep):
                 logger.log_rule("Planning step", level=LogLevel.ERROR)
                 if detailed and step.model_input_messages is not None:
@@ -85,6 +85,7 @@ class Monitor:
         self.logger = logger
         self.total_input_token_count = 0
         self.total_output_token_count = 0
+        self.tool_call_stats: dict[str, dict[str, float]] = {}
 
     def get_total_token_counts(self) -> TokenUsage:
         return TokenUsage(
@@ -92,10 +93,23 @@ class Monitor:
             output_tokens=self.total_output_token_count,
         )
 
+    def get_tool_call_stats(self) -> dict[str, dict[str, float]]:
+        """
+        Return statistics of the calls to tools made from code actions, by tool: number of calls and errors, total and
+        maximum duration in seconds, and total output size in bytes. Tools are sorted by decreasing total duration.
+        """
+        return {
+            name: dict(tool_stats)
+            for name, tool_stats in sorted(
+                self.tool_call_stats.items(), key=lambda item: item[1]["total_duration"], reverse=True
+            )
+        }
+
     def reset(self):
         self.step_durations = []
         self.total_input_token_count = 0
         self.total_output_token_count = 0
+        self.tool_call_stats = {}
 
     def update_metrics(self, step_log):
         """Update the metrics of the monitor.
@@ -105,6 +119,17 @@ class Monitor:
         """
         step_duration = step_log.timing.duration
         self.step_durations.append(step_duration)
+        # Tool calls are aggregated as they come, so that the monitor does not grow with the number of calls
+        for tool_call in getattr(step_log, "code_tool_calls", None) or []:
+            tool_stats = self.tool_call_stats.setdefault(
+                tool_call.name, {"calls": 0, "errors": 0, "total_duration": 0.0, "max_duration": 0.0, "output_size": 0}
+            )
+            duration = tool_call.timing.duration or 0.0
+            tool_stats["calls"] += 1
+            tool_stats["errors"] += tool_call.error is not None
+            tool_stats["total_duration"] += duration
+            tool_stats["max_duration"] = max(tool_stats["max_duration"], duration)
+            tool_stats["output_size"] += tool_call.output_size or 0
         console_outputs = f"[Step {len(self.step_durations)}: Duration {step_duration:.2f} seconds"
 
         if step_log.token_usage is not None:
@@ -209,8 +234,13 @@ class AgentLogger:
             level=level,
         )
 
-    def log_messages(self, messages: list[dict], level: LogLevel = LogLevel.DEBUG) -> None:
-        messages_as_string = "\n".join([json.dumps(dict(message), indent=4) for message in messages])
+    def log_messages(self, messages: list, level: LogLevel = LogLevel.DEBUG) -> None:
+        messages_as_string = "\n".join(
+            [
+                json.dumps(message.dict() if hasattr(message, "dict") else dict(message), indent=4, default=str)
+                for message in messages
+            ]
+        )
         self.log(
             Syntax(
                 messages_as_string,
@@ -15,15 +15,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import base64
+import hashlib
 import inspect
 import json
 import os
 import pickle
 import re
 import secrets
+import socket
 import subprocess
+import tarfile
 import tempfile
+import threading
 import time
+import zlib
+from collections import defaultdict
 from contextlib import closing
 from io import BytesIO
 from pathlib import Path
@@ -36,12 +42,12 @@ from requests.exceptions import RequestException
 
 from .default_tools import FinalAnswerTool
 from .local_python_executor import CodeOutput, PythonExecutor
-from .monitoring import LogLevel
+from .monitoring import AgentLogger, LogLevel
 from .tools import Tool, get_tools_definition_code
 from .utils import AgentError
 
 
-__all__ = ["E2BExecutor", "ModalExecutor", "DockerExecutor", "WasmExecutor"]
+__all__ = ["E2BExecutor", "ModalExecutor", "DockerExecutor", "WasmExecutor", "ExecutorPool"]
 
 
 try:
@@ -54,12 +60,18 @@ except ModuleNotFoundError:
 
 class RemotePythonExecutor(PythonExecutor):
     FINAL_ANSWER_EXCEPTION = "FinalAnswerException"
+    # Compressed variables larger than this are uploaded as files instead of being inlined in the code
+    MAX_INLINE_VARIABLE_SIZE = 64 * 1024
+    UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
 
     def __init__(self, additional_imports: list[str], logger):
         self.additional_imports = additional_imports
         self.logger = logger
         self.logger.log("Initializing executor, hold on...")
         self.installed_packages = []
+        # Digests of the pickled variables sent to the kernel: variables sent with the same digest are only sent again
+        # if the kernel reports that they changed since
+        self.sent_variables: dict[str, str] = {}
 
     def run_code_raise_errors(self, code: str) -> CodeOutput:
         """
@@ -89,16 +101,102 @@ class RemotePythonExecutor(PythonExecutor):
     def send_variables(self, variables: dict[str, Any]):
         """
         Send variables to the kernel namespace using pickle.
+
+        Each variable is pickled and compressed on its own, and is only sent if it changed since it was last sent: the
+        kernel keeps the digest of each variable it loaded, and a variable that was sent with the same digest is only
+        skipped if the kernel reports that it still holds the same value, since code actions may rebind or mutate it.
+        Small variables are inlined in the code run by the kernel, larger ones are uploaded as files with
+        `upload_file`, so that the kernel does not have to parse them as code.
         """
-        if not variables:
+        pickled_values, digests = {}, {}
+        for name, value in variables.items():
+            pickled_values[name] = pickle.dumps(value)
+            digests[name] = hashlib.sha256(pickled_values[name]).hexdigest()
+        unchanged_variables = self._get_unchanged_variables(
+            {name: digest for name, digest in digests.items() if self.sent_variables.get(name) == digest}
+        )
+        inline_variables, variable_files = {}, {}
+        for name, pickled_value in pickled_values.items():
+            if name in unchanged_variables:
+                del digests[name]
+                continue
+            payload = zlib.compress(pickled_value, 1)
+            if len(payload) <= self.MAX_INLINE_VARIABLE_SIZE:
+                inline_variables[name] = base64.b64encode(payload).decode()
+            else:
+                variable_files[name] = f"/tmp/smolagents_variable_{digests[name]}.pkl.zlib"
+                self.upload_file(payload, variable_files[name])
+        if not digests:
             return
-        pickled_vars = base64.b64encode(pickle.dumps(variables)).decode()
         code = f"""
-import pickle, base64
-vars_dict = pickle.loads(base64.b64decode('{pickled_vars}'))
-locals().update(vars_dict)
+def _load_variables(inline_variables, variable_files, digests):
+    import base64, hashlib, os, pickle, zlib
+
+    variables = {{name: pickle.loads(zlib.decompress(base64.b64decode(payload))) for name, payload in inline_variables.items()}}
+    for name, path in variable_files.items():
+        with open(path, "rb") as f:
+            variables[name] = pickle.loads(zlib.decompress(f.read()))
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    # Digests of the sent values, and of the values as pickled by the kernel to detect later changes
+    kernel_digests = globals().setdefault("_smolagents_digests", {{}})
+    for name, value in variables.items():
+        try:
+            kernel_digests[name] = (digests[name], hashlib.sha256(pickle.dumps(value)).hexdigest())
+        except Exception:
+            kernel_digests.pop(name, None)
+    return variables
+
+locals().update(_load_variables({inline_variables!r}, {variable_files!r}, {digests!r}))
+del _load_variables
 """
         self.run_code_raise_errors(code)
+        self.sent_variables.update(digests)
+
+    def _get_unchanged_variables(self, digests: dict[str, str]) -> set[str]:
+        """Return the names of the variables that the kernel loaded with these digests and still holds unchanged."""
+        if not digests:
+            return set()
+        code = f"""
+def _get_unchanged_variables(digests):
+    import hashlib, pickle
+
+    unchanged = []
+    for name, (digest, kernel_digest) in globals().get("_smolagents_digests", {{}}).items():
+        if digests.get(name) != digest or name not in globals():
+            continue
+        try:
+            if hashlib.sha256(pickle.dumps(globals()[name])).hexdigest() == kernel_digest:
+                unchanged.append(name)
+        except Exception:
+            pass
+    return unchanged
+
+print(__import__("json").dumps(_get_unchanged_variables({digests!r})))
+del _get_unchanged_variables
+"""
+        logs = self.run_code_raise_errors(code).logs.strip()
+        try:
+            return set(json.loads(logs.splitlines()[-1])) & digests.keys()
+        except (IndexError, TypeError, ValueError):
+            # Send all variables again if the kernel output cannot be read
+            return set()
+
+    def upload_file(self, data: bytes, path: str):
+        """
+        Write data to a file on the machine of the kernel.
+
+        By default, the data is sent as base64 chunks through code runs: executors with a file transfer API override
+        this to send raw bytes.
+        """
+        self.run_code_raise_errors(f"open({path!r}, 'wb').close()")
+        for start in range(0, len(data), self.UPLOAD_CHUNK_SIZE):
+            chunk = base64.b64encode(data[start : start + self.UPLOAD_CHUNK_SIZE]).decode()
+            self.run_code_raise_errors(
+                f"import base64\nwith open({path!r}, 'ab') as f:\n    f.write(base64.b64decode('{chunk}'))"
+            )
 
     def __call__(self, code_action: str) -> CodeOutput:
         """Run the code and determine if it is the final answer."""
@@ -110,6 +208,14 @@ locals().update(vars_dict)
             self.logger.log(code_output.logs)
         return additional_imports
 
+    def reset(self):
+        """Reset the kernel state: remove the variables, functions, tools and imports defined by previous code.
+
+        Installed packages are kept.
+        """
+        self.run_code_raise_errors("%reset -f")
+        self.sent_variables = {}
+
     def _patch_final_answer_with_exception(self, final_answer_tool: FinalAnswerTool):
         """Patch the FinalAnswerTool to raise an exception.
 
@@ -238,6 +344,9 @@ class E2BExecutor(RemotePythonExecutor):
         # If no main result found, return None
         return CodeOutput(output=None, logs=execution_logs, is_final_answer=False)
 
+    def upload_file(self, data: bytes, path: str):
+        self.sandbox.files.write(path, data)
+
     def cleanup(self):
         """Clean up the E2B sandbox and resources."""
         try:
@@ -466,6 +575,16 @@ class DockerExecutor(RemotePythonExecutor):
     def run_code_raise_errors(self, code: str) -> CodeOutput:
         return _websocket_run_code_raise_errors(code, self.ws, self.logger)
 
+    def upload_file(self, data: bytes, path: str):
+        archive = BytesIO()
+        with tarfile.open(fileobj=archive, mode="w") as tar:
+            file_info = tarfile.TarInfo(os.path.basename(path))
+            file_info.size = len(data)
+            file_info.mode = 0o644
+            tar.addfile(file_info, BytesIO(data))
+        if not self.container.put_archive(os.path.dirname(path), archive.getvalue()):
+            raise AgentError(f"Could not upload file {path} to container {self.container.short_id}", self.logger)
+
     def cleanup(self):
         """Clean up the Docker container and resources."""
         try:
@@ -585,6 +704,10 @@ class ModalExecutor(RemotePythonExecutor):
         with closing(create_connection(self.ws_url)) as ws:
             return _websocket_run_code_raise_errors(code, ws, self.logger)
 
+    def upload_file(self, data: bytes, path: str):
+        with self.sandbox.open(path, "wb") as f:
+            f.write(data)
+
     def cleanup(self):
         if hasattr(self, "sandbox"):
             self.sandbox.terminate()
@@ -919,3 +1042,198 @@ class WasmExecutor(RemotePythonExecutor):
           });
         });
         """)
+
+
+def _get_free_port() -> int:
+    with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ExecutorPool:
+    """
+    Pool of warmed remote executors, shared across agents.
+
+    Starting a remote executor takes seconds to minutes: a sandbox or a container has to be created, a kernel started
+    and packages installed. The pool keeps `size` warmed executors per configuration, i.e. per executor type,
+    additional imports and executor arguments. An agent created with the pool takes an executor out of it, and gives it
+    back on cleanup: its kernel state is then reset, and it is reused by the next agent. Executors taken out of the
+    pool are replaced by new ones, started in background threads.
+
+    Docker executors started by the pool are each bound to a free port, unless a `port` is given.
+
+    Args:
+        size (`int`, defaults to 1): Number of warmed executors kept per configuration.
+        logger (`AgentLogger`, *optional*): Logger of the executors while they are in the pool. Defaults to a logger
+            only showing errors.
+
+    Example:
+    ```py
+    pool = ExecutorPool(size=2)
+    pool.prestart("docker", ["numpy"], wait=True)
+    with CodeAgent(tools=[], model=model, executor_type="docker", executor_pool=pool) as agent:
+        agent.run("What is the 10th Fibonacci number?")
+    print(pool.get_stats())
+    ```
+    """
+
+    executor_types = {"e2b": E2BExecutor, "docker": DockerExecutor, "modal": ModalExecutor}
+
+    def __init__(self, size: int = 1, logger: AgentLogger | None = None):
+        self.size = size
+        self.logger = logger if logger is not None else AgentLogger(level=LogLevel.ERROR)
+        self.hits = 0
+        self.misses = 0
+        self.failed_warmups = 0
+        self.warmup_times: list[float] = []
+        self._configs: dict[tuple, dict[str, Any]] = {}
+        self._idle_executors: dict[tuple, list[RemotePythonExecutor]] = defaultdict(list)
+        self._pending: dict[tuple, int] = defaultdict(int)
+        self._acquired: dict[int, tuple] = {}
+        self._threads: list[threading.Thread] = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _get_config(self, executor_type: str, additional_imports: list[str], executor_kwargs: dict[str, Any]) -> tuple:
+        if executor_type not in self.executor_types:
+            raise ValueError(
+                f"Unsupported executor type for a pool: {executor_type}. Supported types are {list(self.executor_types)}."
+            )
+        config = (executor_type, tuple(additional_imports), json.dumps(executor_kwargs, sort_keys=True, default=repr))
+        with self._lock:
+            self._configs.setdefault(config, dict(executor_kwargs))
+        return config
+
+    def _start(self, config: tuple) -> RemotePythonExecutor:
+        executor_type, additional_imports, _ = config
+        executor_kwargs = self._configs[config]
+        if executor_type == "docker" and "port" not in executor_kwargs:
+            executor_kwargs = executor_kwargs | {"port": _get_free_port()}
+        start_time = time.perf_counter()
+        executor = self.executor_types[executor_type](list(additional_imports), self.logger, **executor_kwargs)
+        with self._lock:
+            self.warmup_times.append(time.perf_counter() - start_time)
+        return executor
+
+    def _warm(self, config: tuple):
+        try:
+            executor = self._start(config)
+        except Exception as e:
+            with self._lock:
+                self._pending[config] -= 1
+                self.failed_warmups += 1
+            self.logger.log_error(f"Could not warm up a {config[0]} executor: {e}")
+            return
+        with self._lock:
+            self._pending[config] -= 1
+            if not self._closed and len(self._idle_executors[config]) < self.size:
+                self._idle_executors[config].append(executor)
+                return
+        executor.cleanup()
+
+    def _refill(self, config: tuple):
+        """Start executors in background threads, until `size` of them are idle or warming up for this configuration."""
+        with self._lock:
+            if self._closed:
+                return
+            missing = self.size - len(self._idle_executors[config]) - self._pending[config]
+            self._pending[config] += max(missing, 0)
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for _ in range(missing):
+                thread = threading.Thread(target=self._warm, args=(config,), daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def prestart(self, executor_type: str, additional_imports: list[str], wait: bool = False, **executor_kwargs):
+        """Start executors of this configuration in the background, so that the next agents can start without waiting.
+
+        Args:
+            executor_type (`str`): Type of the executors: `"e2b"`, `"docker"` or `"modal"`.
+            additional_imports (`list[str]`): Additional imports to install in the executors.
+            wait (`bool`, defaults to False): Whether to wait for the executors to be started.
+            **executor_kwargs: Additional arguments to pass to initialize the executors.
+        """
+        self._refill(self._get_config(executor_type, additional_imports, executor_kwargs))
+        if wait:
+            self.wait()
+
+    def wait(self, timeout: float | None = None):
+        """Wait for the executors being started in the background."""
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(timeout)
+
+    def acquire(
+        self, executor_type: str, additional_imports: list[str], logger: AgentLogger, **executor_kwargs
+    ) -> RemotePythonExecutor:
+        """Take a warmed executor out of the pool, or start one if none is available.
+
+        Args:
+            executor_type (`str`): Type of the executor: `"e2b"`, `"docker"` or `"modal"`.
+            additional_imports (`list[str]`): Additional imports to install in the executor.
+            logger (`AgentLogger`): Logger of the executor until it is released.
+            **executor_kwargs: Additional arguments to pass to initialize the executor.
+        """
+        config = self._get_config(executor_type, additional_imports, executor_kwargs)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("This executor pool was shut down.")
+            executor = self._idle_executors[config].pop() if self._idle_executors[config] else None
+            if executor is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self._refill(config)
+        if executor is None:
+            executor = self._start(config)
+        executor.logger = logger
+        with self._lock:
+            self._acquired[id(executor)] = config
+        return executor
+
+    def release(self, executor: RemotePythonExecutor):
+        """Give an executor back to the pool, after resetting its kernel state."""
+        with self._lock:
+            config = self._acquired.pop(id(executor), None)
+        if config is None:
+            raise ValueError("This executor was not acquired from this pool.")
+        executor.logger = self.logger
+        try:
+            executor.reset()
+        except Exception as e:
+            self.logger.log_error(f"Could not reset the {config[0]} executor, discarding it: {e}")
+            executor.cleanup()
+            return
+        with self._lock:
+            if not self._closed and len(self._idle_executors[config]) < self.size:
+                self._idle_executors[config].append(executor)
+                return
+        executor.cleanup()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Return the pool metrics: hit rate of acquisitions, and warmup times of the executors, in seconds."""
+        with self._lock:
+            acquisitions = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / acquisitions if acquisitions else 0.0,
+                "warmups": len(self.warmup_times),
+                "failed_warmups": self.failed_warmups,
+                "mean_warmup_time": sum(self.warmup_times) / len(self.warmup_times) if self.warmup_times else 0.0,
+                "max_warmup_time": max(self.warmup_times, default=0.0),
+                "idle_executors": sum(len(executors) for executors in self._idle_executors.values()),
+            }
+
+    def shutdown(self):
+        """Clean up all idle executors. Executors still warming up are cleaned up once started."""
+        with self._lock:
+            self._closed = True
+            executors = [executor for executors in self._idle_executors.values() for executor in executors]
+            self._idle_executors.clear()
+        for executor in executors:
+            executor.cleanup()
+
+    def __len__(self):
+        return sum(len(executors) for executors in self._idle_executors.values())
@@ -284,7 +284,9 @@ class Tool(BaseTool):
             tool_doc += f"\n{returns_doc}"
 
         tool_doc = f'"""{tool_doc}\n"""'
-        return f"def {self.name}{tool_signature}:\n{textwrap.indent(tool_doc, '    ')}"
+        # Tools with a coroutine `forward` must be awaited, which executors in async mode support
+        prefix = "async def" if inspect.iscoroutinefunction(self.forward) else "def"
+        return f"{prefix} {self.name}{tool_signature}:\n{textwrap.indent(tool_doc, '    ')}"
 
     def to_tool_calling_prompt(self) -> str:
         return f"{self.name}: {self.description}\n    Takes inputs: {self.inputs}\n    Returns an output of type: {self.output_type}"
@@ -1352,6 +1354,12 @@ def get_tools_definition_code(tools: dict[str, Tool]) -> str:
 
         def forward(self, *args, **kwargs):
             pass # to be implemented in child class
+
+    def parallel_map(func, iterable, max_workers=8):
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(func, iterable))
     """
     )
     tool_definition_code += "\n\n".join(tool_codes)
@@ -23,8 +23,10 @@ import keyword
 import os
 import re
 import time
+from collections.abc import Iterator
 from functools import lru_cache
 from io import BytesIO
+from itertools import islice
 from pathlib import Path
 from textwrap import dedent
 from typing import TYPE_CHECKING, Any
@@ -248,6 +250,145 @@ def truncate_content(content: str, max_length: int = MAX_LENGTH_TRUNCATE_CONTENT
         )
 
 
+# Numpy arrays and pandas objects with more elements than this are rendered as a preview by `bounded_str`
+PREVIEW_MIN_SIZE = 1000
+PREVIEW_MAX_ROWS = 10
+PREVIEW_MAX_COLUMNS = 20
+
+
+def preview_array_like(value: Any) -> str | None:
+    """
+    Return a preview of a large numpy array or pandas object, with its shape and dtypes then its first and last items,
+    or None for other values.
+    """
+    value_type = type(value)
+    if value_type.__module__.split(".")[0] not in ("numpy", "pandas") or getattr(value, "size", 0) <= PREVIEW_MIN_SIZE:
+        return None
+    if value_type.__name__ == "ndarray":
+        import numpy as np
+
+        content = np.array2string(value, threshold=PREVIEW_MIN_SIZE, edgeitems=3)
+        return f"ndarray of shape {value.shape} and dtype {value.dtype}:\n{content}"
+    elif value_type.__name__ == "DataFrame":
+        dtypes = [f"{column}: {dtype}" for column, dtype in islice(value.dtypes.items(), PREVIEW_MAX_COLUMNS + 1)]
+        if len(dtypes) > PREVIEW_MAX_COLUMNS:
+            dtypes[-1] = "..."
+        content = value.to_string(
+            max_rows=PREVIEW_MAX_ROWS, max_cols=PREVIEW_MAX_COLUMNS, max_colwidth=50, show_dimensions=False
+        )
+        return f"DataFrame of shape {value.shape} with dtypes {', '.join(dtypes)}:\n{content}"
+    elif value_type.__name__ == "Series":
+        content = value.to_string(max_rows=PREVIEW_MAX_ROWS, dtype=False, name=False, length=False)
+        return f"Series {value.name!r} of length {len(value)} and dtype {value.dtype}:\n{content}"
+    return None
+
+
+RECURSIVE_REPRS = {list: "[...]", dict: "{...}", tuple: "(...)"}
+
+
+def iter_str_chunks(value: Any, max_length: int, reverse: bool, seen: set[int], top_level: bool) -> Iterator[str]:
+    """
+    Yield the chunks of `str(value)` at top level, or of `repr(value)` for container items, from its start, or from its
+    end if `reverse`. Long strings are cut to `max_length` characters, as only the start or end of them is needed.
+    """
+    value_type = type(value)
+    if value_type in (list, tuple, set, frozenset, dict):
+        if id(value) in seen:
+            yield RECURSIVE_REPRS[value_type]
+            return
+        seen.add(id(value))
+        try:
+            yield from iter_container_chunks(value, max_length, reverse, seen)
+        finally:
+            seen.discard(id(value))
+    elif isinstance(value, (str, bytes)) and len(value) > max_length:
+        cut = value[-max_length:] if reverse else value[:max_length]
+        if top_level and isinstance(value, str):
+            yield cut
+        else:
+            text = repr(cut)
+            # Drop the closing quote of the start, or the opening one of the end
+            yield text[text.index(text[-1]) + 1 :] if reverse else text[:-1]
+    else:
+        preview = preview_array_like(value)
+        if preview is not None:
+            yield preview
+        else:
+            yield str(value) if top_level else repr(value)
+
+
+def iter_container_chunks(
+    value: list | tuple | set | frozenset | dict, max_length: int, reverse: bool, seen: set[int]
+) -> Iterator[str]:
+    value_type = type(value)
+    if value_type in (set, frozenset) and not value:
+        yield f"{value_type.__name__}()"
+        return
+    opening, closing = {list: ("[", "]"), dict: ("{", "}"), set: ("{", "}"), frozenset: ("frozenset({", "})")}.get(
+        value_type, ("(", ",)" if len(value) == 1 else ")")
+    )
+    if value_type is dict:
+        items = ((key, value[key]) for key in (reversed(value) if reverse else value))
+    else:
+        items = reversed(list(value) if value_type in (set, frozenset) else value) if reverse else value
+    yield closing if reverse else opening
+    for index, item in enumerate(items):
+        if index:
+            yield ", "
+        if value_type is dict:
+            key, item = item
+            if not reverse:
+                yield from iter_str_chunks(key, max_length, reverse, seen, top_level=False)
+                yield ": "
+            yield from iter_str_chunks(item, max_length, reverse, seen, top_level=False)
+            if reverse:
+                yield ": "
+                yield from iter_str_chunks(key, max_length, reverse, seen, top_level=False)
+        else:
+            yield from iter_str_chunks(item, max_length, reverse, seen, top_level=False)
+    yield opening if reverse else closing
+
+
+def render_str_end(value: Any, max_length: int, reverse: bool = False) -> tuple[str, bool]:
+    """
+    Render the start of `str(value)`, or its end if `reverse`, stopping once more than `max_length` characters are
+    rendered. Return the rendered text and whether it is complete.
+    """
+    chunks, length = [], 0
+    for chunk in iter_str_chunks(value, max_length, reverse, set(), top_level=True):
+        chunks.append(chunk)
+        length += len(chunk)
+        if length > max_length:
+            return "".join(reversed(chunks) if reverse else chunks), False
+    return "".join(reversed(chunks) if reverse else chunks), True
+
+
+def bounded_str(value: Any, max_length: int = MAX_LENGTH_TRUNCATE_CONTENT) -> str:
+    """
+    Return `truncate_content(str(value), max_length)`, without building the full string of large values.
+
+    Builtin containers are rendered item by item, from their start for the head of the content and from their end for
+    its tail, and rendering stops once `max_length` characters are reached: rendering a dict of 10 million items then
+    costs as much as rendering a small one. Large numpy arrays and pandas objects are rendered with
+    `preview_array_like`.
+
+    Args:
+        value (`Any`): Value to render.
+        max_length (`int`, defaults to `MAX_LENGTH_TRUNCATE_CONTENT`): Maximum number of characters of the content.
+    """
+    if isinstance(value, str):
+        return truncate_content(value, max_length)
+    head, complete = render_str_end(value, max_length)
+    if complete:
+        return truncate_content(head, max_length)
+    tail, _ = render_str_end(value, max_length // 2, reverse=True)
+    return (
+        head[: max_length // 2]
+        + f"\n..._This content has been truncated to stay below {max_length} characters_...\n"
+        + tail[-max_length // 2 :]
+    )
+
+
 class ImportFinder(ast.NodeVisitor):
     def __init__(self):
         self.packages = set()
@@ -41,6 +41,7 @@ from smolagents.agents import (
     AgentMaxStepsError,
     AgentToolCallError,
     CodeAgent,
+    ExecutionLogsDelta,
     MultiStepAgent,
     RunResult,
     ToolCall,
@@ -60,6 +61,7 @@ from smolagents.memory import (
 )
 from smolagents.models import (
     ChatMessage,
+    ChatMessageStreamDelta,
     ChatMessageToolCall,
     ChatMessageToolCallFunction,
     InferenceClientModel,
@@ -68,6 +70,7 @@ from smolagents.models import (
     TransformersModel,
 )
 from smolagents.monitoring import AgentLogger, LogLevel, Timing, TokenUsage
+from smolagents.remote_executors import ExecutorPool
 from smolagents.tools import Tool, tool
 from smolagents.utils import (
     BASE_BUILTIN_MODULES,
@@ -2135,6 +2138,147 @@ print("Ok, calculation done!")""")
         agent.run("Test run")
         assert "open" in agent.python_executor.static_tools
 
+    def test_local_python_executor_with_compiled_engine(self):
+        class FakeCodeModel(Model):
+            def generate(self, messages, stop_sequences=None):
+                return ChatMessage(
+                    role=MessageRole.ASSISTANT,
+                    content="<code>\ntotal = 0\nfor i in range(5):\n    total += i\nfinal_answer(total)\n</code>",
+                )
+
+        agent = CodeAgent(tools=[], model=FakeCodeModel(), executor_kwargs={"engine": "compiled"})
+        assert agent.python_executor.engine == "compiled"
+        assert agent.run("Fake task.") == 10
+
+    def test_local_process_executor(self):
+        class FakeCodeModel(Model):
+            def generate(self, messages, stop_sequences=None):
+                return ChatMessage(
+                    role=MessageRole.ASSISTANT,
+                    content="<code>\nprint(fake_tool())\nfinal_answer(fake_tool())\n</code>",
+                )
+
+        @tool
+        def fake_tool() -> str:
+            """Fake tool"""
+            return "fake"
+
+        agent = CodeAgent(tools=[fake_tool], model=FakeCodeModel(), executor_type="local-process")
+        try:
+            assert agent.run("Fake task.") == "fake"
+            assert agent.memory.steps[1].observations.startswith("Execution logs:\nfake\n")
+        finally:
+            agent.cleanup()
+
+    def test_interrupt_cancels_running_code(self):
+        class FakeCodeModel(Model):
+            def generate(self, messages, stop_sequences=None):
+                return ChatMessage(
+                    role=MessageRole.ASSISTANT, content="<code>\nstop()\nwhile True:\n    pass\n</code>"
+                )
+
+        agent = CodeAgent(tools=[], model=FakeCodeModel())
+        agent.python_executor.additional_functions["stop"] = agent.interrupt
+        with pytest.raises(AgentError, match="Agent interrupted"):
+            agent.run("Fake task.")
+        assert "Execution was cancelled" in str(agent.memory.steps[1].error)
+        assert agent.python_executor.cancellation_token.cancelled
+
+    def test_stream_outputs_yields_execution_logs(self):
+        class FakeStreamCodeModel(Model):
+            def generate_stream(self, messages, stop_sequences=None):
+                yield ChatMessageStreamDelta(
+                    content="<code>\nfor i in range(3):\n    print(i)\nfinal_answer(i)\n</code>",
+                    token_usage=TokenUsage(input_tokens=10, output_tokens=10),
+                )
+
+        agent = CodeAgent(tools=[], model=FakeStreamCodeModel(), stream_outputs=True)
+        events = list(agent.run("Fake task.", stream=True))
+        logs_deltas = [event.content for event in events if isinstance(event, ExecutionLogsDelta)]
+        assert logs_deltas == ["0\n", "1\n", "2\n"]
+        assert agent.memory.steps[-1].observations == "Execution logs:\n0\n1\n2\nLast output from code snippet:\n2"
+        assert events[-1].output == 2
+
+    def test_profile_is_stored_in_memory_and_replayed(self, agent_logger):
+        class FakeCodeModel(Model):
+            def generate(self, messages, stop_sequences=None):
+                return ChatMessage(
+                    role=MessageRole.ASSISTANT,
+                    content="<code>\ntotal = 0\nfor i in range(5):\n    total += i\nfinal_answer(total)\n</code>",
+                )
+
+        agent = CodeAgent(tools=[], model=FakeCodeModel(), executor_kwargs={"profile": True}, logger=agent_logger)
+        agent.run("Fake task.")
+        profile = agent.memory.steps[1].profile
+        assert [line.hits for line in profile.lines] == [1, 1, 5, 1]
+        assert agent.memory.steps[1].dict()["profile"]["lines"][2]["source"] == "total += i"
+        agent.replay(detailed=True)
+        str_output = agent_logger.console.export_text()
+        assert "Code profile" in str_output
+        assert "Source" in str_output
+
+    def test_tool_calls_from_code_are_recorded(self):
+        @tool
+        def lookup(query: str, limit: int = 3) -> str:
+            """
+            Looks up a query.
+
+            Args:
+                query: The query.
+                limit: Maximum number of results.
+            """
+            if query == "fail":
+                raise ValueError("lookup failed")
+            return query * limit
+
+        class FakeCodeModel(Model):
+            def generate(self, messages, stop_sequences=None):
+                if "lookup failed" not in str(messages):
+                    code = "a = lookup('x', 2)\nb = lookup(query='y')\nlookup('fail')"
+                else:
+                    code = "final_answer(len(a + b))"
+                return ChatMessage(role=MessageRole.ASSISTANT, content=f"<code>\n{code}\n</code>")
+
+        agent = CodeAgent(
+            tools=[lookup],
+            model=FakeCodeModel(),
+            executor_kwargs={"record_tool_calls": True},
+            verbosity_level=LogLevel.OFF,
+        )
+        result = agent.run("Fake task.", return_full_result=True)
+        assert result.output == 5
+        tool_calls = agent.memory.steps[1].code_tool_calls
+        assert [(call.name, call.arguments, call.error) for call in tool_calls] == [
+            ("lookup", {"query": "x", "limit": 2}, None),
+            ("lookup", {"query": "y"}, None),
+            ("lookup", {"query": "fail"}, "ValueError: lookup failed"),
+        ]
+        assert [call.id for call in tool_calls] == ["call_1_0", "call_1_1", "call_1_2"]
+        assert tool_calls[0].timing.duration >= 0 and tool_calls[0].output_size > 0
+        assert tool_calls[2].output_size is None
+        assert agent.memory.steps[1].tool_calls[0].name == "python_interpreter"
+        assert [call["function"]["name"] for call in result.tool_calls] == ["lookup"] * 3 + ["final_answer"]
+        assert result.tool_calls[0]["timing"]["duration"] >= 0
+        stats = agent.monitor.get_tool_call_stats()
+        assert stats["lookup"]["calls"] == 3 and stats["lookup"]["errors"] == 1
+        assert stats["final_answer"]["calls"] == 1
+
+    def test_executor_pool(self):
+        pool = MagicMock(spec=ExecutorPool)
+        agent = CodeAgent(
+            tools=[], model=MagicMock(), executor_type="e2b", executor_kwargs={"timeout": 60}, executor_pool=pool
+        )
+        pool.acquire.assert_called_once_with("e2b", [], agent.logger, timeout=60)
+        executor = agent.python_executor
+        assert executor is pool.acquire.return_value
+        agent.cleanup()
+        pool.release.assert_called_once_with(executor)
+        assert agent.python_executor is None
+        agent.cleanup()
+        assert pool.release.call_count == 1
+        with pytest.raises(ValueError, match="cannot be used with the 'local' executor type"):
+            CodeAgent(tools=[], model=MagicMock(), executor_pool=pool)
+
     @pytest.mark.parametrize("agent_dict_version", ["v1.9", "v1.10", "v1.20"])
     def test_from_folder(self, agent_dict_version, get_agent_dict):
         agent_dict = get_agent_dict(agent_dict_version)
@@ -14,6 +14,15 @@
 # limitations under the License.
 
 import ast
+import asyncio
+import gc
+import itertools
+import multiprocessing
+import re
+import sys
+import threading
+import time
+import tracemalloc
 import types
 from contextlib import nullcontext as does_not_raise
 from textwrap import dedent
@@ -27,10 +36,23 @@ from smolagents.default_tools import BASE_PYTHON_TOOLS, FinalAnswerTool
 from smolagents.local_python_executor import (
     DANGEROUS_FUNCTIONS,
     DANGEROUS_MODULES,
+    AuthorizedImports,
+    CodeCache,
+    CodeOutput,
+    CodeValidation,
     InterpreterError,
+    LocalProcessPool,
+    LocalProcessPythonExecutor,
     LocalPythonExecutor,
     PrintContainer,
+    SafeModuleCache,
+    Scope,
+    StateMemoryManager,
+    StaticTools,
+    VariableStats,
+    build_import_tree,
     check_import_authorized,
+    estimate_size,
     evaluate_boolop,
     evaluate_condition,
     evaluate_delete,
@@ -38,7 +60,13 @@ from smolagents.local_python_executor import (
     evaluate_subscript,
     fix_final_answer_code,
     get_safe_module,
+    optimize_module,
+    receive_message,
+    run_process_worker,
+    send_message,
 )
+from smolagents.tools import Tool, tool
+from smolagents.utils import truncate_content
 
 
 # Fake function we will use as tool
@@ -282,7 +310,7 @@ test_func(**None)
         result, _ = evaluate_python_code(code, {}, state=state)
         assert result == "This is x: 3.34."
         self.assertDictEqualNoPrint(
-            state, {"x": 3.336, "text": "This is x: 3.34.", "_operations_count": {"counter": 8}}
+            state, {"x": 3.336, "text": "This is x: 3.34.", "_operations_count": {"counter": 7}}
         )
 
     def test_evaluate_f_string_with_complex_format(self):
@@ -1854,6 +1882,122 @@ def test_get_safe_module_handle_lazy_imports():
     assert getattr(safe_module, "non_lazy_attribute") == "ok"
 
 
+class TestSafeModuleCache:
+    def test_wrappers_are_built_once(self):
+        cache = SafeModuleCache()
+        with patch("smolagents.local_python_executor.get_safe_module", wraps=get_safe_module) as mock_get_safe_module:
+            first, second = cache.get(pd, ["pandas"]), cache.get(pd, ["pandas"])
+        assert len([call for call in mock_get_safe_module.call_args_list if "visited" not in call.kwargs]) == 1
+        assert first.DataFrame is pd.DataFrame and second.DataFrame is pd.DataFrame
+        assert isinstance(second.api, types.ModuleType) and second.api is not pd.api
+
+    def test_wrappers_are_keyed_by_authorized_imports(self):
+        cache = SafeModuleCache()
+        with patch("smolagents.local_python_executor.get_safe_module", wraps=get_safe_module) as mock_get_safe_module:
+            cache.get(pd, ["pandas"])
+            cache.get(pd, ["pandas", "numpy"])
+        assert len([call for call in mock_get_safe_module.call_args_list if "visited" not in call.kwargs]) == 2
+
+    def test_copies_are_isolated(self):
+        cache = SafeModuleCache()
+        first = cache.get(pd, ["pandas"])
+        first.DataFrame = None
+        first.api.types = None
+        second = cache.get(pd, ["pandas"])
+        assert second.DataFrame is pd.DataFrame
+        assert second.api.types is not None
+
+    def test_wrappers_are_rebuilt_when_module_changes(self):
+        cache = SafeModuleCache()
+        fake_module = types.ModuleType("fake_module")
+        assert not hasattr(cache.get(fake_module, []), "submodule")
+        fake_module.submodule = types.ModuleType("fake_module.submodule")
+        assert isinstance(cache.get(fake_module, []).submodule, types.ModuleType)
+
+    def test_wrappers_are_rebuilt_when_attribute_is_reassigned(self):
+        cache = SafeModuleCache()
+        fake_module = types.ModuleType("fake_module")
+        fake_module.submodule = types.ModuleType("fake_module.submodule")
+        fake_module.value = fake_module.submodule.value = 1
+        assert cache.get(fake_module, []).value == 1
+        fake_module.value = 2
+        assert cache.get(fake_module, []).value == 2
+        fake_module.submodule.value = 3
+        assert cache.get(fake_module, []).submodule.value == 3
+
+    def test_submodules_are_copied_lazily(self):
+        cache = SafeModuleCache()
+        module = cache.get(pd, ["pandas"])
+        assert "api" not in vars(module)
+        assert "api" in dir(module)
+        assert module.api is module.api
+        assert "api" in vars(module)
+        with pytest.raises(AttributeError):
+            module.i_do_not_exist
+
+    def test_non_modules_are_returned_as_is(self):
+        assert SafeModuleCache().get(len, []) is len
+
+    def test_executor_prewarms_authorized_imports(self):
+        with patch("smolagents.local_python_executor.SAFE_MODULE_CACHE") as mock_cache:
+            LocalPythonExecutor(["numpy", "pandas.*"], prewarm_imports=True)
+        mock_cache.prewarm.assert_called_once()
+        assert mock_cache.prewarm.call_args.args[0] == ["numpy", "pandas.*"]
+
+    def test_prewarm_skips_wildcards_and_missing_modules(self):
+        cache = SafeModuleCache()
+        cache.prewarm(["*", "numpy.*", "numpy.i_do_not_exist"], ["numpy.*"])
+        with patch("smolagents.local_python_executor.get_safe_module") as mock_get_safe_module:
+            cache.get(np, ["numpy.*"])
+        mock_get_safe_module.assert_not_called()
+
+
+def test_estimate_size():
+    assert estimate_size(np.zeros(1000)) == 8000
+    assert estimate_size(pd.DataFrame({"a": np.zeros(1000)})) >= 8000
+    nested = [[0] * 100 for _ in range(10)]
+    assert estimate_size(nested) > 10 * sys.getsizeof([0] * 100)
+    assert estimate_size(list(range(10_000)), max_items=10) == pytest.approx(
+        estimate_size(list(range(10_000))), rel=0.1
+    )
+
+
+class TestScope:
+    def test_lookups_fall_back_to_parent(self):
+        parent = {"x": 1, "y": 2}
+        scope = Scope(parent)
+        scope["y"] = 3
+        assert (scope["x"], scope["y"], parent["y"]) == (1, 3, 2)
+        assert "x" in scope and "z" not in scope
+        assert scope.get("x") == 1 and scope.get("z", 0) == 0
+        assert scope.setdefault("x", 5) == 1 and "x" not in dict(scope)
+        assert scope.keys() == {"x", "y"}
+        with pytest.raises(KeyError):
+            scope["z"]
+
+    @pytest.mark.parametrize("engine", ["ast", "compiled"])
+    def test_function_scopes(self, engine):
+        code = dedent(
+            """
+            x = 1
+            def f(a):
+                y = a + x
+                x_plus = [x + i for i in range(2)]
+                return y, x_plus
+            def g():
+                x = 10
+                return f(0)
+            result = (f(1), g())
+            """
+        )
+        state = {}
+        evaluate_python_code(code, {"range": range}, state=state, engine=engine)
+        assert state["result"] == ((2, [1, 2]), (1, [1, 2]))
+        assert "y" not in state and state["x"] == 1
+        with pytest.raises(InterpreterError, match="Cannot delete name 'x'"):
+            evaluate_python_code("def h():\n    del x\nh()", {}, state=state, engine=engine)
+
+
 class TestPrintContainer:
     def test_initial_value(self):
         pc = PrintContainer()
@@ -1884,6 +2028,30 @@ class TestPrintContainer:
         pc.append("Hello")
         assert len(pc) == 5
 
+    @pytest.mark.parametrize("chunk_size", [1, 7, 100])
+    def test_max_length(self, chunk_size):
+        text = "".join(f"line {i}\n" for i in range(200))
+        pc = PrintContainer(max_length=50)
+        for i in range(0, len(text), chunk_size):
+            pc.append(text[i : i + chunk_size])
+            assert pc._length <= 2 * 50 + chunk_size
+        assert pc.value == truncate_content(text, max_length=50)
+
+    def test_max_length_not_reached(self):
+        pc = PrintContainer(max_length=50)
+        pc.append("Hello")
+        assert pc.value == "Hello"
+
+    def test_callback(self):
+        printed = []
+        pc = PrintContainer(max_length=10, callback=printed.append)
+        pc.append("Hello")
+        pc += 123
+        pc.append("Too long")
+        pc.append("Not streamed")
+        assert printed[:2] == ["Hello", "123"]
+        assert len(printed) == 3 and "truncating" in printed[2]
+
 
 def test_fix_final_answer_code():
     test_cases = [
@@ -1938,6 +2106,40 @@ Got:      {result}
 )
 def test_check_import_authorized(module: str, authorized_imports: list[str], expected: bool):
     assert check_import_authorized(module, authorized_imports) == expected
+    assert check_import_authorized(module, AuthorizedImports(authorized_imports)) == expected
+
+
+class TestAuthorizedImports:
+    def test_verdicts_are_memoized(self):
+        index = AuthorizedImports(["numpy.*", "math"])
+        with patch.object(index, "_check", wraps=index._check) as mock_check:
+            assert index.is_authorized("numpy.linalg") is True
+            assert index.is_authorized("numpy.linalg") is True
+            assert index.is_authorized("os") is False
+            assert index.is_authorized("os") is False
+        assert mock_check.call_count == 2
+
+    def test_index_is_built_once_per_configuration(self):
+        with patch("smolagents.local_python_executor.build_import_tree", wraps=build_import_tree) as mock_build:
+            for _ in range(3):
+                check_import_authorized("itertools", ["itertools", "a_configuration_never_used_elsewhere"])
+        assert mock_build.call_count == 1
+
+    def test_error_messages_list_authorized_imports(self):
+        authorized_imports = ["math", "numpy"]
+        assert str(AuthorizedImports(authorized_imports)) == str(authorized_imports)
+        executor = LocalPythonExecutor(["numpy"])
+        with pytest.raises(
+            InterpreterError, match=re.escape(f"Authorized imports are: {executor.authorized_imports}")
+        ):
+            executor("import os")
+
+    def test_executor_does_not_rebuild_import_tree(self):
+        executor = LocalPythonExecutor(["numpy.*"])
+        executor.send_tools({})
+        with patch("smolagents.local_python_executor.build_import_tree") as mock_build:
+            executor("import numpy as np\nx = np.linalg\nm = [np for _ in range(10)]")
+        mock_build.assert_not_called()
 
 
 class TestLocalPythonExecutor:
@@ -1969,6 +2171,115 @@ class TestLocalPythonExecutor:
         executor = LocalPythonExecutor(additional_authorized_imports=[])
         assert executor.state.get("__name__") == "__main__"
 
+    @pytest.mark.parametrize("engine", ["ast", "compiled"])
+    def test_timeout(self, engine):
+        executor = LocalPythonExecutor(additional_authorized_imports=[], engine=engine, timeout=0.2)
+        executor.send_tools({})
+        code = "x = 0\ntry:\n    while True:\n        x += 1\nexcept Exception:\n    pass"
+        with pytest.raises(
+            InterpreterError, match="wall-clock time budget of 0.2 seconds after 0.2.* while running line"
+        ):
+            executor(code)
+        assert executor("x").output > 0
+        assert executor("1 + 1").output == 2
+
+    def test_cpu_timeout(self):
+        executor = LocalPythonExecutor(additional_authorized_imports=[], cpu_timeout=0.2)
+        executor.send_tools({})
+        with pytest.raises(InterpreterError, match="CPU time budget of 0.2 seconds"):
+            executor("while True:\n    pass")
+
+    def test_timeout_after_slow_call(self):
+        executor = LocalPythonExecutor(
+            additional_authorized_imports=[], additional_functions={"sleep": lambda: time.sleep(0.2)}, timeout=0.1
+        )
+        executor.send_tools({})
+        with pytest.raises(InterpreterError, match="while running line 2: 'sleep\\(\\)'"):
+            executor("for _ in range(10):\n    sleep()")
+
+    def test_cancellation_token(self):
+        executor = LocalPythonExecutor(additional_authorized_imports=[])
+        executor.send_tools({})
+        timer = threading.Timer(0.1, executor.cancellation_token.cancel)
+        timer.start()
+        with pytest.raises(InterpreterError, match="Execution was cancelled"):
+            executor("while True:\n    pass")
+        timer.join()
+        executor.cancellation_token.reset()
+        assert executor("1 + 1").output == 2
+
+    def test_max_memory(self):
+        executor = LocalPythonExecutor(additional_authorized_imports=[], max_memory=2**20)
+        executor.send_tools({})
+        code = "small = [0]\nlarge = []\nfor i in range(10**6):\n    large.append([i])"
+        with pytest.raises(
+            InterpreterError, match=r"memory budget of 1.0 MB .* Largest variables: large \(.* MB\), small"
+        ):
+            executor(code)
+        assert not tracemalloc.is_tracing()
+
+    def test_peak_memory(self):
+        executor = LocalPythonExecutor(additional_authorized_imports=[])
+        executor.send_tools({})
+        assert executor("x = 1").peak_memory is None
+        executor = LocalPythonExecutor(additional_authorized_imports=[], max_memory=2**30)
+        executor.send_tools({})
+        assert executor("x = list(range(10**5))\ndel x").peak_memory > 10**5 * 8
+        assert executor("y = 1").peak_memory < 10**5 * 8
+
+    def test_print_callback(self):
+        printed = []
+        executor = LocalPythonExecutor(additional_authorized_imports=[], print_callback=printed.append)
+        executor.send_tools({})
+        code_output = executor("print('a')\nprint('b', 1)")
+        assert printed == ["a\n", "b 1\n"]
+        assert code_output.logs == "a\nb 1\n"
+
+    def test_stream(self):
+        executor = LocalPythonExecutor(additional_authorized_imports=[])
+        executor.send_tools({})
+        outputs = list(executor.stream("for i in range(3):\n    print(i)\ni * 2"))
+        assert outputs[:-1] == ["0\n", "1\n", "2\n"]
+        assert outputs[-1] == CodeOutput(output=4, logs="0\n1\n2\n", is_final_answer=False)
+
+    def test_stream_error(self):
+        executor = LocalPythonExecutor(additional_authorized_imports=[])
+        executor.send_tools({})
+        outputs = []
+        with pytest.raises(InterpreterError, match="division by zero"):
+            for output in executor.stream("print('before')\n1 / 0"):
+                outputs.append(output)
+        assert outputs == ["before\n"]
+        assert executor.print_callback is None
+
+    @pytest.mark.parametrize("engine", ["ast", "compiled"])
+    def test_profile(self, engine):
+        def slow_tool(x):
+            time.sleep(0.01)
+            return x
+
+        executor = LocalPythonExecutor(additional_authorized_imports=[], engine=engine, profile=True)
+        executor.send_tools({"slow_tool": slow_tool})
+        profile = executor("total = 0\nfor i in range(3):\n    total += slow_tool(i)\ntotal").profile
+        assert [(line.lineno, line.source, line.hits) for line in profile.lines] == [
+            (1, "total = 0", 1),
+            (2, "for i in range(3):", 1),
+            (3, "total += slow_tool(i)", 3),
+            (4, "total", 1),
+        ]
+        assert sum(line.operations for line in profile.lines) == executor.state["_operations_count"]["counter"]
+        assert profile.lines[2].tool_duration >= 0.03
+        assert profile.lines[2].duration >= profile.lines[2].tool_duration
+        assert profile.lines[1].tool_duration == 0
+        assert "total += slow_tool(i)" in profile.render()
+        assert executor("x = 1").profile.lines[0].source == "x = 1"
+
+    def test_profile_disabled(self):
+        executor = LocalPythonExecutor(additional_authorized_imports=[])
+        executor.send_tools({})
+        assert executor("x = 1").profile is None
+        assert "_profiler" not in executor.state
+
     @pytest.mark.parametrize(
         "code",
         [
@@ -2046,6 +2357,974 @@ class TestLocalPythonExecutor:
         assert result is expected_result
 
 
+class TestCompiledEngine:
+    @pytest.mark.parametrize(
+        "code",
+        [
+            "x = 3\ny = x * 2 + 1\ny",
+            "total = 0\nfor i in range(10):\n    if i % 2:\n        continue\n    total += i\ntotal",
+            "i = 0\nwhile True:\n    i += 1\n    if i > 4:\n        break\ni",
+            "[x * y for x in range(3) for y in range(3) if x != y]",
+            "{k: v for k, v in zip('abc', range(3))}",
+            "sum(x**2 for x in range(5))",
+            "f'{3.14159:.2f} and {\"a\"}'",
+            "def f(a, b=2, *args, **kwargs):\n    return a + b + sum(args) + len(kwargs)\nf(1, 2, 3, c=4)",
+            "class A:\n    x: int = 1\n    def __init__(self, y):\n        self.y = y\n    def get(self):\n        return self.x + self.y\nA(2).get()",
+            "try:\n    1 / 0\nexcept ZeroDivisionError as e:\n    r = str(e)\nfinally:\n    r += '!'\nr",
+            "d = {'a': [1, 2]}\nd['a'][0] += 5\ndel d['a'][1]\nd",
+            "a, (b, c) = 1, (2, 3)\na < b < c",
+            "import math\nmath.floor(2.5) if not False else None",
+        ],
+    )
+    def test_compiled_engine_matches_ast_engine(self, code):
+        results = {}
+        for engine in ["ast", "compiled"]:
+            state = {}
+            result, _ = evaluate_python_code(code, BASE_PYTHON_TOOLS.copy(), state=state, engine=engine)
+            results[engine] = (repr(result), state["_operations_count"], str(state["_print_outputs"]), sorted(state))
+        assert results["compiled"] == results["ast"]
+
+    @pytest.mark.parametrize(
+        "code",
+        [
+            "a = 1\nb = undefined_name",
+            "import os",
+            "x = {}\nx.__class__",
+            "len([1, 2], 3)",
+            "x = [1, 2, 3]\nx[5]",
+            "x = []\nx += 1",
+        ],
+    )
+    def test_compiled_engine_raises_same_errors(self, code):
+        errors = {}
+        for engine in ["ast", "compiled"]:
+            with pytest.raises(InterpreterError) as exception_info:
+                evaluate_python_code(code, BASE_PYTHON_TOOLS.copy(), state={}, engine=engine)
+            errors[engine] = str(exception_info.value)
+        assert errors["compiled"] == errors["ast"]
+
+    def test_compiled_engine_max_operations(self):
+        code = "for i in range(1000):\n    i"
+        with patch("smolagents.local_python_executor.MAX_OPERATIONS", 100):
+            with pytest.raises(InterpreterError, match="Reached the max number of operations"):
+                evaluate_python_code(code, {"range": range}, state={}, engine="compiled")
+
+    def test_local_python_executor_engine(self):
+        executor = LocalPythonExecutor([], engine="compiled")
+        executor.send_tools({"final_answer": FinalAnswerTool()})
+        code_output = executor("def double(x):\n    return 2 * x\nprint(double(2))\nfinal_answer(double(21))")
+        assert code_output.output == 42
+        assert code_output.is_final_answer is True
+        assert code_output.logs == "4\n"
+
+    def test_unsupported_engine_raises(self):
+        with pytest.raises(ValueError, match="Unsupported engine"):
+            LocalPythonExecutor([], engine="jit")
+
+
+class TestCodeCache:
+    def test_repeated_code_is_parsed_once(self):
+        cache = CodeCache()
+        first, second = cache.get("x = 1"), cache.get("x = 1")
+        assert first is second
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert first.compiled is second.compiled
+
+    def test_least_recently_used_code_is_evicted(self):
+        cache = CodeCache(maxsize=2)
+        cache.get("a = 1")
+        cache.get("b = 2")
+        cache.get("a = 1")
+        cache.get("c = 3")
+        assert len(cache) == 2
+        cache.get("a = 1")
+        cache.get("b = 2")
+        assert (cache.hits, cache.misses) == (2, 4)
+
+    def test_syntax_errors_are_not_cached(self):
+        cache = CodeCache()
+        for _ in range(2):
+            with pytest.raises(InterpreterError, match="Code parsing failed on line 1"):
+                cache.get("x = (")
+        assert len(cache) == 0
+        assert cache.misses == 2
+
+    @pytest.mark.parametrize("engine", ["ast", "compiled"])
+    def test_executor_counts_cache_hits(self, engine):
+        executor = LocalPythonExecutor([], engine=engine)
+        executor.send_tools({})
+        executor.send_variables({"counter": 0})
+        outputs = [executor("counter += 1\ncounter").output for _ in range(3)]
+        assert outputs == [1, 2, 3]
+        assert executor.code_cache.hits == 2
+        assert executor.code_cache.misses == 1
+        assert executor("x = [i for i in range(3)]\nx").output == [0, 1, 2]
+        assert executor.code_cache.misses == 2
+
+    def test_executors_can_share_a_cache(self):
+        cache = CodeCache()
+        for _ in range(3):
+            executor = LocalPythonExecutor([], engine="compiled", code_cache=cache)
+            executor.send_tools({})
+            assert executor("sum([1, 2, 3])").output == 6
+        assert (cache.hits, cache.misses) == (2, 1)
+
+
+@pytest.mark.parametrize("engine", ["ast", "compiled"])
+class TestLazyIteration:
+    def test_loops_and_comprehensions_iterate_lazily(self, engine):
+        code = dedent(
+            """
+            for i in naturals():
+                if i == 3:
+                    break
+            first_even_square = next(x * x for x in naturals() if x > 0 and x % 2 == 0)
+            pair = next((x, y) for x in naturals() for y in naturals() if y > x)
+            """
+        )
+        state = {}
+        static_tools = {"naturals": itertools.count, "range": range, "next": next}
+        evaluate_python_code(code, static_tools, state=state, engine=engine)
+        assert (state["i"], state["first_even_square"], state["pair"]) == (3, 4, (0, 1))
+        assert state["_operations_count"]["counter"] < 1000
+
+    def test_unpacking_too_many_values_stops_early(self, engine):
+        with pytest.raises(InterpreterError, match="Cannot unpack tuple of wrong size"):
+            evaluate_python_code("a, b = range(10**12)", {"range": range}, state={}, engine=engine)
+
+    def test_operations_are_counted_per_iteration(self, engine):
+        with patch("smolagents.local_python_executor.MAX_OPERATIONS", 100):
+            with pytest.raises(InterpreterError, match="Reached the max number of operations"):
+                evaluate_python_code(
+                    "sum(x for x in range(10**12))", {"range": range, "sum": sum}, state={}, engine=engine
+                )
+
+    @pytest.mark.parametrize(
+        "code, expected",
+        [
+            ("[(x, y) for x in [1, 2] for y in [x, 3]]", [(1, 1), (1, 3), (2, 2), (2, 3)]),
+            ("{(x, y) for x in [1, 2] for y in [x, 3]}", {(1, 1), (1, 3), (2, 2), (2, 3)}),
+            ("{(x, y): x for x in [1, 2] for y in [x, 3] if y != 3}", {(1, 1): 1, (2, 2): 2}),
+            ("list((x, y) for x in [1, 2] if x > 1 for y in [x, 3])", [(2, 2), (2, 3)]),
+            ("[a + c for a, (b, c) in [(1, (2, 3))]]", [4]),
+        ],
+    )
+    def test_nested_comprehension_clauses(self, engine, code, expected):
+        result, _ = evaluate_python_code(code, {"list": list}, state={}, engine=engine)
+        assert result == expected
+
+
+class TestStaticTools:
+    def test_wrappers_are_built_once_per_send_tools(self):
+        executor = LocalPythonExecutor([])
+        executor.send_tools({})
+        first = executor("abs").output
+        assert executor("f = abs\nf").output is first
+        assert first(-1) == 1
+        assert executor("len").output is len
+        executor.send_tools({})
+        assert executor("abs").output is not first
+
+    def test_wrappers_are_keyed_by_authorized_imports(self):
+        tools = StaticTools({"abs": abs})
+        no_imports, os_imports = AuthorizedImports([]), AuthorizedImports(["os"])
+        wrapper = tools.get_safe("abs", no_imports)
+        assert tools.get_safe("abs", no_imports) is wrapper
+        assert tools.copy().get_safe("abs", no_imports) is wrapper
+        assert tools.get_safe("abs", os_imports) is not wrapper
+
+    @pytest.mark.parametrize("engine", ["ast", "compiled", "native"])
+    def test_unhashable_tools(self, engine):
+        class Increment:
+            __hash__ = None
+
+            def __call__(self, x):
+                return x + 1
+
+        executor = LocalPythonExecutor([], engine=engine)
+        executor.send_tools({"inc": Increment()})
+        assert executor("f = inc\n(list(map(inc, [1, 2])), f(3))").output == ([2, 3], 4)
+        assert executor("inc(3)").output == 4
+
+    def test_wrapped_results_are_checked(self):
+        executor = LocalPythonExecutor([])
+        executor.send_tools({"get_module": lambda: sys})
+        with pytest.raises(InterpreterError, match="Forbidden access to module: sys"):
+            executor("modules = list(map(lambda f: f(), [get_module]))")
+
+
+class TestStateSnapshots:
+    @pytest.mark.parametrize("engine", ["ast", "compiled"])
+    def test_rollback_on_error(self, engine):
+        executor = LocalPythonExecutor([], engine=engine, rollback_on_error=True)
+        executor.send_tools({})
+        executor("x = 1\ndef f():\n    return x")
+        with pytest.raises(InterpreterError, match="division by zero\nThe variables and functions were restored"):
+            executor("x = 2\ny = 3\ndef f():\n    return -x\nprint('partial')\n1 / 0")
+        assert executor.state["x"] == 1
+        assert "y" not in executor.state
+        assert executor.state["_print_outputs"].value == "partial\n"
+        assert executor("f()").output == 1
+
+    def test_no_rollback_by_default(self):
+        executor = LocalPythonExecutor([])
+        executor.send_tools({})
+        with pytest.raises(InterpreterError):
+            executor("x = 2\n1 / 0")
+        assert executor.state["x"] == 2
+
+    def test_snapshot_and_restore(self):
+        executor = LocalPythonExecutor([])
+        executor.send_tools({})
+        executor("x = 1\nitems = [1]")
+        snapshot = executor.snapshot()
+        executor("x = 2\ndel items\ndef f():\n    return x")
+        executor.restore(snapshot)
+        assert executor("x").output == 1
+        assert executor("items").output == [1]
+        assert "f" not in executor.custom_tools
+
+    def test_fork(self):
+        executor = LocalPythonExecutor([], rollback_on_error=True)
+        executor.send_tools({"tool": lambda: "tool"})
+        executor("x = 1")
+        forked = executor.fork()
+        forked("x = 2\ny = tool()")
+        assert (executor("x").output, forked("x").output) == (1, 2)
+        assert "y" not in executor.state
+        assert forked.rollback_on_error
+        assert forked.cancellation_token is not executor.cancellation_token
+
+    def test_fork_cleanup_keeps_parent_working(self):
+        executor = LocalPythonExecutor([])
+        executor.send_tools({"double": lambda x: 2 * x})
+        code = "parallel_map(double, [1, 2, 3])"
+        assert executor(code).output == [2, 4, 6]
+        forked = executor.fork()
+        assert forked.static_tools["parallel_map"] is forked.parallel_map is not executor.parallel_map
+        assert forked(code).output == [2, 4, 6]
+        forked.cleanup()
+        assert executor(code).output == [2, 4, 6]
+        executor.cleanup()
+
+
+class TestStateMemoryManager:
+    def test_largest_variables_are_spilled(self, tmp_path):
+        manager = StateMemoryManager(max_memory=2 * 10**6, spill_dir=str(tmp_path), min_spill_size=10**5)
+        array, frame = np.arange(10**6, dtype=float), pd.DataFrame({"a": np.arange(10**5), "b": ["x"] * 10**5})
+        state = {"array": array, "frame": frame, "small": np.ones(10), "items": list(range(10**5))}
+        manager.update(state)
+        assert manager.stats["array"].spilled and manager.stats["frame"].spilled
+        assert not manager.stats["small"].spilled and not manager.stats["items"].spilled
+        assert manager.stats["array"] == VariableStats("array", "ndarray", 8 * 10**6, spilled=True)
+        assert len(list(tmp_path.iterdir())) == 2
+        assert state["array"] is not array and np.array_equal(state["array"], array)
+        assert state["frame"].equals(frame)
+        state["array"][0] = -1.0
+        # The list cannot be spilled, so the variables stay over budget
+        assert manager.memory_size == manager.stats["small"].size + manager.stats["items"].size
+        assert manager.spilled_size >= 8 * 10**6
+
+        state["array"] = 0
+        manager.update(state)
+        assert not manager.stats["array"].spilled
+        del array
+        gc.collect()
+        assert len(list(tmp_path.iterdir())) == 1
+
+    def test_nothing_is_spilled_under_budget(self, tmp_path):
+        manager = StateMemoryManager(max_memory=10**8, spill_dir=str(tmp_path))
+        state = {"array": np.ones(10**5)}
+        manager.update(state)
+        assert not manager.stats["array"].spilled
+        assert list(tmp_path.iterdir()) == []
+
+    def test_executor_spills_variables(self, tmp_path):
+        executor = LocalPythonExecutor(["numpy"], max_state_memory=10**6, spill_dir=str(tmp_path))
+        executor.send_tools({})
+        executor("import numpy as np\narray = np.arange(10**6)")
+        assert executor.state_manager.stats["array"].spilled
+        assert executor("int(array.sum())").output == sum(range(10**6))
+
+
+class TestCodeValidation:
+    @pytest.mark.parametrize("engine", ["ast", "compiled"])
+    @pytest.mark.parametrize(
+        "code, expected_error",
+        [
+            ("import os", "Code execution failed at line 'import os' due to: InterpreterError: Import of os is not"),
+            ("from os import path", "Import from os is not allowed"),
+            ("x = [].__class__", "Forbidden access to dunder attribute: __class__"),
+            ("x = eval('1')", "Forbidden function evaluation: 'eval' is not among the explicitly allowed tools"),
+            ("if undefined_function():\n    pass", "line 'if undefined_function():"),
+        ],
+    )
+    def test_code_is_rejected_before_running(self, engine, code, expected_error):
+        calls = []
+        executor = LocalPythonExecutor([], engine=engine)
+        executor.send_tools({"tool": lambda: calls.append(1)})
+        with pytest.raises(InterpreterError, match=re.escape(expected_error)):
+            executor("tool()\nprint('started')\n" + code)
+        assert calls == []
+        assert executor.state["_print_outputs"].value == ""
+
+    @pytest.mark.parametrize(
+        "code",
+        [
+            "try:\n    import os\nexcept Exception:\n    result = 'caught'",
+            "try:\n    undefined_function()\nexcept Exception:\n    result = 'caught'",
+            "def f():\n    return g()\ndef g():\n    return 'defined later'\nresult = f()",
+            "from math import *\nresult = factorial(3)",
+            "result = defined_before()",
+            "[].__init__()\nresult = ValueError('error')",
+            "def f():\n    return helper()\nresult = 'f is never called'",
+            "x = 1\nif x < 0:\n    undefined_function()\nresult = x",
+            "result = 1 if True else undefined_function()",
+            "result = True or undefined_function()",
+            "for i in []:\n    undefined_function()\nresult = 1",
+        ],
+    )
+    def test_valid_code_is_not_rejected(self, code):
+        executor = LocalPythonExecutor(["math"])
+        executor.send_tools({})
+        executor.send_variables({"defined_before": lambda: "variable"})
+        executor(code)
+        assert "result" in executor.state
+
+    def test_validation_is_cached_per_authorized_imports(self):
+        cache = CodeCache()
+        for _ in range(2):
+            for authorized_imports in (["numpy"], ["math"]):
+                executor = LocalPythonExecutor(authorized_imports, code_cache=cache)
+                executor.send_tools({})
+                executor("x = 1")
+        validations = cache.get("x = 1")._validations
+        assert len(validations) == 2
+        assert all(isinstance(validation, CodeValidation) for validation in validations.values())
+
+
+class SleepTool(Tool):
+    name = "sleep_and_double"
+    description = "Sleeps, then doubles a number."
+    inputs = {"x": {"type": "integer", "description": "Number to double."}}
+    output_type = "integer"
+
+    async def forward(self, x: int) -> int:
+        await asyncio.sleep(0.2)
+        return 2 * x
+
+
+class Countdown:
+    def __init__(self, start):
+        self.current = start
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.current == 0:
+            raise StopAsyncIteration
+        self.current -= 1
+        return self.current + 1
+
+
+@pytest.fixture
+def async_executor(engine):
+    executor = LocalPythonExecutor([], engine=engine, async_mode=True, timeout=5)
+    executor.send_tools({"sleep_and_double": SleepTool()})
+    yield executor
+    executor.cleanup()
+
+
+@pytest.mark.parametrize("engine", ["ast", "compiled"])
+class TestAsyncMode:
+    def test_gathered_tool_calls_run_concurrently(self, async_executor):
+        start = time.monotonic()
+        output = async_executor(
+            "import asyncio\nresults = await asyncio.gather(*[sleep_and_double(i) for i in range(5)])\nresults"
+        )
+        assert output.output == [0, 2, 4, 6, 8]
+        assert time.monotonic() - start < 0.8
+
+    def test_async_functions_defined_in_code(self, async_executor):
+        code = dedent(
+            """
+            import asyncio
+
+            async def double_then_add(x, y=1):
+                doubled = await sleep_and_double(x)
+                return doubled + y
+
+            results = await asyncio.gather(double_then_add(1), double_then_add(2, y=10))
+            single = asyncio.run(double_then_add(3))
+            """
+        )
+        start = time.monotonic()
+        async_executor(code)
+        assert time.monotonic() - start < 0.8
+        assert async_executor.state["results"] == [3, 14]
+        assert async_executor.state["single"] == 7
+
+    def test_async_functions_run_on_bounded_pool(self, async_executor):
+        async_executor.event_loop.max_workers = 4
+        code = dedent(
+            """
+            import asyncio
+
+            async def double(x):
+                return await sleep_and_double(x)
+
+            async def double_pair(x):
+                return await asyncio.gather(double(x), double(x + 1))
+
+            results = await asyncio.gather(*[double_pair(2 * i) for i in range(8)])
+            """
+        )
+        async_executor(code)
+        assert async_executor.state["results"] == [[4 * i, 4 * i + 2] for i in range(8)]
+        assert len([thread for thread in threading.enumerate() if thread.name.startswith("async_def")]) <= 4
+        async_executor.cleanup()
+        assert async_executor.event_loop._executor is None
+
+    def test_async_for_and_async_with(self, async_executor):
+        async_executor.send_variables({"countdown": Countdown(3), "lock": asyncio.Lock()})
+        code = dedent(
+            """
+            values = []
+            async with lock:
+                locked = lock.locked()
+                async for value in countdown:
+                    values.append(value)
+            """
+        )
+        async_executor(code)
+        assert async_executor.state["values"] == [3, 2, 1]
+        assert async_executor.state["locked"] is True
+        assert not async_executor.state["lock"].locked()
+
+    def test_asyncio_import_is_curated(self, async_executor):
+        async_executor("from asyncio import gather, sleep")
+        with pytest.raises(InterpreterError, match="has no attribute create_subprocess_shell"):
+            async_executor("from asyncio import create_subprocess_shell")
+
+    def test_await_is_interrupted_by_timeout(self, engine):
+        executor = LocalPythonExecutor([], engine=engine, async_mode=True, timeout=0.2)
+        executor.send_tools({})
+        with pytest.raises(InterpreterError, match="wall-clock time budget of 0.2 seconds"):
+            executor("import asyncio\nawait asyncio.sleep(10)")
+        executor.cleanup()
+
+    def test_await_requires_async_mode(self, engine):
+        executor = LocalPythonExecutor([], engine=engine)
+        executor.send_tools({"sleep_and_double": SleepTool()})
+        with pytest.raises(InterpreterError, match="Await is only supported in async mode"):
+            executor("await sleep_and_double(1)")
+
+
+@pytest.mark.parametrize("engine", ["ast", "compiled"])
+class TestParallelMap:
+    def test_tool_calls_run_concurrently_in_order(self, engine):
+        def slow_double(x):
+            time.sleep(0.2)
+            return 2 * x
+
+        executor = LocalPythonExecutor([], engine=engine)
+        executor.send_tools({"slow_double": slow_double})
+        start = time.monotonic()
+        output = executor("parallel_map(slow_double, range(8))")
+        assert output.output == [0, 2, 4, 6, 8, 10, 12, 14]
+        assert time.monotonic() - start < 0.8
+        executor.cleanup()
+
+    def test_functions_defined_in_code(self, engine):
+        code = dedent(
+            """
+            def square_all(values):
+                return parallel_map(lambda x: x * x, values)
+
+            results = parallel_map(square_all, [[1, 2], [3], []], max_workers=2)
+            """
+        )
+        executor = LocalPythonExecutor([], engine=engine)
+        executor.send_tools({})
+        executor(code)
+        assert executor.state["results"] == [[1, 4], [9], []]
+
+    def test_first_exception_is_raised_with_its_item(self, engine):
+        calls = []
+
+        def fail_on_two(x):
+            calls.append(x)
+            if x == 2:
+                raise ValueError("two is not allowed")
+            return x
+
+        executor = LocalPythonExecutor([], engine=engine, max_parallel_workers=1)
+        executor.send_tools({"fail_on_two": fail_on_two})
+        with pytest.raises(
+            InterpreterError, match=re.escape("parallel_map failed on item 2 (2): ValueError: two is not allowed")
+        ):
+            executor("parallel_map(fail_on_two, range(10))")
+        assert calls == [0, 1, 2]
+
+    def test_exception_can_be_caught_in_code(self, engine):
+        executor = LocalPythonExecutor([], engine=engine)
+        executor.send_tools({})
+        code = "try:\n    parallel_map(int, ['1', 'x'])\nexcept ValueError as e:\n    error = str(e)"
+        executor(code)
+        assert "item 1 ('x'): ValueError" in executor.state["error"]
+
+
+@pytest.mark.parametrize("engine", ["ast", "compiled"])
+class TestParallelToolCalls:
+    @staticmethod
+    def make_executor(engine, **tools):
+        executor = LocalPythonExecutor([], engine=engine, parallel_tool_calls=True)
+        executor.send_tools(tools)
+        return executor
+
+    @staticmethod
+    def search(query):
+        time.sleep(0.2)
+        if query == "fail":
+            raise ValueError("search failed")
+        return f"results for {query}"
+
+    def test_independent_calls_overlap(self, engine):
+        executor = self.make_executor(engine, search=self.search)
+        code = dedent(
+            """
+            a = search("a")
+            b: str = search(query="b")
+            print("searched")
+            c = search(a)
+            search("d")
+            """
+        )
+        start = time.monotonic()
+        output = executor(code)
+        assert time.monotonic() - start < 0.7
+        assert output.output == "results for d"
+        assert output.logs == "searched\n"
+        assert executor.state["c"] == "results for results for a"
+        trace = output.concurrency_trace
+        assert [call.lineno for call in sorted(trace.calls, key=lambda call: call.lineno)] == [2, 3, 5, 6]
+        overlaps = {call.lineno: [other.lineno for other in trace.overlaps(call)] for call in trace.calls}
+        assert overlaps == {2: [3], 3: [2], 5: [6], 6: [5]}
+        assert "Overlapped" in trace.render()
+
+    def test_dependent_calls_run_in_order(self, engine):
+        executor = self.make_executor(engine, search=self.search)
+        output = executor('a = search("a")\nb = search(a + "!")\nc = search(f"{b}?")')
+        assert output.output == "results for results for results for a!?"
+        assert all(not output.concurrency_trace.overlaps(call) for call in output.concurrency_trace.calls)
+
+    def test_errors_are_raised_in_order_of_statements(self, engine):
+        executor = self.make_executor(engine, search=self.search)
+        with pytest.raises(InterpreterError, match=re.escape("line 'b = search(\"fail\")' due to: ValueError")):
+            executor('a = search("a")\nb = search("fail")\nc = search("c")')
+        assert executor.state["a"] == "results for a"
+        assert "b" not in executor.state and "c" not in executor.state
+
+    def test_only_calls_of_tools_with_plain_arguments_are_scheduled(self, engine):
+        executor = self.make_executor(engine, search=self.search)
+        output = executor('a = search("a")\nb = search(sorted("b")[0])\nc = len(a)\nd = search("d")')
+        assert output.concurrency_trace.calls == []
+
+
+@tool
+def search_tool(query: str, limit: int = 3) -> list:
+    """
+    Searches a query.
+
+    Args:
+        query: The query.
+        limit: Number of results.
+    """
+    if query == "fail":
+        raise ValueError("search failed")
+    return [query] * limit
+
+
+@pytest.mark.parametrize("engine", ["ast", "compiled", "native"])
+class TestToolCallRecords:
+    search = search_tool
+
+    def test_tool_calls_are_recorded(self, engine):
+        executor = LocalPythonExecutor([], engine=engine, record_tool_calls=True)
+        executor.send_tools({"search": self.search, "final_answer": FinalAnswerTool(), "helper": lambda: 1})
+        output = executor("results = search('a', limit=2)\ncount = len(results) + helper()\nsearch(query='b')")
+        assert [(call.name, call.arguments, call.error) for call in output.tool_calls] == [
+            ("search", {"query": "a", "limit": 2}, None),
+            ("search", {"query": "b"}, None),
+        ]
+        assert all(call.duration >= 0 and call.output_size > 0 for call in output.tool_calls)
+        assert output.tool_calls[0].dict()["duration"] == output.tool_calls[0].duration
+
+        output = executor("final_answer(count)")
+        assert [(call.name, call.arguments) for call in output.tool_calls] == [("final_answer", {"answer": 3})]
+
+    def test_failed_tool_calls_are_recorded(self, engine):
+        executor = LocalPythonExecutor([], engine=engine, record_tool_calls=True)
+        executor.send_tools({"search": self.search})
+        with pytest.raises(InterpreterError, match="search failed"):
+            executor("search('a')\nsearch('fail')")
+        records = executor.state["_tool_calls"]
+        assert [(call.arguments, call.error) for call in records] == [
+            ({"query": "a"}, None),
+            ({"query": "fail"}, "ValueError: search failed"),
+        ]
+        assert records[1].output_size is None and records[1].end_time is not None
+
+    def test_tool_calls_are_not_recorded_by_default(self, engine):
+        executor = LocalPythonExecutor([], engine=engine)
+        executor.send_tools({"search": self.search})
+        assert executor("search('a')").tool_calls is None
+        assert "_tool_calls" not in executor.state
+
+    def test_records_are_capped(self, engine):
+        executor = LocalPythonExecutor([], engine=engine, record_tool_calls=True)
+        executor.send_tools({"search": self.search})
+        with patch("smolagents.local_python_executor.MAX_TOOL_CALL_RECORDS", 3):
+            output = executor("for i in range(5):\n    search(str(i))")
+        assert [call.arguments["query"] for call in output.tool_calls] == ["0", "1", "2"]
+
+
+class TestBoundedPrint:
+    @pytest.mark.parametrize("engine", ["ast", "compiled", "native"])
+    def test_print_of_large_objects_is_bounded(self, engine):
+        executor = LocalPythonExecutor([], engine=engine, max_print_outputs_length=1000)
+        executor.send_tools({})
+        logs = executor("values = {i: str(i) for i in range(100000)}\nprint('values:', values)").logs
+        assert logs == truncate_content("values: " + str(executor.state["values"]) + "\n", max_length=1000)
+        assert executor("print([1, 'a'], {'b': None}, 'text')").logs == "[1, 'a'] {'b': None} text\n"
+
+
+class TestConstantFolding:
+    def test_optimize_module(self):
+        module = ast.parse("x = 60 * 60 * 24\nif False:\n    debug()\nelse:\n    y = f'{x:.1f} {1 + 1}'\ny")
+        optimized, folded_builtins = optimize_module(module)
+        assert folded_builtins == set()
+        assert isinstance(optimized.body[0].value, ast.Constant) and optimized.body[0].value.value == 86400
+        assert (optimized.body[0].value.lineno, optimized.body[0].value.end_col_offset) == (1, 16)
+        assert isinstance(optimized.body[1], ast.Assign) and optimized.body[1].lineno == 5
+        assert isinstance(module.body[1], ast.If)  # The parsed module is left unchanged
+        last_if = optimize_module(ast.parse("x = 5\nif False:\n    x = 3"))[0].body[-1]
+        assert isinstance(last_if, ast.If)  # The value of the code is the value of its last statement
+
+    @pytest.mark.parametrize(
+        "code, expected",
+        [
+            ("x = 0\nfor i in range(5):\n    x += 2 * 3 + len('abc') - abs(-1)\nx", 40),
+            ("[c for c in [1, 2, 3] if c not in [2, 4]]", [1, 3]),
+            ("x = 'b'\nx in {'a', 'b'} and (not False or undefined)", True),
+            ("True and 0 or 'default'", "default"),
+            ("x = 2\nf'{3.14159:.2f}' if True else undefined", "3.14"),
+            ("x = 1\nwhile False:\n    x = 2\nelse:\n    x = 3\nx", 1),
+            ("if True:\n    x = 2\n    print(x)", 2),
+            ("x = 5\nif False:\n    x = 3", None),
+            ("x = 5\nwhile False:\n    x = 3", None),
+            ("y = 1\nwhile False:\n    pass\nelse:\n    y = 2\ny", 1),
+            ("'a' * 10000 + '!'", "a" * 10000 + "!"),
+            ("(1, (2, 'a')) + (3,)", (1, (2, "a"), 3)),
+        ],
+    )
+    def test_folded_code_gives_same_results(self, code, expected):
+        result, _ = evaluate_python_code(code, BASE_PYTHON_TOOLS, state={})
+        assert result == expected
+
+    @pytest.mark.parametrize("engine", ["ast", "compiled"])
+    def test_constant_loop_bodies_are_folded(self, engine):
+        folded_state, state = {}, {}
+        code = "total = 0\nfor i in range(10):\n    total += 2 * 3 + len('abc')\n    if False:\n        print(i)"
+        evaluate_python_code(code, BASE_PYTHON_TOOLS, state=state, engine=engine)
+        evaluate_python_code(
+            "total = 0\nfor i in range(10):\n    total += 9", BASE_PYTHON_TOOLS, state=folded_state, engine=engine
+        )
+        assert state["total"] == folded_state["total"] == 90
+        assert state["_operations_count"] == folded_state["_operations_count"]
+
+    @pytest.mark.parametrize("engine", ["ast", "compiled"])
+    def test_errors_keep_their_lines(self, engine):
+        with pytest.raises(InterpreterError, match="at line 'y = 1 / 0' due to: ZeroDivisionError"):
+            evaluate_python_code("x = 1\ny = 1 / 0", state={}, engine=engine)
+        with pytest.raises(InterpreterError, match="Import of os is not allowed"):
+            evaluate_python_code("if False:\n    import os", state={}, engine=engine)
+
+    @pytest.mark.parametrize("engine", ["ast", "compiled"])
+    def test_shadowed_builtins_are_not_folded(self, engine):
+        executor = LocalPythonExecutor(["math"], engine=engine)
+        executor.send_tools({})
+        assert executor("abs(-16)").output == 16
+        executor("from math import sqrt as abs")
+        assert executor("abs(16)").output == 4.0
+        assert executor("def f(abs):\n    return abs(-1)\nf(lambda x: x * 2)").output == -2
+
+    @pytest.mark.parametrize("engine", ["ast", "compiled"])
+    def test_functions_keep_their_unfolded_source(self, engine):
+        executor = LocalPythonExecutor([], engine=engine)
+        executor.send_tools({})
+        function = executor("def f():\n    if False:\n        print(1 + 1)\n    return 60 * 60\nf").output
+        assert function() == 3600
+        assert function.__source__ == "def f():\n    if False:\n        print(1 + 1)\n    return 60 * 60"
+
+
+class TestNativeEngine:
+    @staticmethod
+    def make_executor(authorized_imports=(), **kwargs):
+        executor = LocalPythonExecutor(list(authorized_imports), engine="native", **kwargs)
+        executor.send_tools({"final_answer": FinalAnswerTool(), "double": lambda x: 2 * x})
+        return executor
+
+    def test_runs_code_with_state_and_prints(self):
+        executor = self.make_executor(["math"])
+        code = dedent(
+            """
+            import math
+            squares = [i * i for i in range(5)]
+            print("squares:", squares)
+
+            class Point:
+                def __init__(self, x):
+                    self.x = x
+
+            def norm(point):
+                return math.sqrt(point.x)
+
+            norm(Point(squares[-1]))
+            """
+        )
+        output = executor(code)
+        assert output.output == 4.0
+        assert output.logs == "squares: [0, 1, 4, 9, 16]\n"
+        assert not output.is_final_answer
+        assert executor("double(norm(Point(9)))").output == 6.0
+        assert "__builtins__" not in executor.state
+
+    def test_final_answer(self):
+        executor = self.make_executor()
+        output = executor("x = double(3)\nfinal_answer(x + 1)\nx = 0")
+        assert output.is_final_answer
+        assert output.output == 7
+        assert executor.state["x"] == 6
+
+    @pytest.mark.parametrize(
+        "code, expected_error",
+        [
+            ("import os", "Import of os is not allowed"),
+            ("try:\n    a = ().__class__\nexcept Exception:\n    pass", "Forbidden access to dunder attribute"),
+            ("open('/etc/passwd')", "Forbidden function evaluation: 'open'"),
+            ("double = 3", "Cannot assign to name 'double'"),
+        ],
+    )
+    def test_rejects_code_statically(self, code, expected_error):
+        executor = self.make_executor()
+        with pytest.raises(InterpreterError, match=expected_error):
+            executor(code)
+
+    @pytest.mark.parametrize(
+        "code, expected_error",
+        [
+            ("import random\nos = random._os\nos.environ", "Forbidden access to module: os"),
+            ("import random\nrandom_os = getattr(random, '_os')", "Forbidden access to module: os"),
+            ("modules['os'].environ", "Forbidden access to module: os"),
+            (
+                dedent(
+                    """
+                    gen = (getattr(getattr(gen, "gi_frame"), "f_back") for _ in [1])
+                    frame = next(gen)
+                    while frame is not None:
+                        frame = getattr(frame, "f_back")
+                    """
+                ),
+                "Forbidden access to attribute: gi_frame",
+            ),
+            ("gen = (i for i in [1])\nsetattr(gen, 'gi_frame', None)", "Forbidden access to attribute: gi_frame"),
+            ("hasattr((i for i in []), 'gi_frame')", "Forbidden access to attribute: gi_frame"),
+        ],
+    )
+    def test_rejects_escapes_at_runtime(self, code, expected_error):
+        executor = self.make_executor(["random"])
+        executor.send_variables({"modules": {"os": sys.modules["os"]}})
+        with pytest.raises(InterpreterError, match=expected_error):
+            executor(code)
+
+    @pytest.mark.parametrize(
+        "code, expected_event",
+        [
+            ("import subprocess\nsubprocess.run(['true'])", "subprocess.Popen"),
+            ("import io\nio.open('/etc/hostname').read()", "open"),
+            ("import io\nio.open(path, 'w')", "open"),
+            ("import os\nos.rename(path, path + '.moved')", "os.rename"),
+        ],
+    )
+    def test_audit_hook_blocks_dangerous_operations(self, code, expected_event, tmp_path):
+        executor = self.make_executor(["*"])
+        path = tmp_path / "file.txt"
+        path.write_text("content")
+        executor.send_variables({"path": str(path)})
+        with pytest.raises(InterpreterError, match=f"Forbidden operation in code: {expected_event}"):
+            executor(code)
+        assert path.read_text() == "content"
+
+    def test_audit_hook_guards_parallel_map_workers(self, tmp_path):
+        executor = self.make_executor(["numpy"])
+        paths = [str(tmp_path / "a.npy"), str(tmp_path / "b.npy")]
+        executor.send_variables({"paths": paths})
+        with pytest.raises(InterpreterError, match="Forbidden operation in code: open"):
+            executor("import numpy as np\nparallel_map(lambda path: np.save(path, np.zeros(2)), paths)")
+        assert not any((tmp_path / name).exists() for name in ("a.npy", "b.npy"))
+        assert executor("parallel_map(lambda x: x * 2, [1, 2, 3])").output == [2, 4, 6]
+
+    def test_modules_can_be_imported_under_audit_hook(self):
+        executor = self.make_executor(["statistics", "pandas"])
+        assert executor("import statistics\nimport pandas as pd\nstatistics.mean([1, 2, 3])").output == 2
+
+    def test_error_reports_failing_statement(self):
+        executor = self.make_executor()
+        with pytest.raises(InterpreterError, match="at line 'raise ValueError\\('boom'\\)' due to: ValueError: boom"):
+            executor("x = 1\nraise ValueError('boom')\ny = 2")
+        assert executor.state["x"] == 1
+        assert "y" not in executor.state
+
+    def test_timeout_interrupts_native_loop(self):
+        executor = self.make_executor(timeout=0.2)
+        start = time.monotonic()
+        with pytest.raises(InterpreterError, match="wall-clock time budget"):
+            executor("while True:\n    pass")
+        assert time.monotonic() - start < 2
+
+    @pytest.mark.parametrize(
+        "code",
+        [
+            "while True:\n    try:\n        while True:\n            pass\n    except:\n        pass",
+            "while True:\n    try:\n        while True:\n            pass\n    finally:\n        continue",
+            dedent(
+                """
+                class Swallow:
+                    def __enter__(self):
+                        return self
+
+                    def __exit__(self, *args):
+                        return True
+
+                while True:
+                    with Swallow():
+                        while True:
+                            pass
+                """
+            ),
+        ],
+    )
+    def test_timeout_cannot_be_caught(self, code):
+        executor = self.make_executor(timeout=0.2)
+        start = time.monotonic()
+        with pytest.raises(InterpreterError, match="wall-clock time budget"):
+            executor(code)
+        assert time.monotonic() - start < 2
+        assert (
+            executor("x = 1\ntry:\n    1 / 0\nexcept ZeroDivisionError:\n    x = 2\nfinally:\n    x += 1\nx").output
+            == 3
+        )
+
+    def test_default_timeout(self):
+        executor = self.make_executor()
+        with patch("smolagents.local_python_executor.DEFAULT_NATIVE_TIMEOUT", 0.2):
+            with pytest.raises(InterpreterError, match="wall-clock time budget of 0.2 seconds"):
+                executor("while True:\n    pass")
+
+    def test_error_before_running_code(self):
+        executor = self.make_executor()
+        with patch.object(StaticTools, "get_safe", side_effect=ValueError("no tools")):
+            with pytest.raises(InterpreterError, match="^Code execution failed due to: ValueError: no tools"):
+                executor("x = 1")
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = LocalProcessPool(max_idle_workers=1)
+    yield pool
+    pool.shutdown()
+
+
+class TestLocalProcessPythonExecutor:
+    @pytest.fixture
+    def executor(self, pool):
+        executor = LocalProcessPythonExecutor(["numpy"], pool=pool)
+        yield executor
+        executor.cleanup()
+
+    def test_tools_run_in_parent_process(self, executor):
+        calls = []
+
+        def double(x):
+            calls.append(x)
+            return 2 * x
+
+        executor.send_tools({"double": double, "final_answer": FinalAnswerTool()})
+        code_output = executor("print(double(21))\ndouble(1)")
+        assert code_output == CodeOutput(output=2, logs="42\n", is_final_answer=False)
+        assert calls == [21, 1]
+        code_output = executor("final_answer(double(2))")
+        assert code_output.output == 4 and code_output.is_final_answer
+
+    def test_state_is_kept_in_worker(self, executor):
+        executor.send_tools({})
+        executor.send_variables({"array": np.arange(5)})
+        executor("array[0] = 10\ntotal = int(array.sum())")
+        assert executor("total").output == 20
+
+    def test_errors(self, executor):
+        def failing_tool():
+            raise ValueError("Tool failed")
+
+        executor.send_tools({"failing_tool": failing_tool})
+        with pytest.raises(
+            InterpreterError, match="Execution logs:\nbefore\n\nCode execution failed .* ZeroDivisionError"
+        ):
+            executor("print('before')\n1 / 0")
+        with pytest.raises(InterpreterError, match="ValueError: Tool failed"):
+            executor("failing_tool()")
+
+    def test_unpicklable_output(self, executor):
+        executor.send_tools({})
+        assert executor("(i for i in range(3))").output.startswith("<generator object")
+
+    def test_worker_is_reused(self, pool):
+        executor = LocalProcessPythonExecutor([], pool=pool)
+        pid = executor.worker.process.pid
+        executor.send_tools({})
+        executor("x = 1")
+        executor.cleanup()
+        assert len(pool) == 1
+        executor = LocalProcessPythonExecutor([], pool=pool)
+        assert executor.worker.process.pid == pid
+        executor.send_tools({})
+        with pytest.raises(InterpreterError, match="The variable `x` is not defined"):
+            executor("x")
+        executor.cleanup()
+
+    def test_worker_cleans_up_closed_executors(self):
+        parent_connection, worker_connection = multiprocessing.Pipe()
+        with patch.object(LocalPythonExecutor, "cleanup", autospec=True) as mock_cleanup:
+            worker = threading.Thread(target=run_process_worker, args=(worker_connection,))
+            worker.start()
+            for command in (("init", [], {}), ("init", [], {"async_mode": True}), ("close",)):
+                send_message(parent_connection, command)
+                assert receive_message(parent_connection) == ("result", None)
+            parent_connection.close()
+            worker.join()
+        assert mock_cleanup.call_count == 2
+
+    def test_worker_death(self, executor):
+        executor.send_tools({})
+        executor.worker.process.kill()
+        executor.worker.process.join()
+        with pytest.raises(InterpreterError, match="worker process died"):
+            executor("1 + 1")
+        assert executor("1 + 1").output == 2
+
+
 class TestLocalPythonExecutorSecurity:
     @pytest.mark.parametrize(
         "additional_authorized_imports, expected_error",
@@ -1,4 +1,8 @@
 import io
+import os
+import tarfile
+from contextlib import redirect_stdout
+from pathlib import Path
 from textwrap import dedent
 from unittest.mock import MagicMock, patch
 
@@ -10,7 +14,14 @@ from rich.console import Console
 from smolagents.default_tools import FinalAnswerTool, WikipediaSearchTool
 from smolagents.local_python_executor import CodeOutput
 from smolagents.monitoring import AgentLogger, LogLevel
-from smolagents.remote_executors import DockerExecutor, E2BExecutor, ModalExecutor, RemotePythonExecutor, WasmExecutor
+from smolagents.remote_executors import (
+    DockerExecutor,
+    E2BExecutor,
+    ExecutorPool,
+    ModalExecutor,
+    RemotePythonExecutor,
+    WasmExecutor,
+)
 from smolagents.utils import AgentError
 
 from .utils.markers import require_run_all
@@ -31,6 +42,78 @@ class TestRemotePythonExecutor:
         executor.send_variables({})
         assert executor.run_code_raise_errors.call_count == 0
 
+    @staticmethod
+    def get_local_kernel_executor():
+        """Executor running code in a local namespace, standing for the kernel."""
+        executor = RemotePythonExecutor(additional_imports=[], logger=MagicMock())
+        executor.namespace = {}
+
+        def run_code_raise_errors(code):
+            logs = io.StringIO()
+            with redirect_stdout(logs):
+                exec(code, executor.namespace)
+            return CodeOutput(output=None, logs=logs.getvalue(), is_final_answer=False)
+
+        executor.run_code_raise_errors = MagicMock(side_effect=run_code_raise_errors)
+        return executor
+
+    def test_send_variables_only_sends_changed_variables(self):
+        executor = self.get_local_kernel_executor()
+
+        def sent_code():
+            return [
+                call.args[0]
+                for call in executor.run_code_raise_errors.call_args_list
+                if "_load_variables" in call.args[0]
+            ]
+
+        executor.send_variables({"a": 1, "b": [1, 2]})
+        assert executor.namespace["a"] == 1 and executor.namespace["b"] == [1, 2]
+        assert "_load_variables" not in executor.namespace
+        assert executor.run_code_raise_errors.call_count == 1
+        executor.send_variables({"a": 1, "b": [1, 2]})
+        assert len(sent_code()) == 1
+        executor.send_variables({"a": 1, "b": [1, 2, 3]})
+        assert len(sent_code()) == 2
+        assert "'a'" not in sent_code()[-1]
+        assert executor.namespace["b"] == [1, 2, 3]
+        # Code actions do not invalidate the variables they left unchanged
+        executor("c = len(b)")
+        executor.send_variables({"a": 1, "b": [1, 2, 3]})
+        assert len(sent_code()) == 2
+        # Rebound or mutated variables are sent again
+        executor("a = None\nb.append(4)")
+        executor.send_variables({"a": 1, "b": [1, 2, 3]})
+        assert len(sent_code()) == 3
+        assert executor.namespace["a"] == 1 and executor.namespace["b"] == [1, 2, 3]
+        executor.run_code_raise_errors = MagicMock()
+        executor.reset()
+        executor.run_code_raise_errors.assert_called_once_with("%reset -f")
+        assert executor.sent_variables == {}
+
+    def test_send_variables_sends_all_if_kernel_output_is_unreadable(self):
+        executor = self.get_local_kernel_executor()
+        executor.send_variables({"a": 1})
+        executor.run_code_raise_errors = MagicMock(
+            return_value=CodeOutput(output=None, logs="", is_final_answer=False)
+        )
+        executor.send_variables({"a": 1})
+        assert executor.run_code_raise_errors.call_count == 2
+        assert "_load_variables" in executor.run_code_raise_errors.call_args.args[0]
+
+    def test_send_variables_uploads_large_variables(self):
+        executor = self.get_local_kernel_executor()
+        executor.MAX_INLINE_VARIABLE_SIZE = 100
+        executor.UPLOAD_CHUNK_SIZE = 400
+        large_value = os.urandom(1000)
+        executor.send_variables({"small": "x", "large": large_value})
+        assert executor.namespace["small"] == "x"
+        assert executor.namespace["large"] == large_value
+        # The file is created, written in 3 chunks, then loaded with the small variable
+        assert executor.run_code_raise_errors.call_count == 5
+        assert all(len(call.args[0]) < 1000 for call in executor.run_code_raise_errors.call_args_list[:4])
+        assert not any(Path(path).exists() for path in Path("/tmp").glob("smolagents_variable_*"))
+
     @require_run_all
     def test_send_tools_with_default_wikipedia_search_tool(self):
         tool = WikipediaSearchTool()
@@ -213,6 +296,19 @@ class TestDockerExecutorUnit:
             mock_container.stop.assert_called_once()
             mock_container.remove.assert_called_once()
 
+    def test_upload_file(self):
+        executor = DockerExecutor.__new__(DockerExecutor)
+        executor.logger = MagicMock()
+        executor.container = MagicMock()
+        executor.upload_file(b"payload", "/tmp/variable.pkl.zlib")
+        path, archive = executor.container.put_archive.call_args.args
+        assert path == "/tmp"
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            assert tar.extractfile("variable.pkl.zlib").read() == b"payload"
+        executor.container.put_archive.return_value = False
+        with pytest.raises(AgentError, match="Could not upload file"):
+            executor.upload_file(b"payload", "/tmp/variable.pkl.zlib")
+
 
 class CommonDockerExecutorIntegration:
     @pytest.fixture(autouse=True)
@@ -471,6 +567,116 @@ class TestWasmExecutorUnit:
                 executor.cleanup()
 
 
+class FakeRemoteExecutor(RemotePythonExecutor):
+    def __init__(self, additional_imports, logger, port=8888, fail=False):
+        super().__init__(additional_imports, logger)
+        if fail:
+            raise RuntimeError("Could not start the sandbox")
+        self.port = port
+        self.codes = []
+        self.cleaned_up = False
+
+    def run_code_raise_errors(self, code):
+        self.codes.append(code)
+        return CodeOutput(output=None, logs="", is_final_answer=False)
+
+    def cleanup(self):
+        self.cleaned_up = True
+
+
+@pytest.fixture
+def fake_executor_types():
+    with patch.dict(ExecutorPool.executor_types, {"docker": FakeRemoteExecutor, "e2b": FakeRemoteExecutor}):
+        yield
+
+
+@pytest.mark.usefixtures("fake_executor_types")
+class TestExecutorPool:
+    def test_acquire_and_release(self):
+        pool = ExecutorPool(size=1)
+        logger = MagicMock()
+        executor = pool.acquire("e2b", ["numpy"], logger)
+        assert executor.logger is logger
+        assert pool.get_stats()["misses"] == 1
+        pool.wait()
+        assert len(pool) == 1
+        warmed_executor = pool.acquire("e2b", ["numpy"], logger)
+        assert warmed_executor is not executor
+        pool.wait()
+        pool.shutdown()
+        pool = ExecutorPool(size=1)
+        with patch.object(pool, "_refill"):
+            executor = pool.acquire("e2b", [], logger)
+            other_executor = pool.acquire("e2b", [], logger)
+        pool.release(executor)
+        assert executor.codes == ["%reset -f"]
+        assert executor.logger is pool.logger
+        assert not executor.cleaned_up
+        assert len(pool) == 1
+        # The pool is full: the other executor is cleaned up
+        pool.release(other_executor)
+        assert other_executor.cleaned_up
+        assert len(pool) == 1
+        pool.shutdown()
+        assert len(pool) == 0
+
+    def test_stats(self):
+        pool = ExecutorPool(size=1)
+        pool.acquire("e2b", [], MagicMock())
+        pool.wait()
+        pool.acquire("e2b", [], MagicMock())
+        pool.wait()
+        stats = pool.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+        assert stats["warmups"] == 3
+        assert stats["idle_executors"] == 1
+        assert stats["max_warmup_time"] >= stats["mean_warmup_time"] >= 0
+        pool.shutdown()
+
+    def test_configurations_are_pooled_separately(self):
+        pool = ExecutorPool(size=2)
+        pool.prestart("e2b", [], wait=True, fail=False)
+        assert len(pool) == 2
+        pool.acquire("e2b", ["numpy"], MagicMock())
+        assert pool.get_stats()["misses"] == 1
+        pool.acquire("e2b", [], MagicMock(), fail=False)
+        assert pool.get_stats()["hits"] == 1
+        pool.shutdown()
+
+    def test_docker_executors_get_free_ports(self):
+        pool = ExecutorPool(size=2)
+        pool.prestart("docker", [], wait=True)
+        ports = {pool.acquire("docker", [], MagicMock()).port for _ in range(2)}
+        assert len(ports) == 2 and 8888 not in ports
+        assert pool.acquire("docker", [], MagicMock(), port=9999).port == 9999
+        pool.shutdown()
+
+    def test_failed_warmups_are_counted(self):
+        pool = ExecutorPool(size=1, logger=MagicMock())
+        pool.prestart("e2b", [], wait=True, fail=True)
+        assert len(pool) == 0
+        assert pool.get_stats()["failed_warmups"] == 1
+        pool.logger.log_error.assert_called_once()
+
+    def test_release_errors(self):
+        pool = ExecutorPool(size=1)
+        with pytest.raises(ValueError, match="not acquired from this pool"):
+            pool.release(FakeRemoteExecutor([], MagicMock()))
+        executor = pool.acquire("e2b", [], MagicMock())
+        executor.reset = MagicMock(side_effect=AgentError("Kernel died", MagicMock()))
+        pool.release(executor)
+        assert executor.cleaned_up
+        pool.shutdown()
+        with pytest.raises(RuntimeError, match="shut down"):
+            pool.acquire("e2b", [], MagicMock())
+
+    def test_unsupported_executor_type(self):
+        with pytest.raises(ValueError, match="Unsupported executor type for a pool"):
+            ExecutorPool().acquire("wasm", [], MagicMock())
+
+
 @require_run_all
 class TestWasmExecutorIntegration:
     """
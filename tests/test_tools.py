@@ -147,6 +147,18 @@ class TestTool:
         code_prompt = tool.to_code_prompt()
         assert code_prompt == expected_output
 
+    def test_tool_to_code_prompt_with_async_forward(self):
+        class AsyncTool(Tool):
+            name = "async_tool"
+            description = "Tool with a coroutine forward"
+            inputs = {"text": {"type": "string", "description": "Input text"}}
+            output_type = "string"
+
+            async def forward(self, text: str) -> str:
+                return text
+
+        assert AsyncTool().to_code_prompt().startswith("async def async_tool(text: string) -> string:")
+
     @pytest.mark.parametrize(
         "tool_fixture, expected_output",
         [
@@ -23,12 +23,14 @@ from IPython.core.interactiveshell import InteractiveShell
 from smolagents import Tool
 from smolagents.tools import tool
 from smolagents.utils import (
+    bounded_str,
     create_agent_gradio_app_template,
     get_source,
     instance_to_source,
     is_valid_name,
     parse_code_blobs,
     parse_json_blob,
+    truncate_content,
 )
 
 
@@ -552,3 +554,55 @@ def test_agent_gradio_app_template_excludes_class_keyword():
         ast.parse(result)
     except SyntaxError as e:
         pytest.fail(f"Generated app.py contains syntax error: {e}")
+
+
+def make_recursive_list():
+    items = [1]
+    items.append(items)
+    return items
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        [1, "a", (2,), {3: (4, 5)}, set(), frozenset({1}), {1, 2}, None, b"x", 1.5],
+        {"a": [1, {"b": "c"}], "d": ()},
+        make_recursive_list(),
+        list(range(100_000)),
+        {i: str(i) * 3 for i in range(100_000)},
+        ["x" * 50_000, "y" * 50_000],
+        {"key": "z" * 100_000},
+        tuple(range(30_000)),
+        b"q" * 50_000,
+        "text" * 10_000,
+    ],
+)
+def test_bounded_str_matches_truncated_str(value):
+    assert bounded_str(value, max_length=1000) == truncate_content(str(value), max_length=1000)
+
+
+def test_bounded_str_stops_rendering_at_max_length():
+    class Item:
+        rendered = 0
+
+        def __repr__(self):
+            Item.rendered += 1
+            return "item"
+
+    output = bounded_str([Item() for _ in range(100_000)], max_length=100)
+    assert output.startswith("[item, item") and output.endswith("item, item]")
+    assert Item.rendered < 100
+
+
+def test_bounded_str_previews_large_arrays():
+    import numpy as np
+    import pandas as pd
+
+    df = pd.DataFrame({"a": range(100_000), "b": [0.5] * 100_000})
+    preview = bounded_str(df)
+    assert preview.startswith("DataFrame of shape (100000, 2) with dtypes a: int64, b: float64:")
+    assert "99999" in preview and len(preview.splitlines()) == 13
+    assert bounded_str(df["a"]).startswith("Series 'a' of length 100000 and dtype int64:")
+    assert bounded_str(np.zeros((100, 100))).startswith("ndarray of shape (100, 100) and dtype float64:")
+    small_df = pd.DataFrame({"a": [1, 2]})
+    assert bounded_str(small_df) == str(small_df)